@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database.database import get_db
 from app.schemas.chat import ChatRequest
 from app.models.project import Project
 from app.services.pipeline.service_container import ServiceContainer
+from app.services.pipeline.container_cache import container_cache
 from app.services.pipeline.pipeline_runtime import PipelineRuntime
+from contextlib import aclosing
+import json
 import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 TENANT = os.environ.get("TENANT_ID","airline")
+ANSWER_CACHE = os.environ.get("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+RETRIEVAL = os.environ.get("RETRIEVAL_MODE", "vector")  # vector | hybrid
 router = APIRouter(prefix="/api/v1", tags=["chat"])
 '''
 @router.post("/chat")
@@ -23,32 +30,40 @@ async def chat(req: ChatRequest, db: Session = Depends(get_db)):
     return result
 '''
 
-@router.post("/chat")
-async def chat(req: ChatRequest, db: Session = Depends(get_db)):
-    try:
-        pipeline_cfg = {
-        "chunker": "recursive",
-        "embedder": "azure-openai",
-        "vector_store": "azure-search",
-        "reranker": "none",
-        "pii": "regex",
-        "governance": "basic",
-        "llm": "azure-openai",
-        "chunk_size": 800,
-        "chunk_overlap": 100
+PIPELINE_CFG = {
+    "chunker": "recursive",
+    "embedder": "azure-openai",
+    "vector_store": "azure-search",
+    "reranker": "none",
+    "pii": "regex",
+    "governance": "basic",
+    "llm": "azure-openai",
+    "chunk_size": 800,
+    "chunk_overlap": 100,
+    "answer_cache": ANSWER_CACHE,
+    "retrieval": RETRIEVAL
+}
+
+
+def _meta(req: ChatRequest) -> dict:
+    return {
+        "tenant": TENANT,
+        "department": req.department,
+        "project_id": req.project_id,
+        "group_ids": ["Team-AI"],
+        "owner_user_id": "unknown"
     }
-    
-        container = ServiceContainer(pipeline_cfg)
 
-        meta = {
-            "tenant": TENANT,
-            "department": req.department,
-            "project_id": req.project_id,
-            "group_ids": ["Team-AI"],
-            "owner_user_id": "unknown"
-        }
 
-    
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/chat")
+async def chat(req: ChatRequest, db: Session = Depends(get_db)):
+    try:
+        container = container_cache.get(PIPELINE_CFG)
+        meta = _meta(req)
 
         logger.info("Chat request received: %s", req.model_dump())
         result = await PipelineRuntime.answer(container, req.query, meta, req.top_k)
@@ -60,3 +75,43 @@ async def chat(req: ChatRequest, db: Session = Depends(get_db)):
         logger.exception("Chat error occurred!")  # Full traceback logged
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request):
+    """
+    Server-sent events: one `sources` event once retrieval is done, `token`
+    events as the LLM produces them, then `done` (or `error`). A client
+    disconnect closes the upstream completion stream.
+    """
+    container = container_cache.get(PIPELINE_CFG)
+    meta = _meta(req)
+    logger.info("Chat stream request received: %s", req.model_dump())
+
+    async def events():
+        started = time.perf_counter()
+        ttft_ms = None
+        tokens = 0
+        try:
+            async with aclosing(PipelineRuntime.stream_answer(container, req.query, meta, req.top_k)) as stream:
+                async for event, data in stream:
+                    if await request.is_disconnected():
+                        logger.info("Chat stream client disconnected, generation cancelled")
+                        return
+                    if event == "token":
+                        tokens += 1
+                        if ttft_ms is None:
+                            ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    yield _sse(event, data)
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"Chat stream done: {tokens} deltas, first token {ttft_ms} ms, total {elapsed_ms} ms")
+            yield _sse("done", {"ttft_ms": ttft_ms, "elapsed_ms": elapsed_ms})
+        except Exception as e:
+            # headers are already sent, so errors are reported in-band
+            logger.exception("Chat stream error occurred!")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,14 +1,41 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import tempfile
+import uuid
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database.database import get_db
 from app.schemas.ingest import IngestRequest
 from app.models.project import Project
 from app.services.pipeline.service_container import ServiceContainer
-from app.services.pipeline.pipeline_runtime import PipelineRuntime
+from app.services.pipeline.container_cache import container_cache
+from app.services.pipeline.pipeline_runtime import PipelineRuntime, base_id
+from app.services.pipeline.bulk_ingest import BulkIngestor, read_ndjson
+from app.services.pipeline.ingest_jobs import ingest_jobs
+from app.services.implementations.chunking.chunk_core import decode_stream, read_file
+from app.core.process_pool import ParseTimeout, ParseFailed
+from app.core.uploads import receive_upload, UploadTooLarge, BadUpload
 import os
 
 TENANT = os.environ.get("TENANT_ID","airline")
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR") or None  # None = system temp dir
 router = APIRouter(prefix="/api/v1", tags=["ingest"])
+
+# TEMPORARY: Hardcoded pipeline configuration until Project DB setup works
+PIPELINE_CFG = {
+    "chunker": "recursive",
+    "embedder": "azure-openai",
+    "vector_store": "azure-search",
+    "reranker": "none",
+    "pii": "regex",
+    "pseudonymizer": "simple",
+    "governance": "basic",
+    "llm": "azure-openai",
+    "chunk_size": 800,
+    "chunk_overlap": 100
+}
+
 """
 @router.post("/ingest")
 async def ingest(req: IngestRequest, db: Session = Depends(get_db)):
@@ -30,22 +57,8 @@ async def ingest(req: IngestRequest, db: Session = Depends(get_db)):
 
     try:
 
-        # Hardcoded pipeline configuration
-        pipeline_cfg = {
-            "chunker": "recursive",
-            "embedder": "azure-openai",
-            "vector_store": "azure-search",
-            "reranker": "none",
-            "pii": "regex",
-            "pseudonymizer": "simple", 
-            "governance": "basic",
-            "llm": "azure-openai",
-            "chunk_size": 800,
-            "chunk_overlap": 100
-    }
-
-        # Create pipeline service container dynamically
-        container = ServiceContainer(pipeline_cfg)
+        # Reuse the cached service container for this pipeline config
+        container = container_cache.get(PIPELINE_CFG)
 
         # Temporary project mock object (until DB fully wired)
         p = type("obj", (object,), {
@@ -72,4 +85,127 @@ async def ingest(req: IngestRequest, db: Session = Depends(get_db)):
 
     except Exception as e:
         print(e)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ingest/bulk")
+async def ingest_bulk(request: Request):
+    """
+    NDJSON in, NDJSON out: one document per request line
+    ({"project_id", "text", ...IngestRequest metadata, optional "doc_id"}),
+    one result line per document streamed back as soon as it finishes.
+    """
+    container = container_cache.get(PIPELINE_CFG)
+    ingestor = BulkIngestor(container)
+
+    async def results():
+        async for r in ingestor.run(read_ndjson(request.stream())):
+            yield json.dumps(r) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.post("/ingest/stream")
+async def ingest_stream(request: Request, project_id: str, source: str = "Upload", doc_key: str | None = None):
+    """
+    Raw UTF-8 text body, chunked and indexed while it is still arriving, for
+    documents too large to send as one JSON `text` field. Metadata comes from
+    the query string (?project_id=...&source=...&doc_key=...). Without a
+    doc_key, a named source keys the document (re-sending it replaces it), as
+    the filename does for /ingest/file; the default source gets a fresh key.
+    """
+    container = container_cache.get(PIPELINE_CFG)
+    if not doc_key:
+        doc_key = base_id(f"{project_id}/{source}") if source != "Upload" else uuid.uuid4().hex
+    meta = {
+        "tenant": TENANT,
+        "department": "Engineering",
+        "project_id": project_id,
+        "source": source,
+        "doc_key": doc_key,
+    }
+    count = await PipelineRuntime.ingest_stream(container, decode_stream(request.stream()), meta)
+    if count == 0:
+        raise HTTPException(400, "Ingestion blocked by policy or produced 0 chunks.")
+    return {"status": "ingestion_complete", "doc_key": doc_key, "chunks_indexed": count}
+
+
+_FILE_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["file", "project_id"],
+    "properties": {
+        "file": {"type": "string", "format": "binary"},
+        "project_id": {"type": "string"},
+        "source": {"type": "string", "default": "Upload"},
+        "doc_key": {"type": "string"},
+    },
+}}}}}
+
+
+@router.post("/ingest/file", openapi_extra=_FILE_FORM)
+async def ingest_file(request: Request):
+    """
+    Multipart upload (PDF, Office, HTML, ...) with form fields project_id,
+    source and doc_key. The body is streamed straight into a temp file with
+    UPLOAD_MAX_BYTES enforced as it arrives. Text, Markdown, HTML and JSON
+    are parsed by the fast path; other formats go to Unstructured in the parse
+    worker pool (per-file timeout and memory cap). The text is then chunked and
+    indexed as a stream, so neither step blocks the event loop.
+    """
+    container = container_cache.get(PIPELINE_CFG)
+    with tempfile.TemporaryDirectory(dir=UPLOAD_DIR) as tmp:
+        try:
+            upload = await receive_upload(request, tmp, UPLOAD_MAX_BYTES)
+        except UploadTooLarge:
+            raise HTTPException(413, f"Upload exceeds {UPLOAD_MAX_BYTES} bytes.")
+        except BadUpload as e:
+            raise HTTPException(400, str(e))
+        project_id = upload.fields.get("project_id")
+        if upload.path is None or not project_id:
+            raise HTTPException(422, "A 'file' part and a 'project_id' field are required.")
+        source = upload.fields.get("source") or "Upload"
+        meta = {
+            "tenant": TENANT,
+            "department": "Engineering",
+            "project_id": project_id,
+            "source": source,
+            "doc_key": upload.fields.get("doc_key") or base_id(f"{project_id}/{upload.filename}"),
+        }
+        size = upload.size
+        text_path = os.path.join(tmp, "text.txt")
+        try:
+            chars = await container.documents.extract(upload.path, text_path, {"filename": upload.filename})
+        except ParseTimeout as e:
+            raise HTTPException(422, f"Document parsing timed out: {e}")
+        except ParseFailed as e:
+            raise HTTPException(422, f"Document could not be parsed: {e}")
+        if not chars:
+            raise HTTPException(422, "No text could be extracted from the document.")
+        count = await PipelineRuntime.ingest_stream(container, decode_stream(read_file(text_path)), meta)
+    if count == 0:
+        raise HTTPException(400, "Ingestion blocked by policy or produced 0 chunks.")
+    return {"status": "ingestion_complete", "filename": upload.filename, "bytes": size,
+            "characters": chars, "chunks_indexed": count}
+
+
+@router.post("/ingest/jobs", status_code=202)
+async def submit_ingest_job(req: IngestRequest):
+    """Queue an ingestion and return immediately; poll GET /ingest/jobs/{job_id}."""
+    job_id = ingest_jobs.submit(req.model_dump())
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "job not found")
+    return job
+
+
+@router.delete("/ingest/jobs/{job_id}")
+async def cancel_ingest_job(job_id: str):
+    job = ingest_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(404, "job not found")
+    return job
@@ -1,8 +1,10 @@
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from app.schemas.project import ProjectCreate
+from app.schemas.project import ProjectCreate, ProjectPipelineUpdate
 from app.models.project import Project
+from app.services.pipeline.container_cache import container_cache
 
 router = APIRouter(prefix="/api/v1/projects", tags=["projects"])
 
@@ -14,3 +16,16 @@ def create_project(req: ProjectCreate, db: Session = Depends(get_db)):
     p = Project(project_id=req.project_id, tenant=req.tenant, department=req.department, pipeline=req.pipeline)
     db.add(p); db.commit(); db.refresh(p)
     return {"status":"created","project_id":p.project_id}
+
+@router.put("/{project_id}/pipeline")
+def update_pipeline(project_id: str, req: ProjectPipelineUpdate, db: Session = Depends(get_db)):
+    p = db.query(Project).filter_by(project_id=project_id).first()
+    if not p:
+        raise HTTPException(404, "project not found")
+    old_pipeline = p.pipeline
+    p.pipeline = req.pipeline
+    p.updated_at = datetime.utcnow()
+    db.commit()
+    # the old config's container must not keep serving this project
+    container_cache.invalidate(old_pipeline)
+    return {"status":"updated","project_id":p.project_id}
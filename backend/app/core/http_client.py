@@ -0,0 +1,222 @@
+import asyncio, random, time, logging
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Any, Optional
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+AZURE_OPENAI = "azure-openai"
+AZURE_SEARCH = "azure-search"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / Retry-After (seconds or HTTP date)."""
+    ms = response.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(settings.HTTP_BACKOFF_MAX, settings.HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+class _UpstreamStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.tcp_connects = 0
+        self.tls_handshakes = 0
+        self.retries = 0
+        self.total_latency_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = max(1, self.requests - self.in_flight)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "tcp_connects": self.tcp_connects,
+            "tls_handshakes": self.tls_handshakes,
+            "retries": self.retries,
+            "avg_latency_ms": round(self.total_latency_ms / done, 2),
+        }
+
+
+class HttpClientPool:
+    """
+    One long-lived httpx.AsyncClient per upstream (keep-alive, optional HTTP/2).
+    Opened/closed from the FastAPI lifespan; `get` also creates lazily so
+    scripts and tests that never start the app keep working.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _UpstreamStats] = {}
+
+    def _http2(self) -> bool:
+        if not settings.HTTP2_ENABLED:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1")
+            return False
+
+    def _build(self, upstream: str) -> httpx.AsyncClient:
+        stats = self._stats.setdefault(upstream, _UpstreamStats())
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            # httpcore emits these only when a new connection is opened,
+            # so they count handshakes rather than requests
+            if event == "connection.connect_tcp.complete":
+                stats.tcp_connects += 1
+            elif event == "connection.start_tls.complete":
+                stats.tls_handshakes += 1
+
+        async def on_request(request: httpx.Request) -> None:
+            stats.requests += 1
+            stats.in_flight += 1
+            request.extensions["trace"] = trace
+            request.extensions["started_at"] = time.perf_counter()
+
+        async def on_response(response: httpx.Response) -> None:
+            stats.in_flight -= 1
+            started = response.request.extensions.get("started_at")
+            if started is not None:
+                stats.total_latency_ms += (time.perf_counter() - started) * 1000
+            if response.status_code >= 400:
+                stats.errors += 1
+
+        return httpx.AsyncClient(
+            http2=self._http2(),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.HTTP_READ_TIMEOUT,
+                connect=settings.HTTP_CONNECT_TIMEOUT,
+                pool=settings.HTTP_POOL_TIMEOUT,
+            ),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._clients[upstream] = self._build(upstream)
+            logger.info(f"HTTP pool opened for upstream '{upstream}'")
+        return client
+
+    def open(self, *upstreams: str) -> None:
+        for u in upstreams:
+            self.get(u)
+
+    async def aclose(self) -> None:
+        for upstream, client in list(self._clients.items()):
+            await client.aclose()
+            logger.info(f"HTTP pool closed for upstream '{upstream}'")
+        self._clients.clear()
+
+    async def post(self, upstream: str, url: str, **kwargs) -> httpx.Response:
+        try:
+            return await self.get(upstream).post(url, **kwargs)
+        except httpx.TransportError:
+            # transport failures never reach the response hook
+            stats = self._stats[upstream]
+            stats.errors += 1
+            stats.in_flight = max(0, stats.in_flight - 1)
+            raise
+
+    async def post_with_retry(self, upstream: str, url: str, max_retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """
+        POST, retrying transport errors and 429/5xx with jittered exponential
+        backoff. A Retry-After from the server takes precedence over the jitter.
+        The last response is returned as-is once retries are exhausted.
+        """
+        retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            try:
+                resp = await self.post(upstream, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"{upstream} transport error ({e!r}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                    return resp
+                delay = retry_after_seconds(resp)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                delay = min(delay, settings.HTTP_BACKOFF_MAX)
+                logger.warning(f"{upstream} returned {resp.status_code}; retry {attempt + 1}/{retries} in {delay:.2f}s")
+            self._stats[upstream].retries += 1
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    @asynccontextmanager
+    async def stream(self, upstream: str, url: str, max_retries: Optional[int] = None,
+                     **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Streaming POST. Opening the stream is retried like post_with_retry
+        (nothing has been consumed yet); once the response is yielded the
+        body is read incrementally, and leaving the block closes the upstream
+        connection, which is how callers cancel a generation.
+        """
+        client = self.get(upstream)
+        retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            try:
+                resp = await client.send(client.build_request("POST", url, **kwargs), stream=True)
+            except httpx.TransportError as e:
+                stats = self._stats[upstream]
+                stats.errors += 1
+                stats.in_flight = max(0, stats.in_flight - 1)
+                if attempt == retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"{upstream} stream transport error ({e!r}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                    break
+                await resp.aclose()
+                delay = min(retry_after_seconds(resp) or backoff_delay(attempt), settings.HTTP_BACKOFF_MAX)
+                logger.warning(f"{upstream} stream returned {resp.status_code}; retry {attempt + 1}/{retries} in {delay:.2f}s")
+            self._stats[upstream].retries += 1
+            await asyncio.sleep(delay)
+        try:
+            yield resp
+        finally:
+            await resp.aclose()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {u: s.as_dict() for u, s in self._stats.items()}
+
+
+http_clients = HttpClientPool()
+metrics.register("http", http_clients.metrics)
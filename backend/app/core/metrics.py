@@ -0,0 +1,13 @@
+from typing import Any, Callable, Dict
+
+# name -> zero-arg callable returning a JSON-serialisable snapshot
+_providers: Dict[str, Callable[[], Any]] = {}
+
+
+def register(name: str, provider: Callable[[], Any]) -> None:
+    """Expose a component's counters under `name` on the /metrics endpoint."""
+    _providers[name] = provider
+
+
+def snapshot() -> Dict[str, Any]:
+    return {name: provider() for name, provider in _providers.items()}
@@ -0,0 +1,111 @@
+import asyncio, multiprocessing, os, time, logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS   = int(os.getenv("PARSE_WORKERS", "0")) or (os.cpu_count() or 2)
+PARSE_TIMEOUT   = float(os.getenv("PARSE_TIMEOUT_SECONDS", "120"))
+PARSE_MEMORY_MB = int(os.getenv("PARSE_MEMORY_MB", "2048"))  # address-space cap per worker, 0 = none
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+class ParseFailed(Exception):
+    pass
+
+
+def _limit_memory(memory_mb: int) -> None:
+    """Worker initializer: a runaway document raises MemoryError instead of swapping the host."""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:  # not POSIX, or a lower hard limit
+        logger.warning(f"parse worker memory limit not applied: {e}")
+
+
+class ProcessPool:
+    """
+    CPU-bound work (document parsing) off the event loop, in worker processes
+    sized to the host. A call that exceeds its timeout cannot be cancelled
+    inside a ProcessPoolExecutor, so the pool is replaced and its processes
+    killed; calls that were running in the old pool are retried once.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS, timeout: float = PARSE_TIMEOUT, memory_mb: int = PARSE_MEMORY_MB):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "recycled": 0, "retried": 0}
+        self._busy_seconds = 0.0
+        metrics.register("parse_pool", self.stats)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and helper threads is unsafe
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_limit_memory, initargs=(self.memory_mb,))
+        return self._pool
+
+    def _recycle(self, pool: ProcessPoolExecutor) -> None:
+        if self._pool is not pool:
+            return  # someone else already replaced it
+        self._pool = None
+        self.counters["recycled"] += 1
+        for p in list((getattr(pool, "_processes", None) or {}).values()):
+            p.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """fn(*args) in a worker process; fn and args must be picklable (module-level function)."""
+        loop = asyncio.get_running_loop()
+        self.counters["submitted"] += 1
+        for attempt in range(2):
+            pool = self._executor()
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout or self.timeout)
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                logger.warning(f"⏱️ {fn.__name__} exceeded {timeout or self.timeout:g}s; recycling parse workers")
+                self._recycle(pool)
+                raise ParseTimeout(f"{fn.__name__} timed out after {timeout or self.timeout:g}s")
+            except BrokenProcessPool as e:
+                if pool is not self._pool and attempt == 0:
+                    self.counters["retried"] += 1  # pool was recycled under us, not our failure
+                    continue
+                # a worker died (e.g. killed for memory): replace the pool, fail this call
+                self._recycle(pool)
+                self.counters["failed"] += 1
+                raise ParseFailed(f"{fn.__name__} crashed its worker") from e
+            except MemoryError as e:
+                self.counters["failed"] += 1
+                raise ParseFailed(f"{fn.__name__} exceeded the {self.memory_mb} MB worker memory limit") from e
+            except Exception:
+                self.counters["failed"] += 1
+                raise
+            finally:
+                self._busy_seconds += time.perf_counter() - started
+            self.counters["completed"] += 1
+            return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "workers": self.workers, "busy_seconds": round(self._busy_seconds, 1)}
+
+
+parse_pool = ProcessPool()
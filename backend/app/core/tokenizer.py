@@ -0,0 +1,47 @@
+import os, logging
+from functools import lru_cache
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# cl100k_base is the encoding of text-embedding-3-* / ada-002 and gpt-4/35 deployments
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = TOKENIZER_ENCODING):
+    """Cached tiktoken encoder, or None when tiktoken/its BPE file is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding '{name}' unavailable ({e}); estimating tokens from length")
+        return None
+
+
+def _estimate(text: str) -> int:
+    # ~4 characters per token for English prose with cl100k
+    return max(1, (len(text) + 3) // 4)
+
+
+def count_tokens(text: str) -> int:
+    enc = get_encoding()
+    if enc is None:
+        return _estimate(text)
+    return len(enc.encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    enc = get_encoding()
+    if enc is None:
+        return [_estimate(t) for t in texts]
+    return [len(ids) for ids in enc.encode_ordinary_batch(texts)]
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut to at most `max_tokens` tokens."""
+    enc = get_encoding()
+    if enc is None:
+        return text[:max_tokens * 4]
+    ids = enc.encode_ordinary(text)
+    return text if len(ids) <= max_tokens else enc.decode(ids[:max_tokens])
@@ -0,0 +1,118 @@
+import asyncio, os
+from typing import Dict, List, NamedTuple, Optional
+
+try:  # python-multipart >= 0.0.13 ships as python_multipart
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from fastapi import Request
+
+FORM_FIELD_BYTES = 64 * 1024  # all non-file fields together
+_FORM_OVERHEAD = 64 * 1024    # boundaries, part headers and fields on top of the file
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class BadUpload(Exception):
+    pass
+
+
+class Upload(NamedTuple):
+    fields: Dict[str, str]
+    filename: Optional[str]
+    path: Optional[str]
+    size: int
+
+
+async def receive_upload(request: Request, directory: str, limit: int, field: str = "file") -> Upload:
+    """
+    Stream a multipart/form-data body straight into a file in `directory`,
+    enforcing `limit` on the file part while it arrives: no spooled copy in
+    between, and a body declared too large by Content-Length is refused
+    before anything is read. Other parts come back as small string fields.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit + _FORM_OVERHEAD:
+        raise UploadTooLarge(f"body of {declared} bytes exceeds the {limit} byte limit")
+    kind, params = parse_options_header(request.headers.get("content-type"))
+    if kind != b"multipart/form-data" or b"boundary" not in params:
+        raise BadUpload("expected a multipart/form-data body")
+
+    fields: Dict[str, bytearray] = {}
+    header: List[bytes] = [b"", b""]
+    part = {"name": "", "filename": None}
+    pending: List[bytes] = []  # file bytes parsed from the current request chunk
+    state = {"size": 0, "field_bytes": 0, "filename": None, "out": None}
+    path = os.path.join(directory, "upload")
+
+    def on_part_begin():
+        part["name"], part["filename"] = "", None
+
+    def on_header_field(data, start, end):
+        header[0] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        if header[0].lower() == b"content-disposition":
+            _, options = parse_options_header(header[1])
+            part["name"] = options.get(b"name", b"").decode("utf-8", "replace")
+            filename = options.get(b"filename")
+            part["filename"] = None if filename is None else filename.decode("utf-8", "replace")
+        header[0], header[1] = b"", b""
+
+    def on_headers_finished():
+        if part["name"] == field and part["filename"] is not None:
+            if state["filename"] is not None:
+                raise BadUpload(f"more than one {field!r} part")
+            state["filename"] = part["filename"]
+        else:
+            fields[part["name"]] = bytearray()
+
+    def on_part_data(data, start, end):
+        if part["name"] == field and part["filename"] is not None:
+            state["size"] += end - start
+            if state["size"] > limit:
+                raise UploadTooLarge(f"file exceeds the {limit} byte limit")
+            pending.append(bytes(data[start:end]))
+            return
+        state["field_bytes"] += end - start
+        if state["field_bytes"] > FORM_FIELD_BYTES:
+            raise BadUpload("form fields too large")
+        fields[part["name"]] += data[start:end]
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if state["filename"] is not None and state["out"] is None:
+                path += os.path.splitext(state["filename"])[1].lower()
+                state["out"] = await asyncio.to_thread(open, path, "wb")
+            if pending:
+                await asyncio.to_thread(state["out"].write, b"".join(pending))
+                pending.clear()
+        parser.finalize()
+    except MultipartParseError as e:
+        raise BadUpload(f"malformed multipart body: {e}") from e
+    finally:
+        if state["out"] is not None:
+            await asyncio.to_thread(state["out"].close)
+    return Upload(
+        fields={k: v.decode("utf-8", "replace") for k, v in fields.items()},
+        filename=state["filename"],
+        path=path if state["filename"] is not None else None,
+        size=state["size"],
+    )
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.environ.get("DATABASE_URL","sqlite:///./rag.db")
@@ -14,4 +14,16 @@ def get_db():
 
 def init_db():
     from app.models.project import Project
+    from app.models.governance.ingestionlog import IngestionLog
+    from app.models.ingest.ingestjob import IngestJob
+    from app.models.ingest.projectgeneration import ProjectGeneration
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns(IngestJob.__table__)
+
+def _add_missing_columns(table):
+    # create_all() never alters an existing table: add nullable columns introduced since
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for col in table.columns:
+            if col.name not in existing:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(engine.dialect)}"))
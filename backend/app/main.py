@@ -1,6 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core import metrics
+from app.core.http_client import http_clients, AZURE_OPENAI, AZURE_SEARCH
+from app.core.process_pool import parse_pool
+from app.database.database import init_db
+from app.services.pipeline.ingest_jobs import ingest_jobs
+from app.services.pipeline.strategy_registry import StrategyRegistry
 from app.api.v1.routes import api_router
 import logging
 
@@ -9,10 +16,23 @@ logging.basicConfig(
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s"
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm one keep-alive pool per upstream; closed on shutdown
+    http_clients.open(AZURE_OPENAI, AZURE_SEARCH)
+    init_db()
+    await ingest_jobs.start()
+    yield
+    await ingest_jobs.stop()
+    StrategyRegistry.close_all()  # e.g. flush autosaving stores
+    parse_pool.shutdown()
+    await http_clients.aclose()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Set up CORS middleware
@@ -29,4 +49,8 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to RAG Studio API"}
\ No newline at end of file
+    return {"message": "Welcome to RAG Studio API"}
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
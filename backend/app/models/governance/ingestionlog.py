@@ -5,7 +5,7 @@ from app.database.database import Base
 
 class IngestionLog(Base):
     __tablename__ = "ingestion_logs"
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)  # SQLite only autoincrements INTEGER keys
     tenant_id = Column(String(128), index=True)
     project_id = Column(String(128), index=True)
     department = Column(String(128), index=True)
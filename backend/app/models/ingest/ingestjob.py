@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, Boolean
+from app.database.database import Base
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(String(32), primary_key=True)            # uuid4 hex
+    status = Column(String(16), index=True, default="queued")  # queued | running | succeeded | failed | cancelled
+    payload = Column(JSON)                               # IngestRequest as submitted
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    chunks_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    chunks_uploaded = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)
+    claimed_by = Column(String(64))                      # worker holding the lease while 'running'
+    lease_expires_at = Column(DateTime, index=True)      # extended by the owner's heartbeat
+    error = Column(Text)
+    available_at = Column(DateTime, default=datetime.utcnow, index=True)  # retry backoff
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from app.database.database import Base
+
+class ProjectGeneration(Base):
+    __tablename__ = "project_generations"
+    # bumped by every ingest into the project, in whichever process ran it;
+    # cached answers of an older generation are stale
+    tenant = Column(String(128), primary_key=True)
+    project_id = Column(String(128), primary_key=True)
+    generation = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
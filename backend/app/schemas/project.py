@@ -6,3 +6,6 @@ class ProjectCreate(BaseModel):
     tenant: str
     department: str
     pipeline: Dict[str, Any]
+
+class ProjectPipelineUpdate(BaseModel):
+    pipeline: Dict[str, Any]
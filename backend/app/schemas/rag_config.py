@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 
 class RAGConfig(BaseModel):
-    document_processor: str = "unstructured"
+    document_processor: str = "auto"
     chunker: str = "markdown"
     embedder: str = "openai"
     vector_store: str = "chroma"
@@ -0,0 +1,291 @@
+import asyncio, bisect, codecs, os, re
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from app.core.tokenizer import get_encoding, count_tokens_batch
+from app.services.interfaces.chunk_strategy import Chunk
+
+# overlap is a percentage of the previous chunk's tokens; past half a chunk the
+# window barely advances (100% re-emits the whole previous chunk every time)
+MAX_OVERLAP_RATIO = 0.5
+
+# streaming: text is chunked in windows of about this many characters, cut at paragraph breaks
+STREAM_WINDOW_CHARS = int(os.getenv("CHUNK_STREAM_WINDOW_CHARS", str(256 * 1024)))
+STREAM_READ_BYTES   = int(os.getenv("CHUNK_STREAM_READ_BYTES", str(256 * 1024)))
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_LAST_SPACE = re.compile(r"\s(?=\S*$)")
+
+Span = Tuple[int, int]
+Groups = List[List[Span]]
+
+
+def split_spans(text: str, pattern: re.Pattern, start: int = 0, end: int = None) -> List[Span]:
+    """Non-blank pieces of text[start:end] between `pattern` matches, whitespace-trimmed."""
+    end = len(text) if end is None else end
+    out, pos = [], start
+    for m in pattern.finditer(text, start, end):
+        out.append((pos, m.start()))
+        pos = m.end()
+    out.append((pos, end))
+    spans = []
+    for s, e in out:
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if s < e:
+            spans.append((s, e))
+    return spans
+
+
+def _token_starts(piece: str) -> List[int]:
+    """Character offset where each token of `piece` starts."""
+    enc = get_encoding()
+    if enc is None:
+        return list(range(0, len(piece), 4))  # same ~4 chars/token estimate as count_tokens
+    return enc.decode_with_offsets(enc.encode_ordinary(piece))[1]
+
+
+def _cut(text: str, span: Span, token_starts: List[int], n: int, back: bool = False,
+         floor: Optional[int] = None) -> int:
+    """
+    Offset in `text` after the first `n` tokens of `span`, moved to the next
+    word start (or, with `back`, to the end of the previous word after `floor`)
+    so no word is split. With `back`, a run without whitespace between `floor`
+    and the token position (base64, data: URIs, minified JSON) is cut at the
+    token position instead, so the piece never exceeds `n` tokens.
+    """
+    s, e = span
+    if n <= 0:
+        return s
+    if n >= len(token_starts):
+        return e
+    pos = s + token_starts[n]
+    if back:
+        floor = s if floor is None else floor
+        while pos > floor and not text[pos].isspace() and not text[pos - 1].isspace():
+            pos -= 1
+        while pos > floor and text[pos - 1].isspace():
+            pos -= 1
+        if pos > floor:
+            return pos
+        return s + token_starts[n]
+    while pos < e and not text[pos].isspace() and not text[pos - 1].isspace():
+        pos += 1
+    while pos < e and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+class Packer:
+    """Greedy packing of units (spans with token counts) into overlapping chunks."""
+
+    def __init__(self, text: str, chunk_size: int, chunk_overlap: int):
+        self.text = text
+        self.offset = 0  # source position of text[0] (streaming keeps only a window)
+        self.size = max(1, chunk_size)
+        self.overlap = max(0.0, min(chunk_overlap / 100, MAX_OVERLAP_RATIO))
+        self.out: List[Chunk] = []
+        self.units: List[Tuple[int, int, int]] = []  # (start, end, tokens) of the open chunk
+        self.tokens = 0
+
+    def _emit(self) -> None:
+        s, e = self.units[0][0], self.units[-1][1]
+        self.out.append(Chunk(self.text[s:e], s + self.offset, e + self.offset, self.tokens))
+
+    def open_start(self) -> Optional[int]:
+        """Start of the open chunk in `text`, None when nothing is open."""
+        return self.units[0][0] if self.units else None
+
+    def rebase(self, text: str, shift: int) -> None:
+        """Continue on `text`, which is the current text with its first `shift` characters dropped."""
+        self.units = [(s - shift, e - shift, t) for s, e, t in self.units]
+        self.text, self.offset = text, self.offset + shift
+
+    def drain(self) -> List[Chunk]:
+        out, self.out = self.out, []
+        return out
+
+    def _carry(self, room: int) -> None:
+        """Start the next chunk with the tail of the emitted one, by token position."""
+        want = min(int(self.tokens * self.overlap), room)
+        carried: List[Tuple[int, int, int]] = []
+        have = 0
+        for s, e, t in reversed(self.units):
+            if have >= want:
+                break
+            if have + t <= want:
+                carried.append((s, e, t))
+                have += t
+                continue
+            # part of this unit: its last (want - have) tokens
+            starts = _token_starts(self.text[s:e])
+            skip = len(starts) - (want - have)
+            cut = _cut(self.text, (s, e), starts, skip)
+            if cut < e:
+                taken = len(starts) - sum(1 for o in starts if s + o < cut)
+                carried.append((cut, e, taken))
+                have += taken
+            break
+        self.units = carried[::-1]
+        self.tokens = have
+
+    def add(self, span: Span, tokens: int, new_chunk: bool = False) -> None:
+        """Append a unit; `new_chunk` closes the open chunk first (a semantic break)."""
+        if tokens > self.size:
+            self._add_long(span)
+            return
+        if self.units and (new_chunk or self.tokens + tokens > self.size):
+            self._emit()
+            self._carry(self.size - tokens)
+        self.units.append((span[0], span[1], tokens))
+        self.tokens += tokens
+
+    def _add_long(self, span: Span) -> None:
+        """A unit bigger than a chunk is split by token position."""
+        self.flush()
+        s, e = span
+        starts = _token_starts(self.text[s:e])
+        step = max(1, self.size - int(self.size * self.overlap))
+        i, a, nxt = 0, s, s
+        while True:
+            b = _cut(self.text, span, starts, i + self.size, back=True, floor=a)
+            if b > a:
+                self.out.append(Chunk(self.text[a:b], a + self.offset, b + self.offset, min(self.size, len(starts) - i)))
+                if b >= e:
+                    break
+                nxt = b  # never skip the word the previous piece stopped before
+                while nxt < e and self.text[nxt].isspace():
+                    nxt += 1
+            elif i + self.size >= len(starts):
+                break
+            i += step
+            a = min(_cut(self.text, span, starts, i), nxt)
+            # starting before token i (at nxt), the piece's budget counts from there
+            i = min(i, bisect.bisect_right(starts, a - s) - 1)
+
+    def flush(self) -> None:
+        if self.units:
+            self._emit()
+        self.units, self.tokens = [], 0
+
+
+def feed(packer: Packer, text: str, groups: Groups) -> None:
+    """Add grouped unit spans of `text` to the packer; each group after the first starts a fresh chunk."""
+    counts = count_tokens_batch([text[s:e] for g in groups for s, e in g])
+    i = 0
+    for n, group in enumerate(groups):
+        if n:
+            packer.flush()
+        for span in group:
+            packer.add(span, counts[i])
+            i += 1
+
+
+def pack(text: str, groups: Iterable[List[Span]], chunk_size: int, chunk_overlap: int) -> List[Chunk]:
+    """
+    Pack unit spans into chunks of at most `chunk_size` tokens (one tokenizer
+    pass over the units, a running total per chunk: linear in the text).
+    Chunks never cross a group boundary; each new chunk within a group starts
+    with the last `chunk_overlap`% tokens of the previous one.
+    """
+    packer = Packer(text, chunk_size, chunk_overlap)
+    feed(packer, text, [g for g in groups if g])
+    packer.flush()
+    return packer.out
+
+
+# --- streaming ---------------------------------------------------------------
+
+def _window_end(buf: str, pos: int, window: int) -> Optional[int]:
+    """First paragraph break past `window` characters from pos; None until one arrives (bounded)."""
+    m = PARAGRAPH_BREAK.search(buf, pos + window)
+    if m:
+        return m.start()
+    if len(buf) - pos < 4 * window:
+        return None
+    # no paragraph break for a long stretch: cut at the last whitespace
+    m = _LAST_SPACE.search(buf, pos, pos + window)
+    return m.start() if m and m.start() > pos else pos + window
+
+
+async def paragraph_windows(pieces: AsyncIterator[str], window: int = STREAM_WINDOW_CHARS) -> AsyncIterator[str]:
+    """
+    Re-cut streamed text into windows of about `window` characters ending just
+    before a paragraph break, so paragraphs are never split between windows.
+    """
+    buf, pos = "", 0
+    async for piece in pieces:
+        buf = buf[pos:] + piece
+        pos = 0
+        while len(buf) - pos >= window:
+            cut = _window_end(buf, pos, window)
+            if cut is None:
+                break
+            yield buf[pos:cut]
+            pos = cut
+    if pos < len(buf):
+        yield buf[pos:]
+
+
+Feeder = Callable[[Packer, str, int, int], Awaitable[None]]
+
+
+async def stream_pack(windows: AsyncIterator[str], feeder: Feeder, chunk_size: int,
+                      chunk_overlap: int) -> AsyncIterator[Chunk]:
+    """
+    Chunks of windowed text, yielded as soon as they close. `feeder(packer,
+    text, start, end)` adds the units of text[start:end]; only the open
+    chunk's text is carried into the next window, so memory is bounded by
+    the window and chunk size, not the document.
+    """
+    packer = Packer("", chunk_size, chunk_overlap)
+    buf, pos = "", 0
+    async for w in windows:
+        buf = buf + w
+        packer.text = buf
+        await feeder(packer, buf, pos, len(buf))
+        for c in packer.drain():
+            yield c
+        keep = packer.open_start()
+        keep = len(buf) if keep is None else keep
+        pos = len(buf) - keep
+        buf = buf[keep:]
+        packer.rebase(buf, keep)
+    packer.flush()
+    for c in packer.drain():
+        yield c
+
+
+def group_feeder(groups_fn: Callable[[str, int, int], Groups]) -> Feeder:
+    """Feeder for chunkers whose units come from `groups_fn(text, start, end)`."""
+    async def feeder(packer: Packer, text: str, start: int, end: int) -> None:
+        feed(packer, text, groups_fn(text, start, end))
+    return feeder
+
+
+async def text_pieces(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def decode_stream(body: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """Incrementally decode a byte stream (e.g. request.stream()); multi-byte characters may straddle pieces."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    async for piece in body:
+        text = decoder.decode(piece)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def read_file(path: str, block: int = STREAM_READ_BYTES) -> AsyncIterator[bytes]:
+    """A file (e.g. a spooled upload) in blocks, read off the event loop."""
+    with open(path, "rb") as f:
+        while True:
+            data = await asyncio.to_thread(f.read, block)
+            if not data:
+                return
+            yield data
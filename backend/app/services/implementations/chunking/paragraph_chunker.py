@@ -1,20 +1,21 @@
-import re
-from typing import List
+from typing import AsyncIterator, List
 from app.services.interfaces.chunk_strategy import ChunkStrategy
-
-def _toklen(s: str) -> int: return max(1, len(s.split()))
+from app.services.implementations.chunking.chunk_core import (
+    Chunk, Groups, pack, split_spans, group_feeder, paragraph_windows, stream_pack, PARAGRAPH_BREAK)
 
 class ParagraphChunker(ChunkStrategy):
+    """Whole paragraphs packed up to chunk_size tokens; oversized paragraphs are split by token."""
+
     async def chunk_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
-        paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-        out, buf = [], ""
-        for p in paras:
-            cand = (buf + "\n\n" + p).strip() if buf else p
-            if _toklen(cand) <= chunk_size:
-                buf = cand
-            else:
-                if buf: out.append(buf)
-                tail = " ".join(buf.split()[-max(0,int(_toklen(buf)*chunk_overlap/100)):]) if buf else ""
-                buf = (tail + "\n\n" + p).strip()
-        if buf: out.append(buf)
-        return out
+        return [c.text for c in await self.chunks(text, chunk_size, chunk_overlap)]
+
+    async def chunks(self, text: str, chunk_size: int, chunk_overlap: int) -> List[Chunk]:
+        return pack(text, self._groups(text, 0, len(text)), chunk_size, chunk_overlap)
+
+    async def chunk_stream(self, pieces: AsyncIterator[str], chunk_size: int, chunk_overlap: int) -> AsyncIterator[Chunk]:
+        async for c in stream_pack(paragraph_windows(pieces), group_feeder(self._groups), chunk_size, chunk_overlap):
+            yield c
+
+    @staticmethod
+    def _groups(text: str, start: int, end: int) -> Groups:
+        return [split_spans(text, PARAGRAPH_BREAK, start, end)]
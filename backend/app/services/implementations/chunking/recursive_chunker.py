@@ -1,23 +1,37 @@
 import re
-from typing import List
+from typing import AsyncIterator, List
 from app.services.interfaces.chunk_strategy import ChunkStrategy
+from app.services.implementations.chunking.chunk_core import (
+    Chunk, Groups, pack, split_spans, group_feeder, paragraph_windows, stream_pack, PARAGRAPH_BREAK, SENTENCE_BREAK)
 
-def _toklen(s: str) -> int: return max(1, len(s.split()))
+# markdown headings and setext-style (underlined) titles start a new section
+SECTION_BREAK = re.compile(r"\n\s*(?=#{1,6}\s)|^(?=\s*[A-Z][^\n]{0,60}\n[-=]{3,}\s*$)", re.M)
 
 class RecursiveChunker(ChunkStrategy):
+    """Sections -> paragraphs -> sentences, packed up to chunk_size tokens; chunks never span sections."""
+
     async def chunk_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
-        sections = re.split(r"\n\s*#{1,6}\s+|^\s*[A-Z][^\n]{0,60}\n[-=]{3,}\s*$", text, flags=re.M)
-        chunks, buf = [], ""
-        for sec in sections:
-            paras = [p.strip() for p in re.split(r"\n\s*\n", sec) if p.strip()]
-            for p in paras:
-                for s in re.split(r"(?<=[.!?])\s+", p):
-                    cand = (buf + " " + s).strip() if buf else s
-                    if _toklen(cand) <= chunk_size:
-                        buf = cand
-                    else:
-                        if buf: chunks.append(buf)
-                        tail = " ".join(buf.split()[-max(0,int(_toklen(buf)*chunk_overlap/100)):]) if buf else ""
-                        buf = (tail + " " + s).strip()
-            if buf: chunks.append(buf); buf = ""
-        return chunks
+        return [c.text for c in await self.chunks(text, chunk_size, chunk_overlap)]
+
+    async def chunks(self, text: str, chunk_size: int, chunk_overlap: int) -> List[Chunk]:
+        return pack(text, self._groups(text, 0, len(text)), chunk_size, chunk_overlap)
+
+    async def chunk_stream(self, pieces: AsyncIterator[str], chunk_size: int, chunk_overlap: int) -> AsyncIterator[Chunk]:
+        async for c in stream_pack(paragraph_windows(pieces), group_feeder(self._groups), chunk_size, chunk_overlap):
+            yield c
+
+    @staticmethod
+    def _groups(text: str, start: int, end: int) -> Groups:
+        """
+        Sentence spans per section of text[start:end]. The first group is
+        empty when the range opens with a section break, so a streamed window
+        starting on a heading does not continue the previous window's chunk.
+        """
+        bounds, pos = [], start
+        for m in SECTION_BREAK.finditer(text, start, end):
+            bounds.append((pos, m.start()))
+            pos = m.end()
+        bounds.append((pos, end))
+        return [[span for ps, pe in split_spans(text, PARAGRAPH_BREAK, s, e)
+                 for span in split_spans(text, SENTENCE_BREAK, ps, pe)]
+                for s, e in bounds]
@@ -1,47 +1,122 @@
-import re, numpy as np
-from typing import List
+import os, logging
+from collections import deque
+from dataclasses import replace
+import numpy as np
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+from app.core.tokenizer import count_tokens_batch
 from app.services.interfaces.chunk_strategy import ChunkStrategy
 from app.services.interfaces.embedding_strategy import EmbeddingStrategy
+from app.services.implementations.chunking.chunk_core import (
+    Chunk, Packer, split_spans, paragraph_windows, stream_pack, text_pieces, PARAGRAPH_BREAK)
 
+logger = logging.getLogger(__name__)
 
-def _toklen(s: str) -> int:
-    return max(1, len(s.split()))
+# "exact": reuse a paragraph's embedding only for chunks that are exactly that paragraph;
+#          chunks opened at a semantic break do not carry the previous chunk's overlap
+#          tail (it belongs to another topic), so single-paragraph chunks stay reusable
+# "centroid": every chunk gets the normalised mean of its paragraphs' embeddings (no second pass)
+SEMANTIC_CHUNK_EMBEDDINGS = os.getenv("SEMANTIC_CHUNK_EMBEDDINGS", "exact")
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
 
 
 class SemanticChunker(ChunkStrategy):
-    def __init__(self, embedder: EmbeddingStrategy, sim_threshold: float = 0.78):
+    """
+    Paragraphs join the open chunk while they stay within `sim_threshold`
+    cosine of its running (normalised) centroid and the chunk fits
+    chunk_size tokens. Paragraph embeddings are kept so ingest does not
+    embed the same text twice (Chunk.embedding / chunk_with_embeddings).
+    chunk_overlap applies within a topic (a chunk closed for size); in
+    "exact" mode a chunk started by a semantic break begins clean.
+    """
+
+    def __init__(self, embedder: EmbeddingStrategy, sim_threshold: float = 0.78,
+                 chunk_embeddings: str = SEMANTIC_CHUNK_EMBEDDINGS):
         self.embedder = embedder
         self.sim_threshold = sim_threshold
+        self.chunk_embeddings = chunk_embeddings
 
     async def chunk_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
-        paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-        if not paras:
-            return []
-
-        vecs = await self.embedder.embed_texts(paras)  # ✅ No import from registry
-
-        def cos(a, b):
-            a, b = np.array(a), np.array(b)
-            div = (np.linalg.norm(a) * np.linalg.norm(b)) or 1.0
-            return float(np.dot(a, b) / div)
-
-        chunks = []
-        curr, curr_vec = paras[0], vecs[0]
-
-        for i in range(1, len(paras)):
-            sim = cos(curr_vec, vecs[i])
-            cand = (curr + "\n\n" + paras[i]).strip()
-            if sim >= self.sim_threshold and _toklen(cand) <= chunk_size:
-                curr = cand
-                curr_vec = (np.array(curr_vec) + np.array(vecs[i])).tolist()
-            else:
-                chunks.append(curr)
-                tail_tokens = max(1, int(_toklen(curr) * chunk_overlap / 100))
-                tail = " ".join(curr.split()[-tail_tokens:])
-                curr = (tail + "\n\n" + paras[i]).strip()
-                curr_vec = vecs[i]
-
-        if curr:
-            chunks.append(curr)
-
-        return chunks
+        return [c.text for c in await self.chunks(text, chunk_size, chunk_overlap)]
+
+    async def chunks(self, text: str, chunk_size: int, chunk_overlap: int) -> List[Chunk]:
+        return [c async for c in self.chunk_stream(text_pieces(text), chunk_size, chunk_overlap)]
+
+    async def chunk_with_embeddings(self, text: str, chunk_size: int,
+                                    chunk_overlap: int) -> Tuple[List[str], List[Optional[List[float]]]]:
+        chunks = await self.chunks(text, chunk_size, chunk_overlap)
+        reused = sum(c.embedding is not None for c in chunks)
+        logger.info(f"Semantic chunking: {len(chunks)} chunks, {reused} embeddings reused from paragraphs")
+        return [c.text for c in chunks], [c.embedding for c in chunks]
+
+    async def chunk_stream(self, pieces: AsyncIterator[str], chunk_size: int, chunk_overlap: int) -> AsyncIterator[Chunk]:
+        # (start, end, unit vector) of paragraphs that chunks still to come may cover
+        paras: Deque[Tuple[int, int, np.ndarray]] = deque()
+        centroid: Optional[np.ndarray] = None  # running sum of the open chunk's unit vectors
+        members = 0
+        prev_tokens = 0
+        exact = self.chunk_embeddings != "centroid"
+
+        async def feeder(packer: Packer, text: str, start: int, end: int) -> None:
+            nonlocal centroid, members, prev_tokens
+            spans = split_spans(text, PARAGRAPH_BREAK, start, end)
+            if not spans:
+                return
+            vecs = await self.embedder.embed_texts([text[s:e] for s, e in spans])  # ✅ No import from registry
+            unit = _unit_rows(np.asarray(vecs, dtype=np.float32))
+            tokens = count_tokens_batch([text[s:e] for s, e in spans])
+            # similarity of each paragraph to the one before it, in one pass; it is
+            # also the centroid similarity whenever the open chunk is one paragraph
+            before = np.vstack([unit[:1] if centroid is None else _unit_rows(centroid)[None], unit[:-1]])
+            adjacent = np.einsum("ij,ij->i", unit, before)
+
+            for i, span in enumerate(spans):
+                paras.append((span[0] + packer.offset, span[1] + packer.offset, unit[i]))
+                if centroid is None or prev_tokens > packer.size:
+                    # first paragraph, or the previous one was split on its own: start afresh
+                    joins = False
+                elif members == 1:
+                    joins = float(adjacent[i]) >= self.sim_threshold
+                else:
+                    sim = float(centroid @ unit[i]) / (float(np.linalg.norm(centroid)) or 1.0)
+                    joins = sim >= self.sim_threshold
+                if joins and packer.tokens + tokens[i] <= packer.size:
+                    packer.add(span, tokens[i])
+                    centroid += unit[i]
+                    members += 1
+                elif exact and not joins:
+                    packer.flush()  # semantic break: no overlap, so the chunk can equal the paragraph
+                    packer.add(span, tokens[i])
+                    centroid, members = unit[i].copy(), 1
+                else:
+                    packer.add(span, tokens[i], new_chunk=True)
+                    centroid, members = unit[i].copy(), 1
+                prev_tokens = tokens[i]
+
+        async for c in stream_pack(paragraph_windows(pieces), feeder, chunk_size, chunk_overlap):
+            while paras and paras[0][1] <= c.start:
+                paras.popleft()
+            yield replace(c, embedding=self._embedding(c, paras))
+
+    def _embedding(self, c: Chunk, paras: Deque[Tuple[int, int, np.ndarray]]) -> Optional[List[float]]:
+        if self.chunk_embeddings == "centroid":
+            # paragraphs starting inside the chunk; a carried overlap tail does not count,
+            # a piece of one split paragraph takes that paragraph's vector
+            inside, containing = [], None
+            for s, e, v in paras:  # ordered by start
+                if s >= c.end:
+                    break
+                if s >= c.start:
+                    inside.append(v)
+                elif containing is None and e > c.start:
+                    containing = v
+            if not inside and containing is not None:
+                inside = [containing]
+            return _unit_rows(np.sum(inside, axis=0)).tolist() if inside else None
+        for s, e, v in paras:
+            if s >= c.start:
+                return v.tolist() if (s, e) == (c.start, c.end) else None
+        return None
@@ -1,15 +1,15 @@
-from typing import List, Dict, Any
-from math import sqrt
+from typing import List, Dict, Any, Optional
 from app.services.interfaces.rerank_strategy import RerankStrategy
-
-def cosine(a: list[float], b: list[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    na = sqrt(sum(x * x for x in a)) or 1
-    nb = sqrt(sum(x * x for x in b)) or 1
-    return dot / (na * nb)
+from app.services.implementations.rerank.cosine_rerank import CosineRerank, RERANK_CANDIDATE_FACTOR
 
 class CosineReranker(RerankStrategy):
-    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        scored = [(cosine(query_vector, d.get("vector", [])), d) for d in docs]
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [d for _, d in scored]
\ No newline at end of file
+    """Kept for older imports; scoring is done by the vectorised rerank.CosineRerank."""
+    needs_vectors = True
+    candidate_factor = RERANK_CANDIDATE_FACTOR
+
+    def __init__(self):
+        self._impl = CosineRerank()
+
+    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]],
+                     top_k: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await self._impl.rerank(query_vector, docs, top_k, query)
@@ -1,22 +1,53 @@
-from typing import List, Dict, Any
-from app.services.interfaces.service_interfaces import DocumentProcessor
-from langchain_community.document_loaders import UnstructuredFileLoader
-from io import BytesIO
+from typing import Dict, Any
+from app.core.process_pool import parse_pool
+from app.services.interfaces.document_processor import DocumentProcessor
+import asyncio
 import tempfile
 import os
 
+
+def parse_file(path: str, out_path: str) -> int:
+    """
+    Runs in a parse worker process: extract the text of `path` into
+    `out_path` (UTF-8) and return the number of characters written. Writing
+    to a file keeps large documents from being pickled back to the web worker.
+    """
+    from langchain_community.document_loaders import UnstructuredFileLoader  # heavy: only in workers
+
+    written = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for i, doc in enumerate(UnstructuredFileLoader(path).lazy_load()):
+            text = ("\n" if i else "") + doc.page_content
+            out.write(text)
+            written += len(text)
+    return written
+
+
+def _suffix(metadata: Dict[str, Any]) -> str:
+    # Unstructured picks the partitioner from the extension
+    return os.path.splitext(metadata.get("filename") or "")[1].lower()
+
+
 class UnstructuredDocumentProcessor(DocumentProcessor):
     async def process_document(self, file_content: bytes, metadata: Dict[str, Any]) -> str:
-        """Process document using Unstructured"""
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(file_content)
-            temp_file.flush()
-            
-            try:
-                loader = UnstructuredFileLoader(temp_file.name)
-                documents = loader.load()
-                return "\n".join([doc.page_content for doc in documents])
-            finally:
-                os.unlink(temp_file.name)
-                
-        return ""
\ No newline at end of file
+        """Process document using Unstructured, in the parse worker pool"""
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "upload" + _suffix(metadata))
+            out = os.path.join(tmp, "text.txt")
+            await asyncio.to_thread(_write, src, file_content)
+            await self.extract(src, out, metadata)
+            return await asyncio.to_thread(_read, out)
+
+    async def extract(self, path: str, out_path: str, metadata: Dict[str, Any]) -> int:
+        """Parse the file at `path` into `out_path` off the event loop; see parse_file."""
+        return await parse_pool.run(parse_file, path, out_path)
+
+
+def _write(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
@@ -1,20 +1,66 @@
-import os, httpx
-from typing import List
+import os, asyncio, logging
+from typing import List, Tuple
+from app.core.http_client import http_clients, AZURE_OPENAI
+from app.core.tokenizer import count_tokens_batch
 from app.services.interfaces.embedding_strategy import EmbeddingStrategy
 
+logger = logging.getLogger(__name__)
+
 AOAI = os.environ["AZ_OPENAI_ENDPOINT"].rstrip("/")
 KEY  = os.environ["AZ_OPENAI_API_KEY"]
 DEP  = os.environ["AZ_OPENAI_EMBEDDING_DEPLOYMENT"]
 APIV = "2024-02-15-preview"
+DIMS = int(os.getenv("AZ_OPENAI_EMBEDDING_DIMENSIONS", "1536"))  # must match the index
+
+# Per-request limits; Azure accepts up to 2048 inputs but smaller batches
+# parallelise better and lose less work to a single throttled request.
+BATCH_MAX_ITEMS  = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+CONCURRENCY      = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+
+def plan_batches(token_counts: List[int], max_items: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """Greedy [start, end) ranges bounded by item count and summed tokens."""
+    batches, start, tokens = [], 0, 0
+    for i, n in enumerate(token_counts):
+        if i > start and (i - start >= max_items or tokens + n > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
 
 class AzureEmbedding(EmbeddingStrategy):
+    model = DEP
+    dimensions = DIMS
+
+    def __init__(self, max_items: int = BATCH_MAX_ITEMS, max_tokens: int = BATCH_MAX_TOKENS, concurrency: int = CONCURRENCY):
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        # shared instance -> one process-wide cap on in-flight embedding calls
+        self._sem = asyncio.Semaphore(concurrency)
+
     async def embed_text(self, text: str) -> List[float]:
         return (await self.embed_texts([text]))[0]
-    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
         url = f"{AOAI}/openai/deployments/{DEP}/embeddings?api-version={APIV}"
         headers = {"api-key": KEY, "Content-Type":"application/json"}
-        async with httpx.AsyncClient(timeout=120) as client:
-            r = await client.post(url, headers=headers, json={"input": texts})
-            r.raise_for_status()
-            data = r.json()
-            return [d["embedding"] for d in data["data"]]
+        async with self._sem:
+            r = await http_clients.post_with_retry(AZURE_OPENAI, url, headers=headers, json={"input": texts})
+        r.raise_for_status()
+        data = sorted(r.json()["data"], key=lambda d: d["index"])
+        return [d["embedding"] for d in data]
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if len(texts) == 1:
+            return await self._embed_batch(texts)
+        batches = plan_batches(count_tokens_batch(texts), self.max_items, self.max_tokens)
+        if len(batches) > 1:
+            logger.info(f"Embedding {len(texts)} inputs in {len(batches)} batches")
+        results = await asyncio.gather(*(self._embed_batch(texts[s:e]) for s, e in batches))
+        return [vec for batch in results for vec in batch]
@@ -0,0 +1,105 @@
+import asyncio, os, time, logging
+from typing import Dict, List, Tuple
+
+from app.core import metrics
+from app.services.interfaces.embedding_strategy import EmbeddingStrategy
+
+logger = logging.getLogger(__name__)
+
+WINDOW_MS = float(os.getenv("EMBED_QUERY_WINDOW_MS", "5"))  # 0 disables coalescing
+MAX_BATCH = int(os.getenv("EMBED_QUERY_MAX_BATCH", "64"))
+
+
+class BatchingEmbedding(EmbeddingStrategy):
+    """
+    Coalesces small embed calls from concurrent requests (typically one
+    query per /chat) into a single upstream embed_texts call. A batch is
+    flushed after `window_ms` or as soon as `max_batch` texts are waiting.
+    Calls with `max_batch` or more texts bypass the queue.
+    """
+
+    def __init__(self, inner: EmbeddingStrategy, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.inner = inner
+        self.model = getattr(inner, "model", type(inner).__name__)
+        self.dimensions = getattr(inner, "dimensions", None)
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()  # in-flight batches; the loop only holds weak references
+        self._batches = 0
+        self._items = 0
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+        metrics.register(f"embedding_batcher:{self.model}", self.stats)
+
+    async def embed_text(self, text: str) -> List[float]:
+        return (await self.embed_texts([text]))[0]
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.window <= 0 or len(texts) >= self.max_batch:
+            return await self.inner.embed_texts(texts)
+
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        futures = [loop.create_future() for _ in texts]
+        self._pending.extend((t, f, now) for t, f in zip(texts, futures))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        # waiters cancelled while queued (client went away) are dropped
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        self._batches += 1
+        self._items += len(batch)
+        for _, _, enqueued in batch:
+            delay = started - enqueued
+            self._delay_total += delay
+            self._delay_max = max(self._delay_max, delay)
+
+        # identical concurrent queries share one slot in the upstream call
+        unique: Dict[str, int] = {}
+        for text, _, _ in batch:
+            unique.setdefault(text, len(unique))
+        try:
+            vecs = await self.inner.embed_texts(list(unique))
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for text, fut, _ in batch:
+            if not fut.done():
+                fut.set_result(vecs[unique[text]])
+
+    def stats(self) -> Dict[str, float]:
+        batches = max(1, self._batches)
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_fill": round(self._items / batches / self.max_batch, 4),
+            "avg_queue_delay_ms": round(self._delay_total / max(1, self._items) * 1000, 3),
+            "max_queue_delay_ms": round(self._delay_max * 1000, 3),
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "in_flight": len(self._tasks),
+        }
@@ -0,0 +1,119 @@
+import asyncio, hashlib, logging, os, sqlite3, threading, unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core import metrics
+from app.services.interfaces.embedding_strategy import EmbeddingStrategy
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embedding_cache.db")  # "" disables the disk tier
+_SQL_BATCH = 500  # stay well under SQLite's bound-parameter limit
+
+
+def _normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class _SqliteTier:
+    """Persistent key -> float32 blob store shared by all workers on the host."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                part = keys[i:i + _SQL_BATCH]
+                q = f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})"
+                found.update(self._conn.execute(q, part).fetchall())
+        return found
+
+    def put_many(self, rows: Dict[str, bytes]) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)", rows.items())
+            self._conn.commit()
+
+
+class CachedEmbedding(EmbeddingStrategy):
+    """
+    Content-addressed cache in front of another EmbeddingStrategy.
+    Key = sha256(model | dimensions | normalized text); vectors are kept as
+    float32 bytes in a byte-bounded in-memory LRU backed by SQLite.
+    """
+
+    def __init__(self, inner: EmbeddingStrategy, max_bytes: int = CACHE_MAX_BYTES, path: Optional[str] = CACHE_PATH):
+        self.inner = inner
+        self.model = getattr(inner, "model", type(inner).__name__)
+        self.dimensions = getattr(inner, "dimensions", None)
+        self.max_bytes = max_bytes
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._mem_bytes = 0
+        self._disk = _SqliteTier(path) if path else None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "deduplicated": 0, "evictions": 0}
+        metrics.register(f"embedding_cache:{self.model}", self.stats)
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.model}\x1f{self.dimensions}\x1f{_normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = blob
+        self._mem_bytes += len(blob)
+        while self._mem_bytes > self.max_bytes and self._mem:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    async def embed_text(self, text: str) -> List[float]:
+        return (await self.embed_texts([text]))[0]
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        unique: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            unique.setdefault(k, t)
+        self.counters["deduplicated"] += len(keys) - len(unique)
+
+        found: Dict[str, bytes] = {}
+        for k in unique:
+            blob = self._mem.get(k)
+            if blob is not None:
+                self._mem.move_to_end(k)
+                found[k] = blob
+        self.counters["memory_hits"] += len(found)
+
+        pending = [k for k in unique if k not in found]
+        if pending and self._disk:
+            on_disk = await asyncio.to_thread(self._disk.get_many, pending)
+            self.counters["disk_hits"] += len(on_disk)
+            for k, blob in on_disk.items():
+                self._remember(k, blob)
+            found.update(on_disk)
+            pending = [k for k in pending if k not in on_disk]
+
+        if pending:
+            self.counters["misses"] += len(pending)
+            vecs = await self.inner.embed_texts([unique[k] for k in pending])
+            fresh = {k: np.asarray(v, dtype=np.float32).tobytes() for k, v in zip(pending, vecs)}
+            for k, blob in fresh.items():
+                self._remember(k, blob)
+            found.update(fresh)
+            if self._disk:
+                await asyncio.to_thread(self._disk.put_many, fresh)
+
+        return [np.frombuffer(found[k], dtype=np.float32).tolist() for k in keys]
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "memory_items": len(self._mem), "memory_bytes": self._mem_bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,232 @@
+import asyncio, codecs, json, os, re, tempfile, logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.process_pool import parse_pool
+from app.services.interfaces.document_processor import DocumentProcessor
+from app.services.implementations.document_processor import UnstructuredDocumentProcessor, _read, _suffix, _write
+
+logger = logging.getLogger(__name__)
+
+# fast-path files up to this size are parsed on a thread; bigger ones go to the parse pool
+INLINE_PARSE_BYTES = int(os.getenv("INLINE_PARSE_BYTES", str(2 * 1024 * 1024)))
+
+SNIFF_BYTES = 4096
+TEXT_KINDS = ("text", "markdown", "html", "json", "ndjson")
+
+_EXTENSIONS = {
+    ".txt": "text", ".text": "text", ".log": "text", ".csv": "text", ".tsv": "text",
+    ".md": "markdown", ".markdown": "markdown", ".mdx": "markdown", ".rst": "text",
+    ".html": "html", ".htm": "html", ".xhtml": "html",
+    ".json": "json", ".jsonl": "ndjson", ".ndjson": "ndjson",
+}
+# container formats the fast path must never try to decode as text
+_BINARY_MAGIC = (b"%PDF", b"PK\x03\x04", b"\xd0\xcf\x11\xe0", b"{\\rtf", b"\x89PNG", b"\xff\xd8\xff", b"GIF8")
+_HTML_START = re.compile(rb"^\s*(<!doctype\s+html|<html|<head|<body|<!--)", re.I)
+_MD_HINT = re.compile(r"^(#{1,6}\s|[-*+]\s|\d+\.\s|```)", re.M)
+
+
+def sniff(head: bytes, filename: str = "") -> str:
+    """Document kind from the first bytes (and the extension when content is ambiguous): a TEXT_KINDS value or "binary"."""
+    if head.startswith(_BINARY_MAGIC):
+        return "binary"
+    if b"\x00" in head and not head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "binary"
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    if ext:
+        return "binary"  # .docx, .pptx, .xlsx, .pdf, ...: let Unstructured decide
+    if _HTML_START.match(head):
+        return "html"
+    text = decode(head)
+    stripped = text.lstrip()
+    if stripped[:1] in ("{", "["):
+        return "json"
+    return "markdown" if _MD_HINT.search(text) else "text"
+
+
+def decode(data: bytes) -> str:
+    for bom, encoding in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if data.startswith(bom):
+            return data.decode(encoding, errors="replace")
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+
+_SPACES = re.compile(r"[ \t\r\f\v ]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_HTML_DROP = ["script", "style", "noscript", "template", "svg", "iframe", "nav", "footer", "form"]
+_HTML_BLOCKS = ["p", "div", "section", "article", "main", "header", "aside", "blockquote", "pre",
+                "ul", "ol", "dl", "table", "figure", "figcaption", "address", "hr"]
+
+
+def _tidy(text: str) -> str:
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip() + "\n"
+
+
+def html_to_markdown(html: str) -> str:
+    """Visible text with headings as `#` lines and blocks as paragraphs, so RecursiveChunker sees sections."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(" ", strip=True) if soup.title else ""
+    for tag in soup(_HTML_DROP + ["head"]):
+        tag.decompose()
+    for level in range(1, 7):
+        for h in soup.find_all(f"h{level}"):
+            text = h.get_text(" ", strip=True)
+            h.replace_with(f"\n\n{'#' * level} {text}\n\n" if text else "")
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+    for li in soup.find_all("li"):
+        li.insert_before("\n- ")
+    for row in soup.find_all("tr"):
+        row.insert_before("\n")
+    for cell in soup.find_all(["td", "th"]):
+        if cell.find_previous_sibling(["td", "th"]):
+            cell.insert_before(" | ")
+    for block in soup.find_all(_HTML_BLOCKS):
+        block.insert_before("\n\n")
+        block.insert_after("\n\n")
+    body = soup.get_text()
+    if title and not body.lstrip().startswith("#"):
+        body = f"# {title}\n\n{body}"
+    return _tidy(body)
+
+
+def _flatten(value: Any, path: str) -> Iterator[str]:
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from _flatten(v, f"{path}.{k}" if path else str(k))
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            yield from _flatten(v, f"{path}[{i}]")
+    elif value is not None and value != "":
+        yield f"{path}: {value}" if path else str(value)
+
+
+def json_to_text(data: Any) -> str:
+    """
+    One paragraph per record: top-level list items, or top-level keys with
+    `# key` headings for nested values. Leaves become "path: value" lines.
+    """
+    blocks: List[str] = []
+    if isinstance(data, list):
+        blocks = ["\n".join(_flatten(item, "")) for item in data]
+    elif isinstance(data, dict):
+        scalars = []
+        for k, v in data.items():
+            if isinstance(v, (dict, list)):
+                blocks.append(f"# {k}\n\n" + "\n\n".join(
+                    "\n".join(_flatten(item, "")) for item in (v if isinstance(v, list) else [v])))
+            else:
+                scalars.extend(_flatten(v, str(k)))
+        if scalars:
+            blocks.insert(0, "\n".join(scalars))
+    else:
+        blocks = list(_flatten(data, ""))
+    return "\n\n".join(b for b in blocks if b) + "\n"
+
+
+def ndjson_to_text(text: str) -> str:
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                records.append(line)
+    return json_to_text(records)
+
+
+def parse_fast(path: str, out_path: str, kind: str) -> int:
+    """Text of a text-like document into `out_path` (UTF-8); returns characters written. Picklable for the parse pool."""
+    if kind in ("text", "markdown"):
+        # copied through an incremental decoder: never holds the whole file
+        return _transcode(path, out_path)
+    with open(path, "rb") as f:
+        raw = decode(f.read())
+    if kind == "html":
+        text = html_to_markdown(raw)
+    elif kind == "ndjson":
+        text = ndjson_to_text(raw)
+    else:
+        try:
+            text = json_to_text(json.loads(raw))
+        except ValueError:
+            text = raw  # not actually JSON: index it as text
+    with open(out_path, "w", encoding="utf-8") as out:
+        out.write(text)
+    return len(text)
+
+
+def _transcode(path: str, out_path: str, block: int = 1024 * 1024) -> int:
+    written = 0
+    with open(path, "rb") as src, open(out_path, "w", encoding="utf-8", newline="\n") as out:
+        head = src.read(block)
+        encoding = "utf-8"
+        for bom, enc in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+            if head.startswith(bom):
+                encoding = enc
+                break
+        else:
+            try:
+                head.decode("utf-8")
+            except UnicodeDecodeError as e:
+                if e.start < len(head) - 4:  # not just a character cut at the block edge
+                    encoding = "cp1252"
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        data = head
+        while data:
+            text = decoder.decode(data).replace("\r\n", "\n")
+            out.write(text)
+            written += len(text)
+            data = src.read(block)
+        text = decoder.decode(b"", final=True)
+        out.write(text)
+        written += len(text)
+    return written
+
+
+class DispatchingDocumentProcessor(DocumentProcessor):
+    """
+    Sniffs each upload and parses text, Markdown, HTML and JSON in-process
+    (HTML/JSON rendered as Markdown-style headings and paragraphs); only
+    binary formats (PDF, Office, images, ...) go to Unstructured.
+    """
+
+    def __init__(self, fallback: Optional[DocumentProcessor] = None, inline_bytes: int = INLINE_PARSE_BYTES):
+        self.fallback = fallback or UnstructuredDocumentProcessor()
+        self.inline_bytes = inline_bytes
+        self.counts: Dict[str, int] = {}
+        metrics.register("document_parsing", lambda: dict(self.counts))
+
+    async def process_document(self, file_content: bytes, metadata: Dict[str, Any]) -> str:
+        """Process document with the fast path, or Unstructured for binary formats"""
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "upload" + _suffix(metadata))
+            out = os.path.join(tmp, "text.txt")
+            await asyncio.to_thread(_write, src, file_content)
+            await self.extract(src, out, metadata)
+            return await asyncio.to_thread(_read, out)
+
+    async def extract(self, path: str, out_path: str, metadata: Dict[str, Any]) -> int:
+        head, size = await asyncio.to_thread(_head, path)
+        kind = sniff(head, metadata.get("filename") or "")
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if kind not in TEXT_KINDS:
+            return await self.fallback.extract(path, out_path, metadata)
+        if size <= self.inline_bytes:
+            return await asyncio.to_thread(parse_fast, path, out_path, kind)
+        return await parse_pool.run(parse_fast, path, out_path, kind)
+
+
+def _head(path: str) -> Tuple[bytes, int]:
+    """The first SNIFF_BYTES of the file and its size."""
+    with open(path, "rb") as f:
+        return f.read(SNIFF_BYTES), os.fstat(f.fileno()).st_size
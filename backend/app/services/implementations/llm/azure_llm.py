@@ -1,17 +1,79 @@
-import os, httpx
+import os, json, time, logging
+from typing import AsyncIterator, Dict, Any
+
+from app.core import metrics
+from app.core.http_client import http_clients, AZURE_OPENAI
 from app.services.interfaces.llm_service import LLMService
 
+logger = logging.getLogger(__name__)
+
 AOAI = os.environ["AZ_OPENAI_ENDPOINT"].rstrip("/")
 KEY  = os.environ["AZ_OPENAI_API_KEY"]
 DEP  = os.environ["AZ_OPENAI_CHAT_DEPLOYMENT"]
 APIV = "2024-02-15-preview"
 
 class AzureLLM(LLMService):
-    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+    def __init__(self):
+        self._streams = 0
+        self._aborted = 0  # client disconnects and upstream errors
+        self._ttft_count = 0
+        self._ttft_total = 0.0
+        self._ttft_max = 0.0
+        metrics.register(f"llm_stream:{DEP}", self.stats)
+
+    def _request(self, system_prompt: str, user_prompt: str, **extra) -> Dict[str, Any]:
         url = f"{AOAI}/openai/deployments/{DEP}/chat/completions?api-version={APIV}"
         headers = {"api-key": KEY, "Content-Type": "application/json"}
-        payload = {"messages":[{"role":"system","content":system_prompt},{"role":"user","content":user_prompt}], "temperature":0.2}
-        async with httpx.AsyncClient(timeout=120) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            return r.json()["choices"][0]["message"]["content"]
+        payload = {"messages":[{"role":"system","content":system_prompt},{"role":"user","content":user_prompt}], "temperature":0.2, **extra}
+        return {"url": url, "headers": headers, "json": payload}
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        r = await http_clients.post(AZURE_OPENAI, **self._request(system_prompt, user_prompt))
+        r.raise_for_status()
+        return r.json()["choices"][0]["message"]["content"]
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """
+        Server-sent chat completion deltas. Closing this generator early
+        (client went away) closes the upstream response, which aborts the
+        generation instead of paying for tokens nobody reads.
+        """
+        started = time.perf_counter()
+        first = True
+        self._streams += 1
+        completed = False
+        try:
+            async with http_clients.stream(AZURE_OPENAI, **self._request(system_prompt, user_prompt, stream=True)) as r:
+                if r.status_code >= 400:
+                    await r.aread()
+                    logger.error(f"❌ Azure OpenAI stream failed: {r.status_code} {r.text}")
+                    r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    # content-filter preamble and the final chunk carry no delta
+                    for choice in json.loads(data).get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            if first:
+                                ttft = time.perf_counter() - started
+                                self._ttft_count += 1
+                                self._ttft_total += ttft
+                                self._ttft_max = max(self._ttft_max, ttft)
+                                first = False
+                            yield delta
+            completed = True
+        finally:
+            if not completed:
+                self._aborted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": self._streams,
+            "aborted": self._aborted,
+            "avg_ttft_ms": round(self._ttft_total / max(1, self._ttft_count) * 1000, 1),
+            "max_ttft_ms": round(self._ttft_max * 1000, 1),
+        }
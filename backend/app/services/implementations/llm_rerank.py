@@ -1,7 +1,146 @@
-from typing import List, Dict, Any
+import asyncio, hashlib, json, os, re, time, logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core import metrics
+from app.services.interfaces.llm_service import LLMService
 from app.services.interfaces.rerank_strategy import RerankStrategy
 
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE       = int(os.getenv("RERANK_LLM_BATCH", "10"))          # passages per prompt
+CONCURRENCY      = int(os.getenv("RERANK_LLM_CONCURRENCY", "4"))
+BUDGET_MS        = float(os.getenv("RERANK_LLM_BUDGET_MS", "1500"))  # then fall back to retrieval order
+CACHE_SIZE       = int(os.getenv("RERANK_LLM_CACHE_SIZE", "20000"))  # (query, chunk, text) scores
+PASSAGE_CHARS    = int(os.getenv("RERANK_LLM_PASSAGE_CHARS", "1000"))
+CANDIDATE_FACTOR = int(os.getenv("RERANK_LLM_CANDIDATE_FACTOR", "2"))
+
+SYSTEM_PROMPT = (
+    "You are a search relevance judge. For each numbered passage, rate how well it "
+    "helps answer the query, from 0 (irrelevant) to 10 (directly answers it). "
+    'Reply with JSON only, in passage order: {"scores": [<n1>, <n2>, ...]}'
+)
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_scores(text: str, expected: int) -> Optional[List[float]]:
+    """Scores from the judge reply; None when the count does not match the batch."""
+    try:
+        scores = json.loads(text[text.index("{"):text.rindex("}") + 1])["scores"]
+    except (ValueError, KeyError, TypeError):
+        scores = _NUMBER.findall(text)  # tolerate prose or a bare list
+    try:
+        scores = [float(s) for s in scores]
+    except (TypeError, ValueError):
+        return None
+    return scores if len(scores) == expected else None
+
+
+def _passage(d: Dict[str, Any]) -> str:
+    return d.get("content", "")[:PASSAGE_CHARS]
+
+
 class LLMReranker(RerankStrategy):
-    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        # Placeholder for future reranking using LLM relevance judgements
-        return docs
\ No newline at end of file
+    """
+    Relevance judged by the LLM, many passages per call. Batches run
+    concurrently (bounded), scores are cached per (query hash, chunk id,
+    passage hash) so a chunk re-ingested with new text is judged again, and
+    when the budget runs out the retrieval order is returned instead and the
+    calls still in flight are cancelled: an LLM already too slow for the
+    budget is not handed more concurrent work nobody is waiting for.
+    """
+
+    candidate_factor = CANDIDATE_FACTOR
+
+    def __init__(self, llm: LLMService, batch_size: int = BATCH_SIZE, concurrency: int = CONCURRENCY,
+                 budget_ms: float = BUDGET_MS, cache_size: int = CACHE_SIZE):
+        self.llm = llm
+        self.batch_size = max(1, batch_size)
+        self.budget = budget_ms / 1000
+        self.cache_size = cache_size
+        self._sem = asyncio.Semaphore(concurrency)
+        self._cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self.counters = {"requests": 0, "llm_calls": 0, "cache_hits": 0, "scored": 0,
+                         "budget_fallbacks": 0, "cancelled_batches": 0, "parse_failures": 0, "errors": 0}
+        metrics.register("llm_rerank", self.stats)
+
+    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]],
+                     top_k: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        k = len(docs) if top_k is None else top_k
+        if not query or len(docs) <= 1:
+            return docs[:k]
+        self.counters["requests"] += 1
+        qkey = hashlib.sha256(" ".join(query.lower().split()).encode()).hexdigest()[:32]
+
+        scores: Dict[str, float] = {}
+        todo = []
+        for d in docs:
+            key = self._key(qkey, d)
+            cached = self._cache.get(key)
+            if cached is None:
+                todo.append(d)
+            else:
+                self._cache.move_to_end(key)
+                scores[d["id"]] = cached
+        self.counters["cache_hits"] += len(docs) - len(todo)
+
+        if todo:
+            batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+            tasks = [asyncio.create_task(self._score_batch(query, qkey, b)) for b in batches]
+            started = time.perf_counter()
+            try:
+                done, pending = await asyncio.wait(tasks, timeout=self.budget)
+            except asyncio.CancelledError:
+                for t in tasks:
+                    t.cancel()  # the request itself went away
+                raise
+            for t in done:
+                if not t.cancelled() and t.exception() is None:
+                    scores.update(t.result())
+            if pending:
+                self.counters["budget_fallbacks"] += 1
+                self.counters["cancelled_batches"] += len(pending)
+                for t in pending:
+                    t.cancel()
+                logger.warning(f"LLM rerank over budget ({(time.perf_counter() - started) * 1000:.0f} ms), "
+                               f"using retrieval order")
+                return docs[:k]
+
+        if len(scores) < len(docs):
+            return docs[:k]  # a batch failed: retrieval order is the safe answer
+        # stable: ties keep the retrieval order
+        ranked = sorted(range(len(docs)), key=lambda i: -scores[docs[i]["id"]])
+        return [{**docs[i], "llm_score": scores[docs[i]["id"]]} for i in ranked[:k]]
+
+    @staticmethod
+    def _key(qkey: str, d: Dict[str, Any]) -> Tuple[str, str, str]:
+        return qkey, d["id"], hashlib.sha256(_passage(d).encode()).hexdigest()[:16]
+
+    async def _score_batch(self, query: str, qkey: str, batch: List[Dict[str, Any]]) -> Dict[str, float]:
+        passages = "\n\n".join(f"[{i + 1}] {_passage(d)}" for i, d in enumerate(batch))
+        user_prompt = f"Query: {query}\n\nPassages:\n{passages}"
+        async with self._sem:
+            self.counters["llm_calls"] += 1
+            try:
+                reply = await self.llm.generate(SYSTEM_PROMPT, user_prompt)
+            except Exception:
+                self.counters["errors"] += 1
+                logger.exception("LLM rerank call failed")
+                return {}
+        scores = parse_scores(reply, len(batch))
+        if scores is None:
+            self.counters["parse_failures"] += 1
+            logger.warning(f"LLM rerank: unusable judge reply for {len(batch)} passages")
+            return {}
+        out = {}
+        for d, s in zip(batch, scores):
+            out[d["id"]] = s
+            self._cache[self._key(qkey, d)] = s
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self.counters["scored"] += len(batch)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "cache_size": len(self._cache)}
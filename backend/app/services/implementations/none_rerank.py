@@ -1,6 +1,7 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from app.services.interfaces.rerank_strategy import RerankStrategy
 
 class NoReranker(RerankStrategy):
-    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        return docs
\ No newline at end of file
+    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]],
+                     top_k: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        return docs if top_k is None else docs[:top_k]
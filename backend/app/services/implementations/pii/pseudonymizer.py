@@ -1,23 +1,58 @@
-import hashlib, base64, os
+import hashlib, hmac, base64, os
+from collections import OrderedDict
 from typing import List, Dict, Any, Tuple
 
+from app.core import metrics
 from app.services.interfaces.pseudonymizer import Pseudonymizer
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import logging
 logger = logging.getLogger(__name__)
 
+# token -> ciphertext, so a value seen again in the same scope is not re-encrypted
+CIPHER_CACHE_SIZE = int(os.getenv("PII_CIPHER_CACHE_SIZE", "50000"))
+DEV_KEY = "dev-secret"
 
 
 class SimplePseudonymizer(Pseudonymizer):
+    """
+    Tokens are keyed HMACs of (scope, type, value): the same value always gets
+    the same token within a scope (tenant), so masked text is stable across
+    documents and re-ingests. Each distinct value is encrypted once.
 
-    def __init__(self):
-        raw = os.getenv("PII_CIPHER_KEY", "dev-secret").encode("utf-8")
-        self.key = hashlib.sha256(raw).digest()
+    Deterministic tokens need a secret key: anyone holding it can hash
+    candidate values (emails, phone numbers) and match them to tokens. With
+    PII_CIPHER_KEY unset or left at the development default, tokens are keyed
+    with a random per-process key instead (stable only until restart) and an
+    error is logged.
+    """
+
+    def __init__(self, cache_size: int = CIPHER_CACHE_SIZE):
+        raw = os.getenv("PII_CIPHER_KEY", "")
+        self.key = hashlib.sha256((raw or DEV_KEY).encode("utf-8")).digest()
+        self.deterministic = raw not in ("", DEV_KEY)
+        if self.deterministic:
+            # separate key for tokens: a token reveals nothing about the cipher key
+            self.token_key = hmac.new(self.key, b"pseudonym-token", hashlib.sha256).digest()
+        else:
+            logger.error("PII_CIPHER_KEY is unset or the development default: pseudonym tokens use a random "
+                         "per-process key (not stable across restarts) and ciphertexts a public key. "
+                         "Set PII_CIPHER_KEY to a secret in any shared or production deployment.")
+            self.token_key = os.urandom(32)
+        self.aes = AESGCM(self.key)
+        self.cache_size = cache_size
+        self._ciphers: "OrderedDict[str, str]" = OrderedDict()
+        self.counters = {"entities": 0, "distinct": 0, "encrypted": 0, "cache_hits": 0}
+        metrics.register("pseudonymizer", self.stats)
+
+    def token(self, entity_type: str, value: str, scope: str = "") -> str:
+        digest = hmac.new(self.token_key, f"{scope}\x00{entity_type}\x00{value}".encode(), hashlib.sha256).digest()
+        return f"[[P:{entity_type}:{base64.urlsafe_b64encode(digest[:9]).decode()}]]"
 
     async def tokenize(
         self,
         text: str,
-        entities: List[Dict[str, Any]]
+        entities: List[Dict[str, Any]],
+        scope: str = ""
     ) -> Tuple[str, List[Dict[str, Any]]]:
 
         # Default return values
@@ -25,30 +60,57 @@ class SimplePseudonymizer(Pseudonymizer):
             # ✅ No PII → return original text and empty map
             return text, []
 
-        aes = AESGCM(self.key)
-        # replace from end to preserve index offsets
-        entities_sorted = sorted(entities, key=lambda x: x["start"], reverse=True)
-
-        updated = text
-        token_map: List[Dict[str, Any]] = []
+        # one pass left to right, joining untouched segments and tokens;
+        # an entity overlapping one already replaced is skipped
+        parts: List[str] = []
+        distinct: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (type, value) -> token map entry
+        pos = 0
+        for e in sorted(entities, key=lambda x: (x["start"], -x["end"])):
+            if e["start"] < pos:
+                continue
+            key = (e["type"], text[e["start"]:e["end"]])
+            tm = distinct.get(key)
+            if tm is None:
+                tm = distinct[key] = {"type": key[0], "raw": key[1], "token": self.token(key[0], key[1], scope)}
+            parts.append(text[pos:e["start"]])
+            parts.append(tm["token"])
+            pos = e["end"]
+        parts.append(text[pos:])
+        self.counters["entities"] += len(entities)
+        self.counters["distinct"] += len(distinct)
 
-        for e in entities_sorted:
-            raw_value = e["value"]
+        # token map: one entry per distinct value, in order of first occurrence
+        token_map = list(distinct.values())
+        missing = []
+        for tm in token_map:
+            cipher = self._ciphers.get(tm["token"])
+            if cipher is None:
+                missing.append(tm)
+            else:
+                self._ciphers.move_to_end(tm["token"])
+                self.counters["cache_hits"] += 1
+                tm["cipher"] = cipher
+        for tm, cipher in zip(missing, await self.encrypt_many([tm["raw"] for tm in missing])):
+            tm["cipher"] = cipher
+            self._ciphers[tm["token"]] = cipher
+        while len(self._ciphers) > self.cache_size:
+            self._ciphers.popitem(last=False)
 
-            nonce = os.urandom(12)
-            cipher = aes.encrypt(nonce, raw_value.encode(), None)
-            cipher_b64 = base64.urlsafe_b64encode(nonce + cipher).decode()
+        return "".join(parts), token_map
 
-            token = f"[[P:{e['type']}:{cipher_b64[:12]}]]"
-
-            updated = updated[:e["start"]] + token + updated[e["end"]:]
-            token_map.append({"type": e["type"], "raw": raw_value, "cipher": cipher_b64, "token": token})
+    async def encrypt(self, value: str) -> str:
+        return (await self.encrypt_many([value]))[0]
 
-        return updated, list(reversed(token_map))
+    async def encrypt_many(self, values: List[str]) -> List[str]:
+        """AES-GCM with a fresh nonce per value; one cipher object and one urandom call for the batch."""
+        nonces = os.urandom(12 * len(values))
+        out = []
+        for i, value in enumerate(values):
+            nonce = nonces[12 * i:12 * i + 12]
+            cipher = self.aes.encrypt(nonce, value.encode(), None)
+            out.append(base64.urlsafe_b64encode(nonce + cipher).decode())
+        self.counters["encrypted"] += len(values)
+        return out
 
-    async def encrypt(self, value: str) -> str:
-        aes = AESGCM(self.key)
-        nonce = os.urandom(12)
-        cipher = aes.encrypt(nonce, value.encode(), None)
-        return base64.urlsafe_b64encode(nonce + cipher).decode()
-    
\ No newline at end of file
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "cache_size": len(self._ciphers), "deterministic": self.deterministic}
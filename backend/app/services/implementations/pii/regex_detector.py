@@ -1,16 +1,159 @@
-import re
-from typing import List, Dict, Any
+import re, os, asyncio, ipaddress
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Any
+from app.core import metrics
 from app.services.interfaces.pii_detector import PIIDetector
 
-EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-PHONE = re.compile(r"(?:\+\d{1,3}[-.\s]?)?(?:\d{2,4}[-.\s]?){2,4}\d{2,4}")
+# inputs longer than this are scanned on a worker thread instead of the event loop
+PII_INLINE_CHARS = int(os.getenv("PII_INLINE_CHARS", str(256 * 1024)))
+
+
+class PIIPattern(NamedTuple):
+    type: str
+    pattern: str                                    # no capturing groups: joined into one alternation
+    validator: Optional[Callable[[str], bool]] = None
+    # character class every match starts with; adjacent patterns with the same
+    # guard share one lookahead, so most positions are rejected with one test
+    first: Optional[str] = None
+
+
+# Every pattern is anchored at a token boundary (lookbehind) and has no
+# ambiguous repetition, so a failed attempt costs O(match length) and a scan
+# is linear in the input even on long digit / separator runs.
+EMAIL = r"(?<![\w.%+-])[A-Za-z0-9._%+-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}(?![\w-])"
+# 13-19 digits plain, in 4-digit groups, or Amex 4-6-5
+CARD  = (r"(?<![\d-])(?:\d{13,19}|\d{4}(?:[ -]\d{4}){2,3}(?:[ -]\d{1,3})?|\d{4}[ -]\d{6}[ -]\d{4,5})"
+         r"(?![ -]?\d)")
+IPV4  = r"(?<![\w.])(?:\d{1,3}\.){3}\d{1,3}(?!\.?\d)"
+# separated groups ("+44 20 7946 0958", "(555) 123-4567") or one 10-15 digit run;
+# numbers glued to a longer run (table rows, versions) are not phones
+PHONE = (r"(?<![\w.+-])(?<!\d[ .-])"
+         r"(?:\+\d{1,3}[ .-]?)?(?:\(\d{1,4}\)[ .-]?\d{2,4}|\d{2,4})(?:[ .-]\d{2,4}){1,4}(?![ .-]?\d)"
+         r"|(?<![\w.+-])\+?\d{10,15}(?!\.?\d)")
+
+
+def luhn(value: str) -> bool:
+    digits = [int(c) for c in value if c.isdigit()]
+    if not 13 <= len(digits) <= 19:
+        return False
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def public_ip(value: str) -> bool:
+    """Valid dotted quad that can identify a host (not loopback, unspecified, multicast or reserved)."""
+    try:
+        ip = ipaddress.IPv4Address(value)
+    except ValueError:  # octet > 255, leading zeros
+        return False
+    return not (ip.is_loopback or ip.is_unspecified or ip.is_multicast or ip.is_reserved or ip.is_link_local)
+
+
+_PHONE_PREFIX = re.compile(r"^(?:\+\d{1,3}[ .-]?)?(?:\(\d{1,4}\)[ .-]?)?")
+_PHONE_SEPARATORS = re.compile(r"[ .-]")
+_DATE = re.compile(r"^(?:\d{4}([.-])\d{2}\1\d{2}|\d{2}([.-])\d{2}\2\d{4})$")
+
+
+def phone_number(value: str) -> bool:
+    """
+    7-15 digits (E.164), one separator style after the country/area prefix,
+    not a date, and space-separated groups only from 9 digits up (short
+    space-separated runs are usually table cells).
+    """
+    digits = sum(c.isdigit() for c in value)
+    if not 7 <= digits <= 15 or _DATE.match(value):
+        return False
+    prefix = _PHONE_PREFIX.match(value).group()
+    separators = set(_PHONE_SEPARATORS.findall(value[len(prefix):]))
+    if len(separators) > 1:
+        return False
+    return bool(prefix) or separators != {" "} or digits >= 9
+
+
+NUMBER_START = r"[\d+(]"
+
+# first listed wins when two detectors match at the same position
+DEFAULT_PATTERNS: List[PIIPattern] = [
+    PIIPattern("email", EMAIL, first=r"[A-Za-z0-9._%+-]"),
+    PIIPattern("credit_card", CARD, luhn, NUMBER_START),
+    PIIPattern("ip_address", IPV4, public_ip, NUMBER_START),
+    PIIPattern("phone", PHONE, phone_number, NUMBER_START),
+]
+
+
+def combine(patterns: List[PIIPattern]) -> str:
+    """One alternation, pattern i in group "g<i>", runs of equal guards behind one lookahead."""
+    branches: List[str] = []
+    i = 0
+    while i < len(patterns):
+        j = i
+        while j + 1 < len(patterns) and patterns[j + 1].first == patterns[i].first:
+            j += 1
+        run = "|".join(f"(?P<g{k}>{patterns[k].pattern})" for k in range(i, j + 1))
+        branches.append(f"(?={patterns[i].first})(?:{run})" if patterns[i].first else run)
+        i = j + 1
+    return "|".join(branches)
+
 
 class RegexPIIDetector(PIIDetector):
+    """
+    All patterns compiled into one alternation and found in a single left-to-
+    right scan. Overlaps resolve deterministically: the leftmost match wins,
+    and at the same position the earlier pattern does. A match its validator
+    rejects falls through to the later patterns at that position.
+    """
+
+    def __init__(self, patterns: Iterable[PIIPattern] = DEFAULT_PATTERNS,
+                 validators: Optional[Dict[str, Callable[[str], bool]]] = None,
+                 inline_chars: int = PII_INLINE_CHARS):
+        self.patterns = list(patterns)
+        self.validators = {p.type: p.validator for p in self.patterns if p.validator}
+        self.validators.update(validators or {})
+        self.combined = re.compile(combine(self.patterns))
+        self.single = [re.compile(p.pattern) for p in self.patterns]
+        self.inline_chars = inline_chars
+        self.counters = {"scans": 0, "chars": 0, "found": 0, "rejected": 0}
+        metrics.register("pii", lambda: dict(self.counters))
+
     async def detect_pii(self, text: str) -> List[Dict[str, Any]]:
+        if len(text) > self.inline_chars:
+            return await asyncio.to_thread(self.scan, text)
+        return self.scan(text)
+
+    def _accept(self, i: int, value: str) -> bool:
+        check = self.validators.get(self.patterns[i].type)
+        if check is None or check(value):
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
         entities: List[Dict[str, Any]] = []
-        for m in EMAIL.finditer(text):
-            entities.append({"type":"email","value":m.group(),"start":m.start(),"end":m.end()})
-        for m in PHONE.finditer(text):
-            entities.append({"type":"phone","value":m.group(),"start":m.start(),"end":m.end()})
-        # (Optional) add NAME heuristics if needed later
+        pos, n = 0, len(text)
+        while pos < n:
+            m = self.combined.search(text, pos)
+            if m is None:
+                break
+            i = int(m.lastgroup[1:])
+            start, end = m.start(), m.end()
+            if not self._accept(i, m.group()):
+                end = None
+                for j in range(i + 1, len(self.patterns)):
+                    alt = self.single[j].match(text, start)
+                    if alt and alt.end() > start and self._accept(j, alt.group()):
+                        i, end = j, alt.end()
+                        break
+                if end is None:
+                    pos = start + 1
+                    continue
+            entities.append({"type": self.patterns[i].type, "value": text[start:end], "start": start, "end": end})
+            pos = end
+        self.counters["scans"] += 1
+        self.counters["chars"] += n
+        self.counters["found"] += len(entities)
         return entities
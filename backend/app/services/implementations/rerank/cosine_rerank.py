@@ -1,9 +1,74 @@
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Optional
 import numpy as np
 from app.services.interfaces.rerank_strategy import RerankStrategy
 
+# 1.0 = pure relevance; lower trades relevance for diversity (MMR)
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+RERANK_CANDIDATE_FACTOR = int(os.getenv("RERANK_CANDIDATE_FACTOR", "4"))
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+def mmr_order(rel: np.ndarray, vecs: np.ndarray, k: int, lam: float) -> List[int]:
+    """
+    Greedy maximal marginal relevance over unit vectors:
+    argmax lam * rel(d) - (1 - lam) * max_{s in selected} cos(d, s)
+    """
+    k = min(k, len(rel))
+    sims = vecs @ vecs.T
+    redundancy = np.full(len(rel), -np.inf, dtype=np.float32)
+    available = np.ones(len(rel), dtype=bool)
+    order: List[int] = []
+    for _ in range(k):
+        score = lam * rel - (1 - lam) * redundancy if order else lam * rel
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        order.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, sims[best])
+    return order
+
+
 class CosineRerank(RerankStrategy):
-    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        # Azure Search already returns by vector similarity; keep passthrough
-        # Placeholder: compute re-similarity if docs contained embeddings.
-        return docs
+    """
+    Scores candidates against the query with one matrix-vector product over
+    the candidate vectors (hit["vector"], attached by the store when
+    `needs_vectors`), optionally diversifies with MMR, and trims to top_k.
+    Candidates without a vector keep their retrieval order after the scored ones.
+    """
+
+    needs_vectors = True
+    candidate_factor = RERANK_CANDIDATE_FACTOR
+
+    def __init__(self, mmr_lambda: float = 1.0):
+        self.mmr_lambda = mmr_lambda
+
+    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]],
+                     top_k: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        k = len(docs) if top_k is None else top_k
+        scored = [i for i, d in enumerate(docs) if d.get("vector") is not None and len(d["vector"])]
+        if not scored:
+            return [{key: v for key, v in d.items() if key != "vector"} for d in docs[:k]]
+
+        vecs = _unit_rows(np.asarray([docs[i]["vector"] for i in scored], dtype=np.float32))
+        q = _unit_rows(np.asarray(query_vector, dtype=np.float32))
+        rel = vecs @ q
+        if self.mmr_lambda < 1.0:
+            order = mmr_order(rel, vecs, k, self.mmr_lambda)
+        else:
+            order = np.argsort(-rel, kind="stable")[:k].tolist()
+
+        out = []
+        for j in order:
+            d = {key: v for key, v in docs[scored[j]].items() if key != "vector"}
+            d["score"] = float(rel[j])
+            out.append(d)
+        if len(out) < k:
+            picked = set(scored)
+            out += [{key: v for key, v in d.items() if key != "vector"}
+                    for i, d in enumerate(docs) if i not in picked][:k - len(out)]
+        return out
@@ -1,5 +1,7 @@
-import os, httpx, logging, traceback
-from typing import List, Dict, Any
+import os, asyncio, json, logging, traceback
+from typing import List, Dict, Any, Optional, Tuple, Union
+from app.core.http_client import http_clients, backoff_delay, AZURE_SEARCH
+from app.services.pipeline.acl_filter import AclFilter
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -9,11 +11,80 @@ KEY      = os.environ["AZ_SEARCH_API_KEY"]
 INDEX    = os.environ["AZ_SEARCH_INDEX"]
 API_V    = "2023-11-01"
 
+# Service limits: 1000 documents and 16 MB per indexing request
+UPLOAD_MAX_DOCS    = int(os.getenv("AZ_SEARCH_UPLOAD_MAX_DOCS", "1000"))
+UPLOAD_MAX_BYTES   = int(os.getenv("AZ_SEARCH_UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CONCURRENCY = int(os.getenv("AZ_SEARCH_UPLOAD_CONCURRENCY", "4"))
+UPLOAD_MAX_RETRIES = int(os.getenv("AZ_SEARCH_UPLOAD_MAX_RETRIES", "3"))
+# per-document status codes in a 207 response worth retrying
+RETRYABLE_DOC_STATUS = {409, 422, 429, 503}
+
+SELECT = "id,content,source,tenant,department,project_id"
+
+
+def plan_upload_batches(sizes: List[int], max_docs: int, max_bytes: int) -> List[Tuple[int, int]]:
+    """Greedy [start, end) ranges bounded by document count and serialized bytes."""
+    batches, start, total = [], 0, 0
+    for i, n in enumerate(sizes):
+        if i > start and (i - start >= max_docs or total + n + 1 > max_bytes):
+            batches.append((start, i))
+            start, total = i, 0
+        total += n + 1  # separating comma
+    if start < len(sizes):
+        batches.append((start, len(sizes)))
+    return batches
+
+
 class AzureAISearchStore:
-    
+
+    def __init__(self):
+        self._sem = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def _post_docs(self, url: str, docs: List[bytes]) -> Dict[str, Dict[str, Any]]:
+        """Index one batch; returns {key: {"status": bool, "statusCode": int, "errorMessage": str}}."""
+        body = b'{"value":[' + b",".join(docs) + b"]}"
+        async with self._sem:
+            resp = await http_clients.post_with_retry(
+                AZURE_SEARCH,
+                url,
+                headers={"api-key": KEY, "Content-Type": "application/json"},
+                content=body
+            )
+        if resp.status_code not in (200, 207):
+            logger.error(f"Azure Search add_embeddings failed: {resp.status_code} {resp.text[:500]}")
+            raise Exception(f"Azure Search error: {resp.status_code} {resp.text[:500]}")
+        return {r["key"]: r for r in resp.json().get("value", [])}
+
+    async def _upload_batch(self, url: str, keys: List[str], docs: List[bytes]) -> List[Dict[str, Any]]:
+        """Upload a batch, re-sending only the documents that failed with a retryable status."""
+        pending = dict(zip(keys, docs))
+        failed: List[Dict[str, Any]] = []
+        for attempt in range(UPLOAD_MAX_RETRIES + 1):
+            results = await self._post_docs(url, list(pending.values()))
+            retry: Dict[str, bytes] = {}
+            for key, doc in pending.items():
+                r = results.get(key)
+                missing = r is None
+                if missing:
+                    # no per-document result is no proof it was indexed: retried, then reported
+                    r = {"key": key, "status": False, "statusCode": None, "errorMessage": "missing from the response"}
+                elif r.get("status"):
+                    continue
+                if (missing or r.get("statusCode") in RETRYABLE_DOC_STATUS) and attempt < UPLOAD_MAX_RETRIES:
+                    retry[key] = doc
+                else:
+                    failed.append(r)
+            if not retry:
+                break
+            logger.warning(f"Azure Search: retrying {len(retry)}/{len(pending)} failed documents (attempt {attempt + 1})")
+            pending = retry
+            await asyncio.sleep(backoff_delay(attempt))
+        return failed
+
     async def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadataDict: List[Dict[str, Any]]) -> None:
         url = f"{ENDPOINT}/indexes/{INDEX}/docs/index?api-version={API_V}"       
-        value = []
+        keys: List[str] = []
+        docs: List[bytes] = []
         for i, (text, emb) in enumerate(zip(texts, embeddings)):
             metadata = metadataDict[i]
             doc = {
@@ -31,32 +102,42 @@ class AzureAISearchStore:
                 "content_vector": emb,
                 "content_vector_metadata": ""
             }
-            value.append(doc)
-        logger.info(f"🚀 Uploading {len(value)} embeddings to Azure Search index '{INDEX}' and the vlue is {value}")
-        body = {"value": value}
+            keys.append(metadata["id"])
+            docs.append(json.dumps(doc, separators=(",", ":")).encode())
+
+        batches = plan_upload_batches([len(d) for d in docs], UPLOAD_MAX_DOCS, UPLOAD_MAX_BYTES)
+        total_bytes = sum(len(d) for d in docs)
+        logger.info(f"🚀 Uploading {len(docs)} embeddings ({total_bytes} bytes) to Azure Search index '{INDEX}' in {len(batches)} batches")
 
         try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                resp = await client.post(
-                    url, 
-                    headers={"api-key": KEY, "Content-Type": "application/json"}, 
-                    json=body
-                )
-                if resp.status_code >= 400:
-                    logger.error(f"Azure Search add_embeddings failed: {resp.text}")
-                    raise Exception(f"Azure Search error: {resp.status_code} {resp.text}")
-
-                logger.info(f"✅ Azure Search: {len(value)} chunks uploaded")
-        
+            results = await asyncio.gather(*(self._upload_batch(url, keys[s:e], docs[s:e]) for s, e in batches))
         except Exception as e:
             logger.error(f"❌ ERROR uploading embeddings: {str(e)}")
             logger.debug(f"Trace: {traceback.format_exc()}")
             raise e
 
-    
-    async def search(self, query_embedding: List[float], top_k: int, filter_expr: str | None) -> List[Dict[str, Any]]:
-        url = f"{ENDPOINT}/indexes/{INDEX}/docs/search?api-version={API_V}"
+        failed = [r for batch in results for r in batch]
+        if failed:
+            sample = "; ".join(f"{r.get('key')}: {r.get('statusCode')} {r.get('errorMessage')}" for r in failed[:5])
+            logger.error(f"❌ Azure Search: {len(failed)}/{len(docs)} documents failed ({sample})")
+            raise Exception(f"Azure Search error: {len(failed)} of {len(docs)} documents failed to index ({sample})")
+        logger.info(f"✅ Azure Search: {len(docs)} chunks uploaded")
+
+    async def delete_embeddings(self, ids: List[str]) -> None:
+        url = f"{ENDPOINT}/indexes/{INDEX}/docs/index?api-version={API_V}"
+        docs = [json.dumps({"@search.action": "delete", "id": i}, separators=(",", ":")).encode() for i in ids]
+        batches = plan_upload_batches([len(d) for d in docs], UPLOAD_MAX_DOCS, UPLOAD_MAX_BYTES)
+        results = await asyncio.gather(*(self._upload_batch(url, ids[s:e], docs[s:e]) for s, e in batches))
+        # deleting a missing key succeeds, so anything reported here is a real failure
+        failed = [r for batch in results for r in batch]
+        if failed:
+            sample = "; ".join(f"{r.get('key')}: {r.get('statusCode')} {r.get('errorMessage')}" for r in failed[:5])
+            raise Exception(f"Azure Search error: {len(failed)} of {len(ids)} documents failed to delete ({sample})")
+        logger.info(f"Azure Search: {len(ids)} chunks deleted")
 
+    
+    async def search(self, query_embedding: List[float], top_k: int, filter_expr: Union[str, AclFilter, None],
+                     with_vectors: bool = False) -> List[Dict[str, Any]]:
         body = {
             "vectorQueries": [
                 {
@@ -66,30 +147,60 @@ class AzureAISearchStore:
                     "k": top_k
                 }
             ],
-            "select": "id,content,source,tenant,department,project_id"
+            "select": SELECT + (",content_vector" if with_vectors else "")
+        }
+        return await self._query(body, filter_expr, "vector")
+
+    async def hybrid_search(self, query_text: str, query_embedding: List[float], top_k: int,
+                            filter_expr: Union[str, AclFilter, None], vector_k: Optional[int] = None,
+                            with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Text + vector in one request: the service runs BM25 over `content` and
+        the vector query side by side and fuses them with RRF, so there is no
+        second round trip to fuse client-side.
+        """
+        body = {
+            "search": query_text,
+            "searchFields": "content",
+            "top": top_k,
+            "vectorQueries": [
+                {
+                    "kind": "vector",
+                    "vector": query_embedding,
+                    "fields": "content_vector",
+                    "k": vector_k or top_k
+                }
+            ],
+            "select": SELECT + (",content_vector" if with_vectors else "")
         }
+        return await self._query(body, filter_expr, "hybrid")
+
+    async def _query(self, body: Dict[str, Any], filter_expr: Union[str, AclFilter, None], kind: str) -> List[Dict[str, Any]]:
+        url = f"{ENDPOINT}/indexes/{INDEX}/docs/search?api-version={API_V}"
         if filter_expr:
-            body["filter"] = filter_expr
+            body["filter"] = filter_expr.to_odata() if isinstance(filter_expr, AclFilter) else filter_expr
 
         try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                resp = await client.post(
-                    url,
-                    headers={"api-key": KEY, "Content-Type": "application/json"},
-                    json=body
-                )
-                if resp.status_code >= 400:
-                    logger.error(f"❌ Azure Search vector search failed: {resp.text}")
-                    raise Exception(f"Azure Search search error: {resp.status_code} {resp.text}")
-
-                data = resp.json()
-                hits = []
-                for v in data.get("value", []):
-                    doc = v.get("document") or v  # ✅ handle both response formats
-                    doc["score"] = v.get("@search.score", 0)  # ✅ attach score for ranking later
-                    hits.append(doc)
-                logger.info(f"🔍 Retrieved {len(hits)} search hits")
-                return hits
+            resp = await http_clients.post(
+                AZURE_SEARCH,
+                url,
+                headers={"api-key": KEY, "Content-Type": "application/json"},
+                json=body
+            )
+            if resp.status_code >= 400:
+                logger.error(f"❌ Azure Search {kind} search failed: {resp.text}")
+                raise Exception(f"Azure Search search error: {resp.status_code} {resp.text}")
+
+            data = resp.json()
+            hits = []
+            for v in data.get("value", []):
+                doc = v.get("document") or v  # ✅ handle both response formats
+                doc["score"] = v.get("@search.score", 0)  # ✅ attach score for ranking later
+                if "content_vector" in doc:
+                    doc["vector"] = doc.pop("content_vector")
+                hits.append(doc)
+            logger.info(f"🔍 Retrieved {len(hits)} search hits ({kind})")
+            return hits
 
         except Exception as e:
             logger.error(f"❌ SEARCH ERROR: {str(e)}")
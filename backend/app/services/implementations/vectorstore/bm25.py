@@ -0,0 +1,87 @@
+import math, os, re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B  = float(os.getenv("BM25_B", "0.75"))
+
+# words, plus identifier-like tokens kept whole ("A320-200", "PN_4711/B") so
+# part numbers match exactly as well as by their pieces
+_WORD = re.compile(r"\w+")
+_IDENT = re.compile(r"\w+(?:[-_./]\w+)+")
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.lower()
+    return _WORD.findall(text) + _IDENT.findall(text)
+
+
+class BM25Index:
+    """
+    In-memory inverted index over chunk text, rows numbered like the owning
+    store. Postings are appended as Python lists and frozen into numpy arrays
+    on first use, so scoring a query term is one vectorised add.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1, self.b = k1, b
+        self._rows: Dict[str, List[int]] = {}
+        self._tfs: Dict[str, List[int]] = {}
+        self._frozen: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._n = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def add(self, row: int, text: str) -> None:
+        """Index row `row`; rows must be added in increasing order."""
+        if row != self._n:
+            raise ValueError(f"expected row {self._n}, got {row}")
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._rows.setdefault(term, []).append(row)
+            self._tfs.setdefault(term, []).append(tf)
+            self._frozen.pop(term, None)
+        if self._n == len(self._lengths):
+            self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths), dtype=np.float32)])
+        length = sum(terms.values())
+        self._lengths[self._n] = length
+        self._n += 1
+        self._total_length += length
+
+    def _postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        posting = self._frozen.get(term)
+        if posting is None and term in self._rows:
+            posting = self._frozen[term] = (np.asarray(self._rows[term], dtype=np.int64),
+                                            np.asarray(self._tfs[term], dtype=np.float32))
+        return posting
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        """Top-k (score, row) by BM25; `allowed` masks deleted / filtered-out rows."""
+        n = self._n
+        if n == 0 or k <= 0:
+            return []
+        avg_length = self._total_length / n or 1
+        scores = np.zeros(n, dtype=np.float32)
+        touched = np.zeros(n, dtype=bool)
+        for term in set(tokenize(query)):
+            posting = self._postings(term)
+            if posting is None:
+                continue
+            rows, tf = posting
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / avg_length)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+            touched[rows] = True
+        if allowed is not None:
+            touched &= allowed[:n]
+        candidates = np.flatnonzero(touched)
+        if len(candidates) == 0:
+            return []
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return sorted(((float(scores[r]), int(r)) for r in top), reverse=True)
@@ -0,0 +1,19 @@
+import os
+from typing import Any, Dict, List
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def reciprocal_rank_fusion(*rankings: List[Dict[str, Any]], k: int = RRF_K, top_k: int | None = None) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked hit lists by sum(1 / (k + rank)), keyed on hit id. The fused
+    score replaces `score`; each hit keeps its first-seen payload.
+    """
+    fused: Dict[str, float] = {}
+    docs: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + 1.0 / (k + rank)
+            docs.setdefault(hit["id"], hit)
+    order = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**docs[i], "score": fused[i]} for i in order]
@@ -0,0 +1,133 @@
+import math, os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.implementations.vectorstore.quantization import _kmeans
+
+IVF_NLIST      = int(os.getenv("IVF_NLIST", "0"))        # 0 = 4 * sqrt(rows indexed at training)
+IVF_NPROBE     = int(os.getenv("IVF_NPROBE", "32"))      # lists scanned per query
+IVF_ITERATIONS = int(os.getenv("IVF_ITERATIONS", "10"))
+
+_ASSIGN_BLOCK = 8192  # rows assigned per matmul when (re)building
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF-flat) index over rows of an external, L2-normalised
+    float32 matrix: k-means centroids partition the rows into `nlist` lists,
+    and a query scans only the rows of its `nprobe` closest lists. Adding
+    rows is one matrix product against the centroids, so inserts keep pace
+    with uploads; scoring the shortlisted rows is left to the owning store
+    (one BLAS product, or its quantised scan + rescore).
+
+    The index keeps each row's list id (`assign`, 4 bytes per row) and
+    rebuilds the per-list row arrays from it after load or compaction.
+    Deleted rows stay listed and are dropped through the `allowed` mask.
+    """
+
+    def __init__(self, nlist: int = IVF_NLIST, nprobe: int = IVF_NPROBE, iterations: int = IVF_ITERATIONS):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids: Optional[np.ndarray] = None  # (nlist, dim), unit rows
+        self.assign = np.zeros(0, dtype=np.int32)    # row -> list
+        self.trained_rows = 0
+        self._lists: List[np.ndarray] = []
+        self._sizes = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.assign)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def fit(self, sample: np.ndarray, rows: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        """Train the lists on `sample` drawn from `rows` rows (sizes nlist and the retrain threshold)."""
+        rows = rows or len(sample)
+        nlist = self.nlist or int(4 * math.sqrt(rows))
+        nlist = max(1, min(nlist, len(sample) // 39 or 1))  # k-means needs ~40 points per centroid
+        c = _kmeans(sample, nlist, self.iterations, np.random.default_rng(seed))
+        self.centroids = (c / np.maximum(np.linalg.norm(c, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+        self.nlist = nlist
+        self.trained_rows = rows
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        self._sizes = np.zeros(nlist, dtype=np.int64)
+        self.assign = np.zeros(0, dtype=np.int32)
+        return self
+
+    def _nearest(self, x: np.ndarray) -> np.ndarray:
+        return np.concatenate([np.argmax(x[i:i + _ASSIGN_BLOCK] @ self.centroids.T, axis=1)
+                               for i in range(0, len(x), _ASSIGN_BLOCK)] or [np.zeros(0, dtype=np.int64)]).astype(np.int32)
+
+    def add(self, start: int, x: np.ndarray) -> None:
+        """Index rows start .. start+len(x) (must follow the rows already indexed)."""
+        if start != len(self.assign):
+            raise ValueError(f"IVF rows must be added in order: expected row {len(self.assign)}, got {start}")
+        lists = self._nearest(x)
+        self.assign = np.concatenate([self.assign, lists])
+        self._append(lists, np.arange(start, start + len(x), dtype=np.int64))
+
+    def _append(self, lists: np.ndarray, rows: np.ndarray) -> None:
+        order = np.argsort(lists, kind="stable")
+        lists, rows = lists[order], rows[order]
+        bounds = np.flatnonzero(np.diff(lists)) + 1
+        for group in np.split(np.arange(len(rows)), bounds):
+            if not len(group):
+                continue
+            li = int(lists[group[0]])
+            size, cur = int(self._sizes[li]), self._lists[li]
+            need = size + len(group)
+            if need > len(cur):  # amortised growth, like the store matrix
+                grown = np.empty(max(need, 2 * len(cur), 16), dtype=np.int64)
+                grown[:size] = cur[:size]
+                self._lists[li] = cur = grown
+            cur[size:need] = rows[group]
+            self._sizes[li] = need
+
+    def rebuild(self, assign: np.ndarray) -> None:
+        """Lists from per-row list ids (after load, or compaction's `assign[rows]`)."""
+        self.assign = np.asarray(assign, dtype=np.int32)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._sizes = np.zeros(self.nlist, dtype=np.int64)
+        self._append(self.assign, np.arange(len(self.assign), dtype=np.int64))
+
+    def candidates(self, q: np.ndarray, allowed: Optional[np.ndarray] = None, k: int = 1,
+                   nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Rows of the closest lists that pass `allowed`, sorted. Probes more
+        lists (doubling) until at least k rows qualify or every list is read,
+        so selective filters still fill the result.
+        """
+        order = np.argsort(-(self.centroids @ q))
+        nprobe = min(max(1, nprobe or self.nprobe), self.nlist)
+        done = 0
+        found: List[np.ndarray] = []
+        count = 0
+        while done < self.nlist:
+            for li in order[done:nprobe]:
+                rows = self._lists[li][:self._sizes[li]]
+                if allowed is not None:
+                    rows = rows[allowed[rows]]
+                found.append(rows)
+                count += len(rows)
+            done = nprobe
+            if count >= k:
+                break
+            nprobe = min(2 * nprobe, self.nlist)
+        return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    # --- persistence -----------------------------------------------------------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids, "assign": self.assign,
+                "params": np.asarray([self.nprobe, self.iterations, self.trained_rows], dtype=np.int64)}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "IVFIndex":
+        centroids = np.asarray(arrays["centroids"], dtype=np.float32)
+        nprobe, iterations, trained_rows = (int(v) for v in arrays["params"])
+        index = cls(nlist=len(centroids), nprobe=nprobe, iterations=iterations)
+        index.centroids, index.trained_rows = centroids, trained_rows
+        index.rebuild(arrays["assign"])
+        return index
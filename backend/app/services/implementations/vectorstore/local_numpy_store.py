@@ -0,0 +1,676 @@
+import asyncio, json, os, threading, uuid, logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.interfaces.vector_store import VectorStore
+from app.services.pipeline.acl_filter import AclFilter
+from app.services.implementations.vectorstore.bm25 import BM25Index
+from app.services.implementations.vectorstore.fusion import reciprocal_rank_fusion
+from app.services.implementations.vectorstore.ivf_index import IVFIndex
+from app.services.implementations.vectorstore.mapped_matrix import MappedMatrix
+from app.services.implementations.vectorstore.odata_filter import compile_filter
+from app.services.implementations.vectorstore.quantization import make_quantizer, QUANTIZERS
+
+logger = logging.getLogger(__name__)
+
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", "")          # "" = in-memory only
+# keep the float32 rows in an append-only file mapped into memory (needs a path)
+LOCAL_STORE_MMAP = os.getenv("LOCAL_STORE_MMAP", "false").lower() == "true"
+LOCAL_STORE_AUTOSAVE = os.getenv("LOCAL_STORE_AUTOSAVE", "true").lower() == "true"
+# autosave writes at most once per this many seconds, however many uploads arrive
+LOCAL_STORE_FLUSH_SECONDS = float(os.getenv("LOCAL_STORE_FLUSH_SECONDS", "5"))
+LOCAL_STORE_INDEX = os.getenv("LOCAL_STORE_INDEX", "flat")    # flat | ivf
+# rebuild once this share of rows are tombstones (deletes / re-uploads)
+LOCAL_STORE_COMPACT_RATIO = float(os.getenv("LOCAL_STORE_COMPACT_RATIO", "0.25"))
+# filters matching fewer rows than this are answered exactly, not through the index
+LOCAL_STORE_EXACT_BELOW = int(os.getenv("LOCAL_STORE_EXACT_BELOW", "20000"))
+# the IVF index is trained once this many rows are live, and retrained when
+# the store has grown this many times past the rows it was trained on
+LOCAL_STORE_IVF_TRAIN_ROWS = int(os.getenv("LOCAL_STORE_IVF_TRAIN_ROWS", "50000"))
+LOCAL_STORE_IVF_RETRAIN_GROWTH = float(os.getenv("LOCAL_STORE_IVF_RETRAIN_GROWTH", "8"))
+LOCAL_STORE_QUANTIZATION = os.getenv("LOCAL_STORE_QUANTIZATION", "none")  # none | int8 | pq
+# quantised scan keeps top_k * this many candidates for float32 rescoring
+LOCAL_STORE_RESCORE = int(os.getenv("LOCAL_STORE_RESCORE", "8"))
+LOCAL_STORE_QUANT_TRAIN_ROWS = int(os.getenv("LOCAL_STORE_QUANT_TRAIN_ROWS", "10000"))
+
+# Dictionary-encoded scalar metadata columns (same fields as the Azure index)
+COLUMNS = ("tenant", "project_id", "department", "source", "classification", "visibility", "owner_user_id")
+SELECT = ("id", "content", "source", "tenant", "department", "project_id")
+_INITIAL_CAPACITY = 1024
+_COMPACT_MIN_ROWS = 1000
+_TRAIN_SAMPLE = 50_000
+_MASK_CACHE_SIZE = 64   # filter masks kept per store; dropped whenever rows are added
+
+
+@lru_cache(maxsize=256)
+def _compiled(expr: str):
+    return compile_filter(expr)
+
+
+class _Columns:
+    """Columnar metadata: int32 codes per scalar field + inverted index for group_ids."""
+
+    def __init__(self):
+        self.vocab: Dict[str, Dict[str, int]] = {c: {} for c in COLUMNS}
+        self.values: Dict[str, List[str]] = {c: [] for c in COLUMNS}
+        self.codes: Dict[str, np.ndarray] = {c: np.zeros(0, dtype=np.int32) for c in COLUMNS}
+        self.groups: Dict[str, List[int]] = {}  # group id -> rows
+        self.n = 0
+
+    def encode(self, col: str, value: Any) -> int:
+        value = "" if value is None else str(value)
+        vocab = self.vocab[col]
+        code = vocab.get(value)
+        if code is None:
+            code = vocab[value] = len(self.values[col])
+            self.values[col].append(value)
+        return code
+
+    def decode(self, col: str, row: int) -> str:
+        return self.values[col][self.codes[col][row]]
+
+    def grow(self, capacity: int) -> None:
+        for c in COLUMNS:
+            grown = np.zeros(capacity, dtype=np.int32)
+            grown[:len(self.codes[c])] = self.codes[c]
+            self.codes[c] = grown
+
+    def take(self, rows: np.ndarray) -> "_Columns":
+        """New column set holding `rows` (in that order), renumbered from 0."""
+        out = _Columns()
+        out.vocab, out.values = self.vocab, self.values
+        out.codes = {c: self.codes[c][rows] for c in COLUMNS}
+        remap = np.full(self.n, -1, dtype=np.int64)
+        remap[rows] = np.arange(len(rows))
+        for g, old in self.groups.items():
+            kept = remap[old]
+            kept = kept[kept >= 0]
+            if len(kept):
+                out.groups[g] = kept.tolist()
+        out.n = len(rows)
+        return out
+
+    # --- filter primitives used by compile_filter ---------------------------
+    def equals(self, col: str, value: str) -> np.ndarray:
+        if col not in self.vocab:
+            raise ValueError(f"Field {col!r} is not filterable in the local store")
+        code = self.vocab[col].get(value)
+        if code is None:
+            return np.zeros(self.n, dtype=bool)
+        return self.codes[col][:self.n] == code
+
+    def any_of(self, col: str, values: List[str]) -> np.ndarray:
+        if col != "group_ids":
+            raise ValueError(f"Field {col!r} is not a collection in the local store")
+        mask = np.zeros(self.n, dtype=bool)
+        for v in values:
+            rows = self.groups.get(v)
+            if rows:
+                mask[rows] = True
+        return mask
+
+
+class LocalNumpyStore(VectorStore):
+    """
+    In-process vector store: L2-normalised float32 embeddings in one growable
+    matrix, metadata in dictionary-encoded columns, exact top-k via a single
+    matrix-vector product + argpartition. Uploads with an existing id replace
+    the previous row (same semantics as the Azure 'upload' action).
+
+    With index="ivf" an IVF-flat index (trained in a background thread once
+    LOCAL_STORE_IVF_TRAIN_ROWS rows exist) narrows unselective queries to the
+    rows of the nprobe nearest lists; new uploads are assigned to their list
+    as they are added, so they are searchable immediately.
+
+    With quantization="int8" / "pq" the flat scan runs over compact codes
+    (trained once LOCAL_STORE_QUANT_TRAIN_ROWS rows exist) and only the best
+    top_k * LOCAL_STORE_RESCORE candidates are rescored in float32.
+
+    With mmap=True the float32 rows live in an append-only file under `path`
+    (vectors-<tag>.f32) that uploads write through and compaction copies file
+    to file, so they are never loaded into process memory. Combined with
+    quantization, the resident set is the codes (int8: 1/4 of float32, pq:
+    PQ_SUBSPACES bytes per row) plus the pages the OS caches for the rescore
+    shortlist. Without mmap the codes are held in addition to the float32
+    matrix (int8 adds 25%).
+    """
+
+    def __init__(self, path: Optional[str] = LOCAL_STORE_PATH, mmap: bool = LOCAL_STORE_MMAP,
+                 autosave: bool = LOCAL_STORE_AUTOSAVE, index: str = LOCAL_STORE_INDEX,
+                 quantization: str = LOCAL_STORE_QUANTIZATION):
+        self.path = path or None
+        self.mmap = mmap
+        self.autosave = autosave
+        self.index = index
+        self._lock = threading.RLock()
+        self._vecs: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._content: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._cols = _Columns()
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown local store index {index!r}, expected 'flat' or 'ivf'")
+        self._ivf: Optional[IVFIndex] = IVFIndex() if index == "ivf" else None
+        self._quant = make_quantizer(quantization)
+        self._codes: Optional[np.ndarray] = None  # set once the quantizer is trained
+        self._mapped: Optional[MappedMatrix] = None  # file behind _vecs when mmap is on
+        self._generation = 0  # bumped by compact(), invalidates off-lock work
+        self._masks: "OrderedDict[Union[str, AclFilter], np.ndarray]" = OrderedDict()
+        self._bm25: Optional[BM25Index] = None  # built on the first hybrid query
+        self._bm25_build = threading.Lock()     # one build at a time, outside _lock
+        self._maintainer: Optional[threading.Thread] = None
+        self._save_lock = threading.Lock()  # one save at a time; never held with _lock while writing
+        self._dirty = False
+        self._flusher: Optional[threading.Timer] = None
+        if self.path and os.path.exists(os.path.join(self.path, "meta.json")):
+            self.load(self.path)
+
+    @property
+    def size(self) -> int:
+        return int(self._alive[:self._cols.n].sum())
+
+    def _vector_file(self) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        return os.path.join(self.path, f"vectors-{uuid.uuid4().hex[:8]}.f32")
+
+    def _ensure_capacity(self, extra: int, dim: int) -> None:
+        """Row capacity is len(_alive); the mapped file may already hold more rows than that."""
+        n = self._cols.n
+        if self._vecs is not None and self._vecs.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match store dimension {self._vecs.shape[1]}")
+        if self._vecs is not None and n + extra <= len(self._alive):
+            return
+        capacity = max(n + extra, 2 * len(self._alive), _INITIAL_CAPACITY)
+        if self.mmap and self.path:
+            if self._mapped is None:
+                self._mapped = MappedMatrix(self._vector_file(), dim)
+            self._vecs = self._mapped.reserve(capacity)  # the file grows; nothing is copied
+        else:
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            if self._vecs is not None:
+                grown[:n] = self._vecs[:n]
+            self._vecs = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:n] = self._alive[:n]
+        self._alive = alive
+        self._cols.grow(capacity)
+        if self._codes is not None:
+            codes = np.zeros((capacity,) + self._codes.shape[1:], dtype=self._codes.dtype)
+            codes[:n] = self._codes[:n]
+            self._codes = codes
+
+    def _add(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        m = np.asarray(embeddings, dtype=np.float32)
+        if m.ndim != 2 or len(m) != len(texts):
+            raise ValueError("embeddings must be a 2-D array with one row per text")
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        m /= np.where(norms == 0, 1, norms)
+        # encode outside the lock with the quantizer current now; if training
+        # swaps in another one meanwhile, the batch is re-encoded under the lock
+        quant = self._quant if self._codes is not None else None
+        encoded = quant.encode(m) if quant is not None else None
+        with self._lock:
+            self._ensure_capacity(len(m), m.shape[1])
+            cols = self._cols
+            start = cols.n
+            self._vecs[start:start + len(m)] = m
+            if self._codes is not None:
+                if quant is not self._quant:
+                    encoded = self._quant.encode(m)
+                self._codes[start:start + len(m)] = encoded
+            for j, (text, meta) in enumerate(zip(texts, metadata)):
+                row = start + j
+                old = self._row_of.get(meta["id"])
+                if old is not None:
+                    self._alive[old] = False  # tombstone the replaced version (also earlier in this batch)
+                self._alive[row] = True
+                self._row_of[meta["id"]] = row
+                self._ids.append(meta["id"])
+                self._content.append(text)
+                for c in COLUMNS:
+                    cols.codes[c][row] = cols.encode(c, meta.get(c))
+                for g in meta.get("group_ids") or []:
+                    cols.groups.setdefault(g, []).append(row)
+            cols.n = start + len(m)
+            self._masks.clear()
+            if self._ivf is not None and self._ivf.trained:
+                self._ivf.add(start, m)
+            if self._bm25 is not None:
+                for row in range(start, cols.n):
+                    self._bm25.add(row, self._content[row])
+
+    def add(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        self._add(texts, embeddings, metadata)
+        logger.info(f"Local store: {len(texts)} chunks added ({self.size} live)")
+        self._kick()
+        self._mark_dirty()
+
+    # The async entry points run in a worker thread: _lock may be held by the
+    # maintenance thread for a whole compaction or swap, which must not stall the loop.
+    async def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self.add, texts, embeddings, metadata)
+
+    def delete(self, ids: List[str]) -> int:
+        removed = 0
+        with self._lock:
+            for i in ids:
+                row = self._row_of.pop(i, None)
+                if row is not None and self._alive[row]:
+                    self._alive[row] = False
+                    removed += 1
+        self._kick()
+        if removed:
+            self._mark_dirty()
+        return removed
+
+    async def delete_embeddings(self, ids: List[str]) -> None:
+        await asyncio.to_thread(self.delete, ids)
+
+    # --- background maintenance: training + compaction ------------------------
+    def _needs_compaction(self) -> bool:
+        n = self._cols.n
+        return n >= _COMPACT_MIN_ROWS and (n - self.size) / n > LOCAL_STORE_COMPACT_RATIO
+
+    def _needs_training(self) -> bool:
+        return self._quant is not None and self._codes is None and self.size >= LOCAL_STORE_QUANT_TRAIN_ROWS
+
+    def _needs_index(self) -> bool:
+        ivf = self._ivf
+        if ivf is None:
+            return False
+        if not ivf.trained:
+            return self.size >= LOCAL_STORE_IVF_TRAIN_ROWS
+        return self.size > LOCAL_STORE_IVF_RETRAIN_GROWTH * ivf.trained_rows
+
+    def _kick(self) -> None:
+        if not (self._needs_compaction() or self._needs_training() or self._needs_index()):
+            return
+        with self._lock:
+            if self._maintainer is None or not self._maintainer.is_alive():
+                self._maintainer = threading.Thread(target=self._maintain, name="local-store-maintenance", daemon=True)
+                self._maintainer.start()
+
+    def _maintain(self) -> None:
+        try:
+            while True:
+                if self._needs_compaction():
+                    self.compact()
+                elif self._needs_training():
+                    self._train_quantizer()
+                elif self._needs_index():
+                    self._train_index()
+                else:
+                    return
+        except Exception:
+            logger.exception("Local store maintenance failed")
+
+    def _train_quantizer(self) -> None:
+        """Fit on a sample and encode existing rows off-lock; rows added meanwhile are encoded at the swap."""
+        with self._lock:
+            n0, gen, vecs = self._cols.n, self._generation, self._vecs
+            live = np.flatnonzero(self._alive[:n0])
+            rng = np.random.default_rng(0)
+            sample = vecs[np.sort(rng.choice(live, min(len(live), _TRAIN_SAMPLE), replace=False))]
+        try:
+            quant = type(self._quant)().fit(sample)
+        except ValueError as e:
+            logger.error(f"Local store: quantization disabled ({e})")
+            self._quant = None
+            return
+        head = np.concatenate([quant.encode(vecs[i:min(i + _TRAIN_SAMPLE, n0)]) for i in range(0, n0, _TRAIN_SAMPLE)])
+        with self._lock:
+            if gen != self._generation:
+                return  # compacted meanwhile; the next maintenance pass retrains
+            n = self._cols.n
+            codes = np.zeros((len(self._alive),) + head.shape[1:], dtype=head.dtype)
+            codes[:n0] = head
+            if n > n0:
+                codes[n0:n] = quant.encode(self._vecs[n0:n])
+            self._quant, self._codes = quant, codes
+        logger.info(f"Local store: {quant.kind} quantizer trained on {len(sample)} rows, "
+                    f"{quant.bytes_per_vector(vecs.shape[1])} bytes/vector")
+
+    def _train_index(self) -> None:
+        """k-means and list assignment of existing rows off-lock; rows added meanwhile are assigned at the swap."""
+        with self._lock:
+            n0, gen, vecs = self._cols.n, self._generation, self._vecs
+            live = np.flatnonzero(self._alive[:n0])
+            rng = np.random.default_rng(0)
+            sample = vecs[np.sort(rng.choice(live, min(len(live), _TRAIN_SAMPLE), replace=False))]
+            nprobe = self._ivf.nprobe
+        ivf = IVFIndex(nprobe=nprobe).fit(sample, rows=len(live))
+        head = ivf._nearest(vecs[:n0])
+        with self._lock:
+            if gen != self._generation:
+                return  # compacted meanwhile; the next maintenance pass retrains
+            n = self._cols.n
+            ivf.rebuild(np.concatenate([head, ivf._nearest(self._vecs[n0:n])]))
+            self._ivf = ivf
+        logger.info(f"Local store: IVF index trained on {len(sample)} rows, {ivf.nlist} lists over {n} rows")
+
+    def compact(self) -> None:
+        """
+        Drop tombstoned rows; the IVF lists are renumbered, not retrained. A
+        mapped matrix is copied into a new file, which the next save commits
+        (the old one stays valid for the store on disk until then).
+        """
+        with self._lock:
+            n = self._cols.n
+            rows = np.flatnonzero(self._alive[:n]).astype(np.int64)
+            self._alive = self._alive[rows]
+            if self._mapped is not None:
+                self._mapped = MappedMatrix.copy_from(self._vector_file(), self._vecs, rows)
+                self._vecs = self._mapped.rows
+            else:
+                self._vecs = self._vecs[rows] if self._vecs is not None else None
+            self._codes = self._codes[rows] if self._codes is not None else None
+            self._generation += 1
+            self._masks.clear()
+            self._bm25 = None
+            self._cols = self._cols.take(rows)
+            self._ids = [self._ids[r] for r in rows]
+            self._content = [self._content[r] for r in rows]
+            self._row_of = {self._ids[r]: r for r in np.flatnonzero(self._alive)}
+            if self._ivf is not None and self._ivf.trained:
+                self._ivf.rebuild(self._ivf.assign[rows])
+        logger.info(f"Local store compacted: {n} -> {len(rows)} rows")
+        if self._mapped is not None:
+            self._mark_dirty()  # commit the new file and drop the old one
+
+    # --- search ----------------------------------------------------------
+    def _filter_mask(self, filter_expr: Union[str, AclFilter]) -> np.ndarray:
+        """Metadata part of the mask, cached per filter until the rows change."""
+        mask = self._masks.get(filter_expr)
+        if mask is not None:
+            self._masks.move_to_end(filter_expr)
+            return mask
+        if isinstance(filter_expr, AclFilter):
+            mask = filter_expr.mask(self._cols)
+        else:
+            mask = _compiled(filter_expr)(self._cols)
+        self._masks[filter_expr] = mask
+        if len(self._masks) > _MASK_CACHE_SIZE:
+            self._masks.popitem(last=False)
+        return mask
+
+    def _mask(self, filter_expr: Union[str, AclFilter, None]) -> np.ndarray:
+        n = self._cols.n
+        mask = self._alive[:n].copy()
+        if filter_expr:
+            mask &= self._filter_mask(filter_expr)
+        return mask
+
+    def _hit(self, row: int, score: float, with_vector: bool = False) -> Dict[str, Any]:
+        hit = {"id": self._ids[row], "content": self._content[row]}
+        for c in SELECT[2:]:
+            hit[c] = self._cols.decode(c, row)
+        hit["score"] = score
+        if with_vector:
+            hit["vector"] = np.array(self._vecs[row])
+        return hit
+
+    def _scores(self, q: np.ndarray, rows) -> np.ndarray:
+        if self._codes is not None:
+            return self._quant.scores(self._codes[rows], q)
+        return self._vecs[rows] @ q
+
+    def _exact(self, q: np.ndarray, k: int, mask: np.ndarray) -> List[Tuple[float, int]]:
+        """Top-k among rows whose mask bit is set (exact up to quantisation shortlisting)."""
+        n = len(mask)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+        # dense scan when most rows qualify, gather otherwise
+        if len(candidates) > n // 2:
+            scores = self._scores(q, slice(0, n))
+            scores[~mask] = -np.inf
+            return self._rank(q, k, np.arange(n), scores, len(candidates))
+        return self._rank(q, k, candidates, self._scores(q, candidates), len(candidates))
+
+    def _rank(self, q: np.ndarray, k: int, rows: np.ndarray, scores: np.ndarray,
+              count: int) -> List[Tuple[float, int]]:
+        """Top-k of `rows` by `scores`, of which `count` are real candidates (the rest score -inf)."""
+        if count == 0:
+            return []
+        if self._codes is not None:
+            # shortlist on approximate scores, then rescore in full precision
+            keep = min(count, k * LOCAL_STORE_RESCORE)
+            rows = np.sort(rows[np.argpartition(-scores, keep - 1)[:keep]])
+            scores = self._vecs[rows] @ q
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(float(scores[i]), int(rows[i])) for i in top]
+
+    def _search(self, query_embedding: List[float], top_k: int,
+                filter_expr: Union[str, AclFilter, None], with_vectors: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            n = self._cols.n
+            if n == 0 or top_k <= 0:
+                return []
+            q = np.asarray(query_embedding, dtype=np.float32)
+            q /= (np.linalg.norm(q) or 1.0)
+            mask = self._mask(filter_expr)
+            if self._ivf is not None and self._ivf.trained and int(mask.sum()) >= LOCAL_STORE_EXACT_BELOW:
+                rows = self._ivf.candidates(q, mask, top_k)
+                scored = self._rank(q, top_k, rows, self._scores(q, rows), len(rows))
+            else:
+                scored = self._exact(q, top_k, mask)
+            scored.sort(key=lambda t: -t[0])
+            return [self._hit(row, score, with_vectors) for score, row in scored[:top_k]]
+
+    async def search(self, query_embedding: List[float], top_k: int,
+                     filter_expr: Union[str, AclFilter, None], with_vectors: bool = False) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._search, query_embedding, top_k, filter_expr, with_vectors)
+
+    def _build_lexical(self) -> None:
+        """
+        BM25 over a snapshot of the rows, built without holding the store lock
+        (uploads and vector searches go on meanwhile); rows added during the
+        build are indexed at the swap. A compaction meanwhile renumbers the
+        rows, so the snapshot is discarded and built again.
+        """
+        with self._bm25_build:
+            while True:
+                with self._lock:
+                    if self._bm25 is not None:
+                        return
+                    # _content is only appended to (compaction swaps in a new list)
+                    n, gen, content = self._cols.n, self._generation, self._content
+                index = BM25Index()
+                for row in range(n):
+                    index.add(row, content[row])
+                with self._lock:
+                    if gen == self._generation:
+                        for row in range(n, self._cols.n):
+                            index.add(row, self._content[row])
+                        self._bm25 = index
+                        logger.info(f"Local store: BM25 index built over {self._cols.n} rows")
+                        return
+
+    def _lexical(self, query_text: str, top_k: int, filter_expr: Union[str, AclFilter, None],
+                 with_vectors: bool = False) -> List[Dict[str, Any]]:
+        while True:
+            self._build_lexical()
+            with self._lock:
+                if self._bm25 is None:
+                    continue  # compacted since the build
+                mask = self._mask(filter_expr)
+                return [self._hit(row, score, with_vectors) for score, row in self._bm25.search(query_text, top_k, mask)]
+
+    async def hybrid_search(self, query_text: str, query_embedding: List[float], top_k: int,
+                            filter_expr: Union[str, AclFilter, None], vector_k: Optional[int] = None,
+                            with_vectors: bool = False) -> List[Dict[str, Any]]:
+        dense, lexical = await asyncio.gather(
+            self.search(query_embedding, vector_k or top_k, filter_expr, with_vectors),
+            asyncio.to_thread(self._lexical, query_text, top_k, filter_expr, with_vectors),
+        )
+        return reciprocal_rank_fusion(lexical, dense, top_k=top_k)
+
+    # --- persistence -------------------------------------------------------
+    def _mark_dirty(self) -> None:
+        """Schedule a debounced autosave: uploads within LOCAL_STORE_FLUSH_SECONDS share one write."""
+        if not (self.path and self.autosave):
+            return
+        with self._lock:
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = threading.Timer(LOCAL_STORE_FLUSH_SECONDS, self.flush)
+                self._flusher.daemon = True
+                self._flusher.start()
+
+    def flush(self) -> None:
+        """Save now if anything changed since the last save (autosave timer, shutdown)."""
+        with self._lock:
+            if self._flusher is not None:
+                self._flusher.cancel()
+                self._flusher = None
+            dirty, self._dirty = self._dirty, False
+        if not (dirty and self.path):
+            return
+        try:
+            self.save(self.path)
+        except Exception:
+            logger.exception(f"Local store: saving to {self.path} failed; retrying on the next flush")
+            self._mark_dirty()
+
+    def close(self) -> None:
+        self.flush()
+
+    def save(self, path: str) -> None:
+        """
+        Writes every row (tombstones included, via the alive mask) so the index
+        stays valid. A store mapped from `path` only syncs its vector file.
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._save_lock:
+            self._save(path)
+
+    def _save(self, path: str) -> None:
+        with self._lock:
+            n = self._cols.n
+            # rows below n are never rewritten in place (growth and compaction
+            # swap in a new matrix), so views can be written after the lock
+            mapped = self._mapped if self._mapped is not None and self._owns(path) else None
+            vecs = self._vecs[:n] if self._vecs is not None else np.zeros((0, 0), dtype=np.float32)
+            arrays = {c: self._cols.codes[c][:n].copy() for c in COLUMNS}
+            arrays["_alive"] = self._alive[:n].copy()
+            meta = {
+                "ids": list(self._ids),
+                "content": list(self._content),
+                "values": self._cols.values,
+                "groups": {g: list(rows) for g, rows in self._cols.groups.items()},
+                "dim": int(vecs.shape[1]),
+                "vectors_file": os.path.basename(mapped.path) if mapped is not None else None,
+            }
+            ivf_arrays = self._ivf.to_arrays() if self._ivf is not None and self._ivf.trained else None
+            quant = None
+            if self._codes is not None:
+                quant = {"kind": np.array(self._quant.kind), "codes": self._codes[:n], **self._quant.to_arrays()}
+        # unique temp names: a save from another process cannot clobber ours
+        tag = uuid.uuid4().hex[:8]
+
+        def tmp(name: str) -> str:
+            stem, ext = os.path.splitext(name)
+            return os.path.join(path, f"{stem}.tmp-{tag}{ext}")
+
+        names = (["vectors.npy"] if mapped is None else []) + ["columns.npz", "meta.json"]
+        names += (["ivf.npz"] if ivf_arrays is not None else []) + (["quant.npz"] if quant is not None else [])
+        try:
+            if mapped is None:
+                np.save(tmp("vectors.npy"), vecs)
+            else:
+                mapped.flush()  # the first n rows are on disk before meta.json says so
+            np.savez(tmp("columns.npz"), **arrays)
+            with open(tmp("meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            if ivf_arrays is not None:
+                np.savez(tmp("ivf.npz"), **ivf_arrays)
+            if quant is not None:
+                np.savez(tmp("quant.npz"), **quant)
+        except BaseException:
+            for name in names:
+                if os.path.exists(tmp(name)):
+                    os.remove(tmp(name))
+            raise
+        # rename last so a crash never leaves a half-written store behind
+        for name in names:
+            os.replace(tmp(name), os.path.join(path, name))
+        with self._lock:
+            current = self._mapped.path if self._mapped is not None and self._owns(path) else None
+        self._remove_stale_vectors(path, {meta["vectors_file"] or "vectors.npy", os.path.basename(current or "")})
+
+    def _owns(self, path: str) -> bool:
+        return self.path is not None and os.path.abspath(path) == os.path.abspath(self.path)
+
+    @staticmethod
+    def _remove_stale_vectors(path: str, keep) -> None:
+        """Vector files no longer referenced: pre-compaction files, or vectors.npy after switching to mmap."""
+        for name in os.listdir(path):
+            if name in keep or not (name == "vectors.npy" or (name.startswith("vectors-") and name.endswith(".f32"))):
+                continue
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:  # already gone, or still mapped (Windows): retried on the next save
+                pass
+
+    def load(self, path: str) -> None:
+        arrays = np.load(os.path.join(path, "columns.npz"))
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        n = len(meta["ids"])
+        vectors_file = meta.get("vectors_file")
+        vecs = mapped = None
+        if n and vectors_file and self.mmap and self._owns(path):
+            mapped = MappedMatrix(os.path.join(path, vectors_file), meta["dim"])
+            vecs = mapped.rows
+        elif n:
+            if vectors_file:
+                vecs = np.memmap(os.path.join(path, vectors_file), dtype=np.float32, mode="r", shape=(n, meta["dim"]))
+            else:
+                vecs = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            if self.mmap and self.path:
+                # copied once into an append-only file (a vectors.npy store, or another store's files)
+                mapped = MappedMatrix.copy_from(self._vector_file(), vecs)
+                vecs = mapped.rows
+            else:
+                vecs = np.array(vecs)
+        ivf_path = os.path.join(path, "ivf.npz")
+        ivf = None
+        if self._ivf is not None and os.path.exists(ivf_path):
+            ivf = IVFIndex.from_arrays(np.load(ivf_path))
+        quant_path = os.path.join(path, "quant.npz")
+        quant = codes = None
+        if self._quant is not None and os.path.exists(quant_path):
+            stored = np.load(quant_path)
+            if str(stored["kind"]) == self._quant.kind:  # otherwise retrained in the background
+                quant, codes = QUANTIZERS[self._quant.kind].from_arrays(stored), np.array(stored["codes"])
+        with self._lock:
+            cols = _Columns()
+            cols.values = meta["values"]
+            cols.vocab = {c: {v: i for i, v in enumerate(vals)} for c, vals in cols.values.items()}
+            cols.codes = {c: np.array(arrays[c], dtype=np.int32) for c in COLUMNS}
+            cols.groups = {g: list(rows) for g, rows in meta["groups"].items()}
+            cols.n = n
+            self._cols = cols
+            self._masks.clear()
+            self._bm25 = None
+            self._vecs = vecs
+            self._mapped = mapped
+            self._alive = np.array(arrays["_alive"], dtype=bool) if "_alive" in arrays else np.ones(n, dtype=bool)
+            self._ids = meta["ids"]
+            self._content = meta["content"]
+            self._row_of = {i: r for r, i in enumerate(self._ids) if self._alive[r]}
+            if ivf is not None and len(ivf) == n:  # otherwise retrained in the background
+                self._ivf = ivf
+            if quant is not None:
+                self._quant, self._codes = quant, codes
+        logger.info(f"Local store loaded {n} vectors from {path}{' (mmap)' if mapped is not None else ''}")
+        if mapped is not None and self._owns(path):
+            if os.path.basename(mapped.path) != vectors_file:
+                self._mark_dirty()  # commit the converted file
+            self._remove_stale_vectors(path, {vectors_file or "vectors.npy", os.path.basename(mapped.path)})
+        self._kick()
@@ -0,0 +1,58 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+_COPY_ROWS = 8192  # rows per step when copying between files
+
+
+class MappedMatrix:
+    """
+    float32 rows in a raw, append-only file mapped with np.memmap. Writes go
+    through the mapping into the page cache and growing extends the file and
+    remaps it, so the matrix is never copied into process memory; the OS
+    keeps resident only the pages that are read. Rows below the committed
+    count are never rewritten, so a reader holding an older mapping (or the
+    on-disk meta) always sees consistent rows.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.rows: Optional[np.memmap] = None  # (capacity, dim) view of the whole file
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self._map()
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self.rows is None else len(self.rows)
+
+    def _map(self) -> None:
+        count = os.path.getsize(self.path) // (4 * self.dim)
+        self.rows = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(count, self.dim)) if count else None
+
+    def reserve(self, capacity: int) -> np.memmap:
+        """Extend the file to `capacity` rows (sparse until written) and remap it."""
+        if capacity > self.capacity:
+            with open(self.path, "r+b") as f:
+                f.truncate(capacity * 4 * self.dim)
+            self._map()
+        return self.rows
+
+    def flush(self) -> None:
+        if self.rows is not None:
+            self.rows.flush()
+
+    @classmethod
+    def copy_from(cls, path: str, src: np.ndarray, rows: Optional[np.ndarray] = None,
+                  capacity: int = 0) -> "MappedMatrix":
+        """New file holding `src[rows]` (all of `src` if rows is None), copied block by block."""
+        count = len(src) if rows is None else len(rows)
+        out = cls(path, src.shape[1])
+        dst = out.reserve(max(count, capacity, 1))
+        for i in range(0, count, _COPY_ROWS):
+            j = min(i + _COPY_ROWS, count)
+            dst[i:j] = src[i:j] if rows is None else src[rows[i:j]]
+        out.flush()
+        return out
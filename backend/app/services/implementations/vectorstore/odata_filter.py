@@ -0,0 +1,107 @@
+import re
+from typing import Callable, List
+
+import numpy as np
+
+# Evaluates raw OData filter strings (the subset Azure Search callers use)
+# against columnar metadata, so local stores accept the same expressions.
+# PipelineRuntime passes an AclFilter, which builds its mask directly.
+#   field eq 'v' | field ne 'v' | and | or | not | ( ... )
+#   group_ids/any(g: search.in(g, 'a,b'))
+
+_TOKEN = re.compile(r"\s*(?:('(?:[^']|'')*')|(/any\()|(\()|(\))|(:)|(,)|([A-Za-z_][\w.]*))")
+
+Mask = Callable[[object], np.ndarray]
+
+
+def _tokenize(expr: str) -> List[str]:
+    tokens, pos = [], 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Unsupported filter syntax at: {expr[pos:pos + 30]!r}")
+        tokens.append(next(g for g in m.groups() if g is not None))
+        pos = m.end()
+    return tokens
+
+
+def _literal(tok: str) -> str:
+    if not (tok.startswith("'") and tok.endswith("'")):
+        raise ValueError(f"Expected string literal, got {tok!r}")
+    return tok[1:-1].replace("''", "'")
+
+
+class _Parser:
+    def __init__(self, tokens: List[str]):
+        self.toks, self.i = tokens, 0
+
+    def peek(self):
+        return self.toks[self.i] if self.i < len(self.toks) else None
+
+    def take(self, expected=None):
+        tok = self.peek()
+        if tok is None or (expected is not None and tok.lower() != expected):
+            raise ValueError(f"Expected {expected!r}, got {tok!r}")
+        self.i += 1
+        return tok
+
+    def expr(self) -> Mask:
+        node = self.term()
+        while (self.peek() or "").lower() == "or":
+            self.take()
+            left, right = node, self.term()
+            node = lambda cols, l=left, r=right: l(cols) | r(cols)
+        return node
+
+    def term(self) -> Mask:
+        node = self.factor()
+        while (self.peek() or "").lower() == "and":
+            self.take()
+            left, right = node, self.factor()
+            node = lambda cols, l=left, r=right: l(cols) & r(cols)
+        return node
+
+    def factor(self) -> Mask:
+        tok = self.peek()
+        if tok == "(":
+            self.take()
+            node = self.expr()
+            self.take(")")
+            return node
+        if (tok or "").lower() == "not":
+            self.take()
+            inner = self.factor()
+            return lambda cols: ~inner(cols)
+        field = self.take()
+        if self.peek() == "/any(":
+            self.take()
+            self.take()  # lambda variable
+            self.take(":")
+            self.take("search.in")
+            self.take("(")
+            self.take()  # lambda variable
+            self.take(",")
+            values = [v for v in re.split(r"[\s,]+", _literal(self.take())) if v]
+            if self.peek() == ",":  # explicit delimiter argument
+                self.take()
+                self.take()
+            self.take(")")
+            self.take(")")
+            return lambda cols: cols.any_of(field, values)
+        op = self.take().lower()
+        value = _literal(self.take())
+        if op == "eq":
+            return lambda cols: cols.equals(field, value)
+        if op == "ne":
+            return lambda cols: ~cols.equals(field, value)
+        raise ValueError(f"Unsupported operator {op!r}")
+
+
+def compile_filter(expr: str) -> Mask:
+    """Compile an OData filter into fn(columns) -> boolean row mask."""
+    parser = _Parser(_tokenize(expr))
+    node = parser.expr()
+    if parser.peek() is not None:
+        raise ValueError(f"Unexpected token {parser.peek()!r} in filter")
+    return node
@@ -0,0 +1,162 @@
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+PQ_SUBSPACES  = int(os.getenv("PQ_SUBSPACES", "0"))   # 0 = dim / 16
+PQ_ITERATIONS = int(os.getenv("PQ_ITERATIONS", "20"))
+
+# float32 scratch block the codes are widened into before each BLAS product;
+# small enough to stay in L2, so the scan reads 1 byte per dimension from RAM
+_BLOCK_BYTES = 512 * 1024
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 quantisation: x ~= lo + (code + 128) * scale.
+    4x smaller than float32; scores are inner products with the query
+    computed block-wise (codes widened into one cache-resident float32
+    block, then one BLAS product), so no full-precision copy is materialised.
+    """
+
+    kind = "int8"
+
+    def __init__(self):
+        self.lo: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.lo is not None
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return dim
+
+    def fit(self, x: np.ndarray) -> "ScalarQuantizer":
+        # clip the extreme tails so one outlier does not waste the code range
+        lo, hi = np.percentile(x, [0.1, 99.9], axis=0)
+        self.lo = lo.astype(np.float32)
+        self.scale = np.maximum(hi - lo, 1e-12).astype(np.float32) / 255
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        codes = np.rint((x - self.lo) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.lo + (codes.astype(np.float32) + 128) * self.scale
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        # q . x = q . (lo + 128 * scale) + (q * scale) . code
+        qs = (q * self.scale).astype(np.float32)  # a float64 query would push matmul off BLAS
+        bias = float(q @ (self.lo + 128 * self.scale))
+        step = max(16, _BLOCK_BYTES // (4 * codes.shape[1]))
+        scratch = np.empty((min(step, len(codes)), codes.shape[1]), dtype=np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for i in range(0, len(codes), step):
+            block = scratch[:min(step, len(codes) - i)]
+            block[...] = codes[i:i + step]
+            np.matmul(block, qs, out=out[i:i + len(block)])
+        out += bias
+        return out
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"lo": self.lo, "scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ScalarQuantizer":
+        q = cls()
+        q.lo, q.scale = np.asarray(arrays["lo"]), np.asarray(arrays["scale"])
+        return q
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = x[rng.choice(len(x), k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        # ||x - c||^2 up to a per-row constant
+        assign = np.argmin((centroids ** 2).sum(1) - 2 * x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():  # re-seed dead centroids on random points
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return centroids
+
+
+class ProductQuantizer:
+    """
+    Product quantisation: the vector is split into `m` sub-vectors, each
+    replaced by the id of its nearest of 256 k-means centroids (1 byte).
+    Search uses asymmetric distance: a per-query (m, 256) table of partial
+    inner products, summed over the codes.
+    """
+
+    kind = "pq"
+
+    def __init__(self, m: int = PQ_SUBSPACES, iterations: int = PQ_ITERATIONS, seed: int = 0):
+        self.m = m
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None  # (m, 256, dim / m)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return self.m or max(1, dim // 16)
+
+    def fit(self, x: np.ndarray) -> "ProductQuantizer":
+        dim = x.shape[1]
+        self.m = self.m or max(1, dim // 16)
+        if dim % self.m:
+            raise ValueError(f"PQ subspaces ({self.m}) must divide the dimension ({dim})")
+        rng = np.random.default_rng(self.seed)
+        sub = dim // self.m
+        self.centroids = np.stack([
+            _kmeans(x[:, j * sub:(j + 1) * sub], 256, self.iterations, rng) for j in range(self.m)
+        ]).astype(np.float32)
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        sub = self.centroids.shape[2]
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            c = self.centroids[j]
+            xs = x[:, j * sub:(j + 1) * sub]
+            codes[:, j] = np.argmin((c ** 2).sum(1) - 2 * xs @ c.T, axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.concatenate([self.centroids[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        sub = self.centroids.shape[2]
+        table = np.einsum("jkd,jd->jk", self.centroids, q.reshape(self.m, sub))
+        out = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.m):
+            out += table[j][codes[:, j]]
+        return out
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ProductQuantizer":
+        centroids = np.asarray(arrays["centroids"])
+        q = cls(m=centroids.shape[0])
+        q.centroids = centroids
+        return q
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+def make_quantizer(kind: str):
+    if kind in ("", "none"):
+        return None
+    if kind not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization {kind!r}, expected one of {sorted(QUANTIZERS)} or 'none'")
+    return QUANTIZERS[kind]()
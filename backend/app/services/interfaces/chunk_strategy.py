@@ -1,8 +1,43 @@
 from abc import ABC, abstractmethod
-from typing import List
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.core.tokenizer import count_tokens
+
+
+@dataclass(frozen=True)
+class Chunk:
+    text: str
+    start: int   # character offsets into the source text, end exclusive
+    end: int
+    tokens: int
+    embedding: Optional[List[float]] = None  # set when the chunker already embedded this text
+
 
 class ChunkStrategy(ABC):
     @abstractmethod
-    async def chunk_text(self, text: str) -> List[str]:
+    async def chunk_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
         """Split text into chunks."""
-        ...
\ No newline at end of file
+        ...
+
+    async def chunk_with_embeddings(self, text: str, chunk_size: int,
+                                    chunk_overlap: int) -> Tuple[List[str], List[Optional[List[float]]]]:
+        """Chunks plus any chunk embeddings computed along the way (None where the caller must embed)."""
+        chunks = await self.chunk_text(text, chunk_size, chunk_overlap)
+        return chunks, [None] * len(chunks)
+
+    async def chunk_stream(self, pieces: AsyncIterator[str], chunk_size: int,
+                           chunk_overlap: int) -> AsyncIterator[Chunk]:
+        """
+        Chunks of text arriving in pieces, yielded as they close. This default
+        reads the whole text first; the built-in chunkers override it to keep
+        memory bounded by their window, not the document.
+        """
+        text = "".join([p async for p in pieces])
+        pos = 0
+        for c in await self.chunk_text(text, chunk_size, chunk_overlap):
+            start = text.find(c, pos)
+            if start < 0:
+                start = pos
+            yield Chunk(c, start, start + len(c), count_tokens(c))
+            pos = start
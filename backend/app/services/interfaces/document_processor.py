@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Dict, Any
 
@@ -5,4 +6,25 @@ class DocumentProcessor(ABC):
     @abstractmethod
     async def process_document(self, file_content: bytes, metadata: Dict[str, Any]) -> str:
         """Process a document and return its text content."""
-        ...
\ No newline at end of file
+        ...
+
+    async def extract(self, path: str, out_path: str, metadata: Dict[str, Any]) -> int:
+        """
+        Extract the text of the file at `path` into `out_path` (UTF-8) and return
+        the number of characters written. This default reads the whole file into
+        memory for process_document; processors that can parse from disk override it.
+        """
+        content = await asyncio.to_thread(_read_bytes, path)
+        text = await self.process_document(content, metadata)
+        await asyncio.to_thread(_write_text, out_path, text)
+        return len(text)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
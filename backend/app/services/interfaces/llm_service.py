@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import AsyncIterator, List
 
 class LLMService(ABC):
     @abstractmethod
     async def generate(self, system_prompt: str, user_prompt: str) -> str: ...
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Yield the completion as text deltas. Default: one delta with the full answer."""
+        yield await self.generate(system_prompt, user_prompt)
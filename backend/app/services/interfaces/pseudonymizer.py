@@ -3,9 +3,14 @@ from abc import ABC, abstractmethod
 
 class Pseudonymizer(ABC):
     @abstractmethod
-    async def tokenize(self, text: str, entities: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    async def tokenize(self, text: str, entities: List[Dict[str, Any]],
+                       scope: str = "") -> Tuple[str, List[Dict[str, Any]]]:
+        """Masked text and token map; `scope` (tenant) keeps equal values on equal tokens."""
         ...
 
     @abstractmethod
     async def encrypt(self, value: str) -> str:
         ...
+
+    async def encrypt_many(self, values: List[str]) -> List[str]:
+        return [await self.encrypt(v) for v in values]
@@ -1,8 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class RerankStrategy(ABC):
+    # set by strategies that score hit["vector"]; stores then attach candidate vectors
+    needs_vectors = False
+    # retrieve top_k * candidate_factor hits and let the reranker cut them down
+    candidate_factor = 1
+
     @abstractmethod
-    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Return documents sorted by relevance."""
-        ...
\ No newline at end of file
+    async def rerank(self, query_vector: List[float], docs: List[Dict[str, Any]],
+                     top_k: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return documents sorted by relevance, trimmed to top_k when given. `query` is the raw question text."""
+        ...
@@ -1,8 +1,22 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
+
+from app.services.pipeline.acl_filter import AclFilter
 
 class VectorStore(ABC):
     @abstractmethod
     async def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]]) -> None: ...
     @abstractmethod
-    async def search(self, query_embedding: List[float], top_k: int, filter_expr: str | None) -> List[Dict[str, Any]]: ...
+    async def search(self, query_embedding: List[float], top_k: int, filter_expr: Union[str, AclFilter, None],
+                     with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """with_vectors: attach each hit's embedding as hit["vector"] (for in-process reranking)."""
+
+    async def delete_embeddings(self, ids: List[str]) -> None:
+        """Remove documents by id (unknown ids are ignored)."""
+        raise NotImplementedError(f"{type(self).__name__} does not support deletes")
+
+    async def hybrid_search(self, query_text: str, query_embedding: List[float], top_k: int,
+                            filter_expr: Union[str, AclFilter, None], vector_k: Optional[int] = None,
+                            with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """Keyword + vector retrieval fused by rank. Stores without a lexical index fall back to vector search."""
+        return await self.search(query_embedding, top_k, filter_expr, with_vectors=with_vectors)
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Optional
+
+import numpy as np
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+@dataclass(frozen=True)
+class AclFilter:
+    """
+    Retrieval scope for one caller:
+        tenant AND project AND (Public OR Shared with one of my groups OR Private and mine)
+
+    Hashable, so compiled forms are cached per (tenant, project, group set, user).
+    Stores receive this object instead of a hand-built OData string.
+    """
+
+    tenant: str
+    project_id: str
+    group_ids: FrozenSet[str] = frozenset()
+    owner_user_id: Optional[str] = None
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any]) -> "AclFilter":
+        return cls(
+            tenant=meta["tenant"],
+            project_id=meta["project_id"],
+            group_ids=frozenset(g for g in meta.get("group_ids") or [] if g),
+            owner_user_id=meta.get("owner_user_id") or None,
+        )
+
+    def to_odata(self) -> str:
+        return _to_odata(self)
+
+    def mask(self, cols) -> np.ndarray:
+        """Boolean row mask over columnar metadata (see LocalNumpyStore._Columns)."""
+        visible = cols.equals("visibility", "Public")
+        if self.group_ids:
+            visible |= cols.equals("visibility", "Shared") & cols.any_of("group_ids", sorted(self.group_ids))
+        if self.owner_user_id:
+            visible |= cols.equals("visibility", "Private") & cols.equals("owner_user_id", self.owner_user_id)
+        return cols.equals("tenant", self.tenant) & cols.equals("project_id", self.project_id) & visible
+
+    def __str__(self) -> str:
+        return self.to_odata()
+
+
+@lru_cache(maxsize=1024)
+def _to_odata(acl: AclFilter) -> str:
+    visible = ["visibility eq 'Public'"]
+    if acl.group_ids:
+        # search.in splits on ',' here; group ids are plain identifiers
+        groups = _quote(",".join(sorted(acl.group_ids)))
+        visible.append(f"(visibility eq 'Shared' and group_ids/any(g: search.in(g, {groups}, ',')))")
+    if acl.owner_user_id:
+        visible.append(f"(visibility eq 'Private' and owner_user_id eq {_quote(acl.owner_user_id)})")
+    return (f"tenant eq {_quote(acl.tenant)} and project_id eq {_quote(acl.project_id)} "
+            f"and ({' or '.join(visible)})")
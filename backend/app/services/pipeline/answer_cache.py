@@ -0,0 +1,219 @@
+import asyncio, json, os, time, unicodedata, logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.core import metrics
+from app.database.database import SessionLocal
+from app.models.ingest.projectgeneration import ProjectGeneration
+from app.services.pipeline.acl_filter import AclFilter
+from app.services.pipeline.container_cache import ContainerCache
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ANSWER_CACHE_TTL       = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+
+# (pipeline config hash, ACL scope): answers never cross users who can see different documents
+Scope = Tuple[str, AclFilter]
+
+
+def _normalize(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+def _read_generation(tenant: str, project_id: str) -> int:
+    with SessionLocal() as db:
+        row = db.get(ProjectGeneration, (tenant, project_id))
+        return row.generation if row else 0
+
+
+def _bump_generation(tenant: str, project_id: str) -> None:
+    key = (ProjectGeneration.tenant == tenant) & (ProjectGeneration.project_id == project_id)
+    with SessionLocal() as db:
+        for _ in range(2):
+            if db.execute(update(ProjectGeneration).where(key)
+                          .values(generation=ProjectGeneration.generation + 1)).rowcount:
+                db.commit()
+                return
+            db.add(ProjectGeneration(tenant=tenant, project_id=project_id, generation=1))
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()  # another process inserted it first: update that row
+
+
+class _Entry:
+    __slots__ = ("scope", "query", "vector", "result", "generation", "expires", "size")
+
+    def __init__(self, scope: Scope, query: str, vector: np.ndarray, result: Dict[str, Any],
+                 generation: int, ttl: float):
+        self.scope, self.query, self.vector, self.result = scope, query, vector, result
+        self.generation = generation
+        self.expires = time.monotonic() + ttl
+        self.size = vector.nbytes + len(query) + len(json.dumps(result, default=str))
+
+
+class AnswerCache:
+    """
+    Semantic cache for PipelineRuntime.answer, per pipeline + ACL scope:
+    - exact hit on the normalised query text (no embedding call),
+    - semantic hit when the query embedding is within `threshold` cosine of a cached one,
+    - identical in-flight queries share one computation (singleflight),
+    - byte-bounded LRU with TTL; a project's entries go stale when it is ingested into.
+
+    Staleness is tracked by a per-(tenant, project) generation in the
+    project_generations table, bumped by every ingest path. The dedicated
+    job worker and other web workers ingest in other processes, so each
+    lookup reads the generation back (one primary-key SELECT) and entries
+    stored under an older one are dropped. Lives on the event loop, so no locking.
+    """
+
+    def __init__(self, max_bytes: int = ANSWER_CACHE_MAX_BYTES, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lru: "OrderedDict[Tuple[Scope, str], _Entry]" = OrderedDict()
+        self._by_scope: Dict[Scope, Dict[str, _Entry]] = {}
+        self._inflight: Dict[Tuple[Scope, str], asyncio.Future] = {}
+        self.bytes = 0
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "coalesced": 0,
+                         "evictions": 0, "expired": 0, "invalidations": 0}
+
+    @staticmethod
+    def scope(pipeline: Optional[Dict[str, Any]], acl: AclFilter, top_k: int) -> Scope:
+        return ContainerCache.key({**(pipeline or {}), "top_k": top_k}), acl
+
+    async def answer(self, scope: Scope, query: str,
+                     embed: Callable[[str], Awaitable[List[float]]],
+                     compute: Callable[[List[float]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return a cached answer for `query` or compute one via `compute(query_vector)`."""
+        acl = scope[1]
+        try:
+            generation = await asyncio.to_thread(_read_generation, acl.tenant, acl.project_id)
+        except Exception:
+            # without the shared generation a hit could be stale: answer uncached
+            logger.exception("Answer cache: project generation unavailable, bypassing the cache")
+            return await compute(await embed(query))
+
+        key = (scope, _normalize(query))
+        entry = self._live(key, generation)
+        if entry is not None:
+            self.counters["exact_hits"] += 1
+            return entry.result
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this request itself was cancelled
+                # the leading request went away (client disconnect): take over
+                return await self.answer(scope, query, embed, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            qv = await embed(query)
+            vector = np.asarray(qv, dtype=np.float32)
+            vector /= (np.linalg.norm(vector) or 1.0)
+            hit = self._nearest(scope, vector, generation)
+            if hit is not None:
+                self.counters["semantic_hits"] += 1
+                result = hit.result
+            else:
+                self.counters["misses"] += 1
+                result = await compute(qv)
+                # skip storing if the project was re-ingested while we computed
+                if generation == await asyncio.to_thread(_read_generation, acl.tenant, acl.project_id):
+                    self._put(_Entry(scope, key[1], vector, result, generation, self.ttl))
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate_project(self, tenant: str, project_id: str) -> int:
+        """
+        Mark every cached answer of a project stale, in all processes, and drop
+        this process's entries (all scopes and pipelines) right away.
+        """
+        await asyncio.to_thread(_bump_generation, tenant, project_id)
+        stale = [k for k in self._lru if k[0][1].tenant == tenant and k[0][1].project_id == project_id]
+        for k in stale:
+            self._drop(k)
+        if stale:
+            self.counters["invalidations"] += len(stale)
+            logger.info(f"🧹 Answer cache: dropped {len(stale)} entries for {tenant}/{project_id}")
+        return len(stale)
+
+    # ---- internals ----------------------------------------------------------
+
+    def _live(self, key: Tuple[Scope, str], generation: int) -> Optional[_Entry]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if entry.generation != generation:
+            self._drop(key)  # the project was ingested into, possibly by another process
+            self.counters["invalidations"] += 1
+            return None
+        if entry.expires < time.monotonic():
+            self._drop(key)
+            self.counters["expired"] += 1
+            return None
+        self._lru.move_to_end(key)
+        return entry
+
+    def _nearest(self, scope: Scope, vector: np.ndarray, generation: int) -> Optional[_Entry]:
+        entries = self._by_scope.get(scope)
+        if not entries:
+            return None
+        queries = list(entries)
+        sims = np.stack([entries[q].vector for q in queries]) @ vector
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        return self._live((scope, queries[best]), generation)
+
+    def _put(self, entry: _Entry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        key = (entry.scope, entry.query)
+        if key in self._lru:
+            self._drop(key)
+        self._lru[key] = entry
+        self._by_scope.setdefault(entry.scope, {})[entry.query] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._lru)))
+            self.counters["evictions"] += 1
+
+    def _drop(self, key: Tuple[Scope, str]) -> None:
+        entry = self._lru.pop(key)
+        self.bytes -= entry.size
+        scoped = self._by_scope[entry.scope]
+        scoped.pop(entry.query, None)
+        if not scoped:
+            del self._by_scope[entry.scope]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "entries": len(self._lru), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "scopes": len(self._by_scope), "inflight": len(self._inflight)}
+
+
+answer_cache = AnswerCache()
+metrics.register("answer_cache", answer_cache.stats)
@@ -0,0 +1,217 @@
+import asyncio, json, os, time, logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from app.services.pipeline.answer_cache import answer_cache
+from app.services.pipeline.pipeline_runtime import PipelineRuntime, base_id
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE    = int(os.getenv("BULK_QUEUE_SIZE", "8"))
+SCAN_WORKERS  = int(os.getenv("BULK_SCAN_WORKERS", "2"))
+CHUNK_WORKERS = int(os.getenv("BULK_CHUNK_WORKERS", "2"))
+EMBED_WORKERS = int(os.getenv("BULK_EMBED_WORKERS", "4"))
+STORE_WORKERS = int(os.getenv("BULK_STORE_WORKERS", "2"))
+# longer lines are reported as errors and skipped without being buffered
+MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", str(16 * 1024 * 1024)))
+
+_DONE = object()
+
+
+async def read_ndjson(body: AsyncIterator[bytes], max_line: int = MAX_LINE_BYTES) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Incrementally split a streamed request body into NDJSON records.
+    Yields {"line": n, "doc": {...}} or {"line": n, "error": "..."}.
+    Each body piece is scanned once; a line over `max_line` bytes yields
+    {"line": n, "error": "line too long"} and is discarded up to its newline.
+    """
+    buf = bytearray()
+    line_no = 0
+    skipping = False  # inside an over-long line: drop bytes until its newline
+
+    def parse(raw: bytes) -> Optional[Dict[str, Any]]:
+        nonlocal line_no
+        line_no += 1
+        raw = raw.strip()
+        if not raw:
+            return None
+        try:
+            return {"line": line_no, "doc": json.loads(raw)}
+        except ValueError as e:
+            return {"line": line_no, "error": f"invalid JSON: {e}"}
+
+    def too_long() -> Dict[str, Any]:
+        nonlocal line_no
+        line_no += 1
+        return {"line": line_no, "error": "line too long"}
+
+    async for piece in body:
+        start = 0
+        if skipping:
+            end = piece.find(b"\n")
+            if end < 0:
+                continue
+            skipping, start = False, end + 1
+        while True:
+            end = piece.find(b"\n", start)
+            if end < 0:
+                break
+            buf += piece[start:end]
+            start = end + 1
+            rec = parse(bytes(buf)) if len(buf) <= max_line else too_long()
+            buf.clear()
+            if rec:
+                yield rec
+        buf += piece[start:]
+        if len(buf) > max_line:
+            buf.clear()
+            skipping = True
+            yield too_long()
+    if not skipping:
+        rec = parse(bytes(buf))
+        if rec:
+            yield rec
+
+
+class BulkIngestor:
+    """
+    Streams documents through PII -> chunk -> embed -> store with bounded
+    queues between stages, so stages for different documents overlap and
+    a slow stage back-pressures the request body reader.
+    Every input document produces exactly one result record.
+    """
+
+    def __init__(self, container, queue_size: int = QUEUE_SIZE):
+        self.container = container
+        self.queue_size = queue_size
+
+    async def run(self, docs: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        qs = [asyncio.Queue(self.queue_size) for _ in range(4)]
+        results: asyncio.Queue = asyncio.Queue()
+        p = self.container.params()
+
+        async def scan(job):
+            screened = await PipelineRuntime.screen(self.container, job["text"], job["meta"])
+            if screened["decision"] == "block":
+                return self._result(job, "blocked", reason=screened["reason"])
+            job["text"] = screened["text"]
+            job["pii_found"] = screened["pii_found"]
+            return job
+
+        async def chunk(job):
+            job["chunks"], job["known"] = await self.container.chunker.chunk_with_embeddings(
+                job["text"], p["chunk_size"], p["chunk_overlap"])
+            job.pop("text")
+            if not job["chunks"]:
+                return self._result(job, "skipped", reason="no_chunks")
+            return job
+
+        async def embed(job):
+            job["embs"] = await PipelineRuntime.embed_chunks(self.container, job["chunks"], job.pop("known"))
+            return job
+
+        async def store(job):
+            metadata_list = PipelineRuntime.chunk_metadata(job["meta"], len(job["chunks"]))
+            await self.container.store.add_embeddings(job["chunks"], job["embs"], metadata_list)
+            await answer_cache.invalidate_project(job["meta"]["tenant"], job["meta"]["project_id"])
+            return self._result(job, "ingested", chunks_indexed=len(job["chunks"]), pii_found=job["pii_found"])
+
+        stages = [(scan, SCAN_WORKERS), (chunk, CHUNK_WORKERS), (embed, EMBED_WORKERS), (store, STORE_WORKERS)]
+
+        async def feed():
+            async for rec in docs:
+                if "error" in rec:
+                    await results.put({"line": rec["line"], "status": "error", "error": rec["error"]})
+                    continue
+                job = self._job(rec)
+                if job.get("error"):
+                    await results.put(self._result(job, "error", error=job["error"]))
+                else:
+                    await qs[0].put(job)
+            for _ in range(stages[0][1]):
+                await qs[0].put(_DONE)
+
+        tasks = [asyncio.create_task(feed())]
+        for i, (fn, workers) in enumerate(stages):
+            out_q = qs[i + 1] if i + 1 < len(stages) else None
+            next_workers = stages[i + 1][1] if out_q else 0
+            tasks.append(asyncio.create_task(self._stage(fn, qs[i], out_q, results, workers, next_workers)))
+
+        async def close_results():
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # the reader failed (bad input, client disconnect): stop the stages too
+                for t in tasks:
+                    t.cancel()
+                raise
+            finally:
+                results.put_nowait(_DONE)  # unbounded queue: never blocks
+
+        closer = asyncio.create_task(close_results())
+        try:
+            while True:
+                item = await results.get()
+                if item is _DONE:
+                    break
+                yield item
+            await closer  # surfaces reader failures (e.g. client disconnect)
+        finally:
+            for t in tasks + [closer]:
+                t.cancel()
+
+    async def _stage(self, fn: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]], in_q: asyncio.Queue,
+                     out_q: Optional[asyncio.Queue], results: asyncio.Queue, workers: int, next_workers: int) -> None:
+        async def worker():
+            while True:
+                job = await in_q.get()
+                if job is _DONE:
+                    return
+                try:
+                    out = await fn(job)
+                except Exception as e:
+                    logger.exception(f"Bulk ingest failed on line {job['line']} in {fn.__name__}")
+                    await results.put(self._result(job, "error", stage=fn.__name__, error=str(e)))
+                    continue
+                if out.get("status") or out_q is None:
+                    await results.put(out)
+                else:
+                    await out_q.put(out)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for _ in range(next_workers):
+            await out_q.put(_DONE)
+
+    @staticmethod
+    def _job(rec: Dict[str, Any]) -> Dict[str, Any]:
+        d = rec["doc"]
+        job = {"line": rec["line"], "started": time.perf_counter()}
+        if not isinstance(d, dict) or not d.get("text") or not d.get("project_id"):
+            job["error"] = "each line needs at least 'project_id' and 'text'"
+            return job
+        if not isinstance(d["text"], str) or not isinstance(d["project_id"], str):
+            job["error"] = "'project_id' and 'text' must be strings"
+            return job
+        doc_id = str(d.get("doc_id") or base_id(d["text"]))
+        job["doc_id"] = doc_id
+        job["text"] = d["text"]
+        job["meta"] = {
+            "tenant": d.get("tenant") or os.environ.get("TENANT_ID", "airline"),
+            "department": d.get("department", "Engineering"),
+            "project_id": d["project_id"],
+            "source": d.get("source", "Upload"),
+            "classification": d.get("classification", "Internal"),
+            "visibility": d.get("visibility", "Shared"),
+            "group_ids": d.get("group_ids", []),
+            "owner_user_id": d.get("owner_user_id", "unknown"),
+            "doc_key": base_id(doc_id),
+        }
+        return job
+
+    @staticmethod
+    def _result(job: Dict[str, Any], status: str, **extra) -> Dict[str, Any]:
+        out = {"line": job["line"], "status": status}
+        if job.get("doc_id"):
+            out["doc_id"] = job["doc_id"]
+        out.update(extra)
+        out["elapsed_ms"] = round((time.perf_counter() - job["started"]) * 1000, 1)
+        return out
@@ -0,0 +1,69 @@
+import hashlib, json, os, threading, logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from app.core import metrics
+from app.services.pipeline.service_container import ServiceContainer
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerCache:
+    """
+    LRU of ServiceContainer instances keyed by a canonical hash of the
+    pipeline dict, so equal configs (regardless of key order) share one
+    container across requests.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, ServiceContainer]" = OrderedDict()
+        # construction is synchronous, so a plain lock is safe from both
+        # threadpool routes and the event loop (no await while held)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(pipeline: Optional[Dict[str, Any]]) -> str:
+        canonical = json.dumps(pipeline or {}, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, pipeline: Optional[Dict[str, Any]]) -> ServiceContainer:
+        k = self.key(pipeline)
+        with self._lock:
+            container = self._items.get(k)
+            if container is not None:
+                self._items.move_to_end(k)
+                self.hits += 1
+                return container
+            self.misses += 1
+            container = ServiceContainer(dict(pipeline or {}))
+            self._items[k] = container
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+            return container
+
+    def invalidate(self, pipeline: Optional[Dict[str, Any]] = None) -> None:
+        """Drop the container for `pipeline`, or everything when omitted."""
+        with self._lock:
+            if pipeline is None:
+                self._items.clear()
+            else:
+                self._items.pop(self.key(pipeline), None)
+        logger.info("Service container cache invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+container_cache = ContainerCache(int(os.getenv("CONTAINER_CACHE_SIZE", "64")))
+metrics.register("service_containers", container_cache.stats)
@@ -0,0 +1,138 @@
+import os, re, logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.tokenizer import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # prompt tokens spent on retrieved text
+
+# "[n] " marker plus the blank line between blocks
+_BLOCK_OVERHEAD = 4
+# non-adjacent chunks of one document are only stitched on a long shared run,
+# adjacent ones on any (the chunkers' overlap tail can be a single word)
+_MIN_GAP_OVERLAP = 8
+_WORD = re.compile(r"\S+")
+
+
+def chunk_position(chunk_id: str) -> Tuple[str, Optional[int]]:
+    """(document key, chunk index) from ids built by PipelineRuntime.chunk_metadata ("<doc>-<idx>")."""
+    doc, _, idx = chunk_id.rpartition("-")
+    if doc and idx.isdigit():
+        return doc, int(idx)
+    return chunk_id, None
+
+
+def _overlap(a: List[str], b: List[str]) -> int:
+    """Longest m with a[-m:] == b[:m] (prefix function over b + sentinel + tail of a)."""
+    if not a or not b:
+        return 0
+    s = b + [None] + a[-len(b):]
+    pi = [0] * len(s)
+    for i in range(1, len(s)):
+        j = pi[i - 1]
+        while j and s[i] != s[j]:
+            j = pi[j - 1]
+        if s[i] == s[j]:
+            j += 1
+        pi[i] = j
+    return pi[-1]
+
+
+def strip_overlap(prev: str, text: str, min_words: int = 1) -> Optional[str]:
+    """
+    `text` without the leading words it repeats from the end of `prev` (the
+    chunk_overlap tail), keeping its own whitespace; None when they share
+    fewer than `min_words`.
+    """
+    spans = [m.span() for m in _WORD.finditer(text)]
+    m = _overlap(prev.split(), [text[s:e] for s, e in spans])
+    if m < min_words:
+        return None
+    return text[spans[m][0]:] if m < len(spans) else ""
+
+
+class _Block:
+    """Consecutive hits of one document, rendered as one citation."""
+    __slots__ = ("hits", "text", "rank", "best")
+
+    def __init__(self, hit: Dict[str, Any], rank: int):
+        self.hits, self.text, self.rank, self.best = [hit], hit["content"], rank, hit
+
+
+def _blocks(chunks: List[Tuple[Optional[int], int, Dict[str, Any]]]) -> List[_Block]:
+    """Blocks for one document's (index, rank, hit), merging neighbours and dropping overlap."""
+    out: List[_Block] = []
+    prev_idx = None
+    for idx, rank, hit in sorted(chunks, key=lambda c: (c[0] is None, c[0] or 0, c[1])):
+        if out and idx is not None and prev_idx is not None:
+            adjacent = idx == prev_idx + 1
+            rest = strip_overlap(out[-1].hits[-1]["content"], hit["content"], 1 if adjacent else _MIN_GAP_OVERLAP)
+            if rest is not None or adjacent:
+                block = out[-1]
+                block.hits.append(hit)
+                if rank < block.rank:
+                    block.rank, block.best = rank, hit
+                if rest is None:
+                    rest = hit["content"]
+                if rest:
+                    block.text += "\n" + rest
+                prev_idx = idx
+                continue
+        out.append(_Block(hit, rank))
+        prev_idx = idx
+    return out
+
+
+def build_context(hits: List[Dict[str, Any]], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Pack ranked hits into at most `budget` tokens of prompt context.
+
+    Hits are taken in rank order (the order retrieval / rerank returned) while
+    they fit; chunks of one document are put back in document order, adjacent
+    ones merged and their overlap tails dropped, so each block is cited once.
+    Returns the context text ("[n] ..." blocks, best first) and one source per
+    citation number: the best hit's metadata with the block text and all
+    `chunk_ids` it covers.
+    """
+    docs: Dict[str, List[Tuple[Optional[int], int, Dict[str, Any]]]] = {}
+    doc_cost: Dict[str, int] = {}
+    seen = set()
+    cost_cache: Dict[str, int] = {}
+    used = 0
+
+    def cost(chunks) -> int:
+        total = 0
+        for block in _blocks(chunks):
+            if block.text not in cost_cache:
+                cost_cache[block.text] = count_tokens(block.text) + _BLOCK_OVERHEAD
+            total += cost_cache[block.text]
+        return total
+
+    for rank, hit in enumerate(hits):
+        if hit["id"] in seen or hit["content"] in seen:
+            continue
+        seen.update((hit["id"], hit["content"]))
+        doc, idx = chunk_position(hit["id"])
+        chunks = docs.get(doc, []) + [(idx, rank, hit)]
+        new_cost = cost(chunks)
+        if used - doc_cost.get(doc, 0) + new_cost > budget:
+            if used == 0:
+                # the best hit alone is over budget: send its head rather than nothing
+                hit = {**hit, "content": truncate_tokens(hit["content"], max(1, budget - _BLOCK_OVERHEAD))}
+                docs[doc], doc_cost[doc] = [(idx, rank, hit)], budget
+                used = budget
+            continue
+        used += new_cost - doc_cost.get(doc, 0)
+        docs[doc], doc_cost[doc] = chunks, new_cost
+
+    blocks = sorted((b for chunks in docs.values() for b in _blocks(chunks)), key=lambda b: b.rank)
+    parts, sources = [], []
+    for n, block in enumerate(blocks, start=1):
+        parts.append(f"[{n}] {block.text}")
+        sources.append({**{k: v for k, v in block.best.items() if k != "vector"},
+                        "content": block.text, "citation": n,
+                        "chunk_ids": [h["id"] for h in block.hits]})
+    logger.info(f"Context: {sum(len(b.hits) for b in blocks)}/{len(hits)} hits in {len(blocks)} blocks, "
+                f"~{used}/{budget} tokens")
+    return "\n\n".join(parts), sources
@@ -0,0 +1,321 @@
+import asyncio, os, socket, uuid, logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_, update
+
+from app.core import metrics
+from app.database.database import SessionLocal
+from app.models.governance.ingestionlog import IngestionLog
+from app.models.ingest.ingestjob import IngestJob
+from app.services.pipeline.container_cache import container_cache
+from app.services.pipeline.pipeline_runtime import PipelineRuntime, base_id
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS   = int(os.getenv("INGEST_WORKERS", "2"))  # 0 = this process only enqueues
+MAX_ATTEMPTS     = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+POLL_INTERVAL    = float(os.getenv("INGEST_JOB_POLL_SECONDS", "2"))
+RETRY_BACKOFF    = float(os.getenv("INGEST_JOB_RETRY_SECONDS", "10"))
+# a running job whose lease is not renewed for this long is taken over by another worker
+LEASE_SECONDS    = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "60"))
+
+PIPELINE_KEYS = ("chunker", "embedder", "vector_store", "reranker", "pii", "pseudonymizer",
+                 "governance", "llm", "chunk_size", "chunk_overlap")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _as_dict(job: IngestJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "chunks_total": job.chunks_total,
+        "chunks_embedded": job.chunks_embedded,
+        "chunks_uploaded": job.chunks_uploaded,
+        "cancel_requested": job.cancel_requested,
+        "claimed_by": job.claimed_by,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class IngestJobQueue:
+    """
+    Durable ingest queue on the application database. Jobs are claimed with
+    a conditional UPDATE so several processes (web workers or a dedicated
+    `python -m app.services.pipeline.ingest_jobs` worker) can share one table.
+
+    A claim is a lease: the worker stamps `claimed_by` and renews
+    `lease_expires_at` from a heartbeat while the job runs. A 'running' job
+    whose lease has expired (its process died) is claimed again like a
+    queued one; live jobs of other processes are never touched.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: set[str] = set()  # user-cancelled, as opposed to shutdown
+        self._lost: set[str] = set()       # lease taken over by another worker
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"[-64:]
+        self._wake: Optional[asyncio.Event] = None
+        self.counters = {"submitted": 0, "succeeded": 0, "failed": 0, "retried": 0, "cancelled": 0}
+
+    # ---- API side -------------------------------------------------------
+
+    def submit(self, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with SessionLocal() as db:
+            db.add(IngestJob(id=job_id, status="queued", payload=payload, max_attempts=MAX_ATTEMPTS))
+            db.commit()
+        self.counters["submitted"] += 1
+        if self._wake:
+            self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with SessionLocal() as db:
+            job = db.get(IngestJob, job_id)
+            return _as_dict(job) if job else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with SessionLocal() as db:
+            job = db.get(IngestJob, job_id)
+            if not job:
+                return None
+            if job.status == "queued":
+                job.status, job.finished_at = "cancelled", datetime.utcnow()
+                self.counters["cancelled"] += 1
+            elif job.status == "running":
+                # the owning worker notices at its next progress update
+                job.cancel_requested = True
+            db.commit()
+            db.refresh(job)
+            result = _as_dict(job)
+        task = self._running.get(job_id)
+        if task:
+            self._cancelled.add(job_id)
+            task.cancel()
+        return result
+
+    # ---- worker side ----------------------------------------------------
+
+    async def start(self) -> None:
+        if self.workers <= 0:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Ingest job queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        ready = (IngestJob.status == "queued") & (IngestJob.available_at <= now)
+        # owner died: lease not renewed (NULL for rows claimed before leases existed)
+        orphaned = (IngestJob.status == "running") & or_(IngestJob.lease_expires_at.is_(None),
+                                                         IngestJob.lease_expires_at < now)
+        with SessionLocal() as db:
+            candidates = (db.query(IngestJob.id, IngestJob.status, IngestJob.attempts, IngestJob.max_attempts)
+                          .filter(or_(ready, orphaned))
+                          .order_by(IngestJob.created_at).limit(5).all())
+            for job_id, status, attempts, max_attempts in candidates:
+                condition = ready if status == "queued" else orphaned
+                if status == "running" and attempts >= max_attempts:
+                    # every attempt died with its worker: do not take the next one down too
+                    failed = db.execute(
+                        update(IngestJob).where(IngestJob.id == job_id, condition)
+                        .values(status="failed", finished_at=now,
+                                error=f"worker lost (lease expired) on attempt {attempts}")
+                    ).rowcount
+                    db.commit()
+                    if failed:
+                        self.counters["failed"] += 1
+                    continue
+                claimed = db.execute(
+                    update(IngestJob)
+                    .where(IngestJob.id == job_id, condition)
+                    .values(status="running", attempts=IngestJob.attempts + 1, started_at=now, error=None,
+                            claimed_by=self.worker_id, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS))
+                ).rowcount
+                db.commit()
+                if claimed:
+                    if status == "running":
+                        logger.warning(f"Ingest job {job_id}: lease expired, taken over by {self.worker_id}")
+                    job = db.get(IngestJob, job_id)
+                    return {**_as_dict(job), "payload": job.payload}
+        return None
+
+    def _save(self, job_id: str, **values) -> bool:
+        """Persist progress; returns True when cancellation was requested."""
+        with SessionLocal() as db:
+            job = db.get(IngestJob, job_id)
+            for k, v in values.items():
+                setattr(job, k, v)
+            db.commit()
+            return bool(job.cancel_requested)
+
+    def _renew(self, job_id: str) -> bool:
+        """Extend our lease; False when another worker has taken the job over."""
+        with SessionLocal() as db:
+            renewed = db.execute(
+                update(IngestJob)
+                .where(IngestJob.id == job_id, IngestJob.claimed_by == self.worker_id)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=LEASE_SECONDS))
+            ).rowcount
+            db.commit()
+            return bool(renewed)
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                renewed = await asyncio.to_thread(self._renew, job_id)
+            except Exception:
+                # a missed beat is fine; the lease only lapses after LEASE_SECONDS
+                logger.exception(f"Ingest job {job_id}: lease renewal failed")
+                continue
+            if not renewed:
+                logger.warning(f"Ingest job {job_id}: lease lost to another worker, abandoning it")
+                self._lost.add(job_id)
+                task.cancel()
+                return
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job = await asyncio.to_thread(self._claim)
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id = job["job_id"]
+            task = asyncio.create_task(self._run(job))
+            self._running[job_id] = task
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, task))
+            try:
+                await task
+            except asyncio.CancelledError:
+                if job_id not in self._lost:
+                    raise
+            except Exception:
+                # never let one job take the worker down; the row stays 'running'
+                # until its lease expires and another claim retries it
+                logger.exception(f"Ingest worker {n} crashed on job {job_id}")
+            finally:
+                heartbeat.cancel()
+                self._running.pop(job_id, None)
+                self._lost.discard(job_id)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id, req = job["job_id"], job["payload"]
+        pipeline_cfg = {k: req[k] for k in PIPELINE_KEYS if k in req}
+        meta = {
+            "tenant": req["tenant"],
+            "department": req["department"],
+            "project_id": req["project_id"],
+            "source": req.get("source", "Upload"),
+            "classification": req.get("classification", "Internal"),
+            "visibility": req.get("visibility", "Shared"),
+            "group_ids": req.get("group_ids", []),
+            "owner_user_id": req.get("owner_user_id", "unknown"),
+            "doc_key": base_id(job_id),
+        }
+        outcome: Dict[str, Any] = {}
+
+        async def progress(update: Dict[str, Any]) -> None:
+            outcome.update(update)
+            counts = {k: v for k, v in update.items() if k.startswith("chunks_")}
+            if await asyncio.to_thread(self._save, job_id, **counts):
+                raise JobCancelled()
+
+        try:
+            container = container_cache.get(pipeline_cfg)
+            count = await PipelineRuntime.ingest(container, req["text"], meta, progress=progress)
+        except asyncio.CancelledError:
+            if job_id in self._lost:
+                return  # another worker owns the row now
+            if job_id not in self._cancelled:
+                # process shutting down: hand the job back to the queue
+                await asyncio.to_thread(self._save, job_id, status="queued", claimed_by=None, lease_expires_at=None)
+                raise
+            self._cancelled.discard(job_id)
+            await self._mark_cancelled(job_id)
+            return
+        except JobCancelled:
+            await self._mark_cancelled(job_id)
+            return
+        except Exception as e:
+            logger.exception(f"Ingest job {job_id} failed (attempt {job['attempts']})")
+            if job["attempts"] < job["max_attempts"]:
+                retry_at = datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF * job["attempts"])
+                await asyncio.to_thread(self._save, job_id, status="queued", error=str(e), available_at=retry_at)
+                self.counters["retried"] += 1
+            else:
+                await asyncio.to_thread(self._save, job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+                self.counters["failed"] += 1
+            return
+
+        await asyncio.to_thread(self._complete, job_id, meta, count, outcome)
+        self.counters["succeeded"] += 1
+
+    async def _mark_cancelled(self, job_id: str) -> None:
+        await asyncio.to_thread(self._save, job_id, status="cancelled", finished_at=datetime.utcnow())
+        self.counters["cancelled"] += 1
+        logger.info(f"Ingest job {job_id} cancelled")
+
+    def _complete(self, job_id: str, meta: Dict[str, Any], count: int, outcome: Dict[str, Any]) -> None:
+        decision = outcome.get("policy_decision", "allow")
+        with SessionLocal() as db:
+            db.add(IngestionLog(
+                tenant_id=meta["tenant"],
+                project_id=meta["project_id"],
+                department=meta["department"],
+                source_system=meta["source"],
+                visibility=meta["visibility"],
+                classification=meta["classification"],
+                owner_user_id=meta["owner_user_id"],
+                groups=meta["group_ids"],
+                doc_key=f"{meta['project_id']}-{meta['doc_key']}",
+                chunk_count=count,
+                pii_found=outcome.get("pii_found", False),
+                pii_summary=outcome.get("pii_summary", {}),
+                policy_decision={"block": "blocked", "mask": "masked"}.get(decision, "allowed"),
+            ))
+            job = db.get(IngestJob, job_id)
+            job.status, job.finished_at = "succeeded", datetime.utcnow()
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "workers": self.workers, "running": len(self._running)}
+
+
+ingest_jobs = IngestJobQueue()
+metrics.register("ingest_jobs", ingest_jobs.stats)
+
+
+if __name__ == "__main__":
+    # Dedicated ingest worker process: python -m app.services.pipeline.ingest_jobs
+    from app.database.database import init_db
+
+    async def _serve():
+        init_db()
+        queue = IngestJobQueue(max(1, INGEST_WORKERS))
+        await queue.start()
+        await asyncio.Event().wait()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve())
@@ -1,6 +1,9 @@
+import asyncio
 import base64
 import hashlib
-from typing import Dict, Any, List
+import os
+from contextlib import aclosing
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator, Tuple
 import logging
 
 from sqlalchemy.orm import Session
@@ -10,6 +13,11 @@ from app.models.governance.piientity import PIIEntity
 from app.models.governance.policydecision import PolicyDecision
 from app.services.interfaces.pii_detector import PIIDetector
 from app.services.interfaces.pseudonymizer import Pseudonymizer
+from app.services.pipeline.acl_filter import AclFilter
+from app.services.pipeline.answer_cache import answer_cache
+from app.services.pipeline.context_builder import build_context, CONTEXT_TOKEN_BUDGET
+from app.services.interfaces.chunk_strategy import Chunk
+from app.services.implementations.chunking.chunk_core import paragraph_windows
 logger = logging.getLogger(__name__)
 
 DEFAULT_POLICY = {
@@ -17,6 +25,9 @@ DEFAULT_POLICY = {
     "require_owner": True  # document must have an owner user ID
 }
 
+NO_CONTENT = "No relevant content found."
+INGEST_STREAM_BATCH = int(os.getenv("INGEST_STREAM_BATCH", "64"))  # chunks embedded + stored per call
+
 def base_id(raw: str) -> str:
     """
     Deterministic ID generator.
@@ -31,10 +42,11 @@ class PipelineRuntime:
     and: Embed Query -> Search -> Rerank -> LLM synth
     """
     @staticmethod
-    #async def ingest(container, text: str, meta: Dict[str, Any],db: Session) -> int:
-    async def ingest(container, text: str, meta: Dict[str, Any]) -> int:
-
-        # PII + Governance
+    async def screen(container, text: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        PII + Governance stage. Returns the policy decision and the text to
+        index (pseudonymized when PII was found).
+        """
         pii: PIIDetector = container.pii
         pseudo: Pseudonymizer = container.pseudo
         findings = await pii.detect_pii(text)
@@ -51,16 +63,15 @@ class PipelineRuntime:
                 reason = "pii_found_in_public"
             else:
                 # Pseudonymize (reversible)
-                masked_text, token_map = await pseudo.tokenize(text, findings)
+                masked_text, token_map = await pseudo.tokenize(text, findings, scope=meta.get("tenant", ""))
                 decision = "mask"
                 reason = "pii_masked"
 
-                # Persist token map (encrypted values) once per doc key base
+                # Persist token map (one entry per distinct value, already encrypted) once per doc key base
                 '''
                 base_key = f"{meta['tenant']}-{meta['project_id']}"
                 for tm in token_map:
-                    enc = await pseudo.encrypt(tm["raw"])
-                    db.add(PIIEntity(doc_key=base_key, token_id=tm["token"], entity_type=tm["type"], raw_encrypted=enc))
+                    db.add(PIIEntity(doc_key=base_key, token_id=tm["token"], entity_type=tm["type"], raw_encrypted=tm["cipher"]))
                 '''
         '''
         db.add(PolicyDecision(
@@ -72,7 +83,52 @@ class PipelineRuntime:
         ))
         db.flush()
         '''
-        if decision == "block":
+        return {"decision": decision, "reason": reason, "text": masked_text, "pii_summary": pii_summary, "pii_found": bool(findings)}
+
+    @staticmethod
+    def chunk_metadata(meta: Dict[str, Any], count: int, start: int = 0) -> List[Dict[str, Any]]:
+        # doc_key keeps chunk ids unique when several documents land in one project
+        prefix = f"{meta['project_id']}-{meta['doc_key']}" if meta.get("doc_key") else meta["project_id"]
+        metadata_list: List[Dict[str,Any]] = []
+        for idx in range(start, start + count):
+            metadata_list.append({
+                "id": f"{prefix}-{idx}",
+                "tenant": meta["tenant"],
+                "project_id": meta["project_id"],
+                "department": meta["department"],
+                "source": meta.get("source", "Upload"),
+                "classification": meta.get("classification", "Internal"),
+                "visibility": meta.get("visibility", "Shared"),
+                "group_ids": meta.get("group_ids", []),
+                "owner_user_id": meta.get("owner_user_id", "unknown")
+            })
+        return metadata_list
+
+    @staticmethod
+    async def embed_chunks(container, chunks: List[str], known: List[Optional[List[float]]]) -> List[List[float]]:
+        """Embeddings for `chunks`, calling the embedder only where the chunker did not supply one."""
+        missing = [i for i, v in enumerate(known) if v is None]
+        if not missing:
+            return list(known)
+        fresh = await container.embedder.embed_texts([chunks[i] for i in missing])
+        embs = list(known)
+        for i, v in zip(missing, fresh):
+            embs[i] = v
+        return embs
+
+    @staticmethod
+    #async def ingest(container, text: str, meta: Dict[str, Any],db: Session) -> int:
+    async def ingest(container, text: str, meta: Dict[str, Any],
+                     progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> int:
+        """`progress`, when given, is awaited with partial status updates after each stage."""
+        async def report(**update):
+            if progress:
+                await progress(update)
+
+        # PII + Governance
+        screened = await PipelineRuntime.screen(container, text, meta)
+        await report(policy_decision=screened["decision"], pii_found=screened["pii_found"], pii_summary=screened["pii_summary"])
+        if screened["decision"] == "block":
             '''
             # Also record ingestion attempt
             db.add(IngestionLog(
@@ -94,27 +150,19 @@ class PipelineRuntime:
             '''
             return 0
         p = container.params()
-        chunks = await container.chunker.chunk_text(masked_text, p["chunk_size"], p["chunk_overlap"])
+        chunks, known = await container.chunker.chunk_with_embeddings(screened["text"], p["chunk_size"], p["chunk_overlap"])
         if not chunks:
             return 0
+        await report(chunks_total=len(chunks))
 
-        embs = await container.embedder.embed_texts(chunks)
+        embs = await PipelineRuntime.embed_chunks(container, chunks, known)
         logger.info(f"Generated {len(embs)} embeddings for {len(chunks)} chunks.")
-        metadata_list: List[Dict[str,Any]] = []
-        for idx, c in enumerate(chunks):
-            metadata_list.append({
-                "id": f"{meta['project_id']}-{idx}",
-                "tenant": meta["tenant"],
-                "project_id": meta["project_id"],
-                "department": meta["department"],
-                "source": meta.get("source", "Upload"),
-                "classification": meta.get("classification", "Internal"),
-                "visibility": meta.get("visibility", "Shared"),
-                "group_ids": meta.get("group_ids", []),
-                "owner_user_id": meta.get("owner_user_id", "unknown")
-            })
+        await report(chunks_embedded=len(embs))
+        metadata_list = PipelineRuntime.chunk_metadata(meta, len(chunks))
 
         await container.store.add_embeddings(chunks, embs, metadata_list)
+        await answer_cache.invalidate_project(meta["tenant"], meta["project_id"])
+        await report(chunks_uploaded=len(chunks))
 
         '''
         # Record ingestion log
@@ -138,49 +186,154 @@ class PipelineRuntime:
         logger.info(f"Ingestion complete: {len(chunks)} chunks -> {meta['project_id']}")
         return len(chunks)
 
+    @staticmethod
+    async def ingest_stream(container, pieces: AsyncIterator[str], meta: Dict[str, Any],
+                            batch_size: int = INGEST_STREAM_BATCH) -> int:
+        """
+        `ingest` for text arriving in pieces (request body, file). Text is
+        screened per window, chunks are embedded and stored in batches of
+        `batch_size` while the next batch is being chunked, so memory is
+        bounded by the window and batch, not the document. A window blocked
+        by policy stops the ingest and deletes the chunks already stored
+        (their ids are known from chunk_metadata), returning 0 like `ingest`.
+        """
+        p = container.params()
+        blocked = False
+
+        async def screened() -> AsyncIterator[str]:
+            nonlocal blocked
+            async for window in paragraph_windows(pieces):
+                result = await PipelineRuntime.screen(container, window, meta)
+                if result["decision"] == "block":
+                    blocked = True
+                    logger.warning(f"Streamed ingest stopped by policy: {result['reason']}")
+                    return
+                yield result["text"]
+
+        stored = 0
+        pending: Optional[asyncio.Task] = None
+
+        async def flush(batch: List[Chunk]) -> None:
+            nonlocal stored, pending
+            texts = [c.text for c in batch]
+            embs = await PipelineRuntime.embed_chunks(container, texts, [c.embedding for c in batch])
+            if pending:
+                await pending  # at most one batch uploading while the next is embedded
+            metadata_list = PipelineRuntime.chunk_metadata(meta, len(batch), start=stored)
+            stored += len(batch)
+            pending = asyncio.create_task(container.store.add_embeddings(texts, embs, metadata_list))
+
+        batch: List[Chunk] = []
+        try:
+            async for c in container.chunker.chunk_stream(screened(), p["chunk_size"], p["chunk_overlap"]):
+                batch.append(c)
+                if len(batch) >= batch_size:
+                    await flush(batch)
+                    batch = []
+            if batch:
+                await flush(batch)
+            if pending:
+                await pending
+            if blocked and stored:
+                # never leave a blocked document partially searchable
+                await container.store.delete_embeddings([m["id"] for m in PipelineRuntime.chunk_metadata(meta, stored)])
+                logger.info(f"Streamed ingestion blocked: removed {stored} chunks already stored")
+        finally:
+            if pending and not pending.done():
+                pending.cancel()
+            if stored:
+                await answer_cache.invalidate_project(meta["tenant"], meta["project_id"])
+        if blocked:
+            return 0
+        logger.info(f"Streamed ingestion complete: {stored} chunks -> {meta['project_id']}")
+        return stored
+
     
 
     @staticmethod
     async def answer(container, query: str, meta: Dict[str, Any], top_k: int) -> Dict[str, Any]:
         logger.info(f"Answer pipeline started: Query = {query}")
 
-        # ✅ Step 1: Embed the query
-        qv = (await container.embedder.embed_texts([query]))[0]
-
-        # ✅ Step 2: Filter only same tenant/project
-        filter_expr = f"tenant eq '{meta['tenant']}' "
-        f"and project_id eq '{meta['project_id']}' "
-        f"and ("
-        f"visibility eq 'Public' "
-        f"or (visibility eq 'Shared' and group_ids/any(g: search.in(g, '{','.join(meta['group_ids'])}'))) "
-        f"or (visibility eq 'Private' and owner_user_id eq '{meta['owner_user_id']}')"
-        f")"
+        # ✅ Step 1: Filter only same tenant/project + visibility ACL
+        filter_expr = AclFilter.from_meta(meta)
         logger.info(f"Vector search filter: {filter_expr}")
 
-        # ✅ Step 3: Vector Search Retrieve
-        hits = await container.store.search(qv, top_k, filter_expr)
-        logger.info(f"Vector search returned {len(hits)} hits")
+        async def compute(qv: List[float]) -> Dict[str, Any]:
+            return await PipelineRuntime._answer(container, query, qv, filter_expr, top_k)
 
-        if not hits:
-            return {"answer": "No relevant content found.", "sources": []}
+        # ✅ Step 2: Embed the query
+        # (coalesced with concurrent queries by the batching embedder)
+        if container.pipeline.get("answer_cache"):
+            scope = answer_cache.scope(container.pipeline, filter_expr, top_k)
+            return await answer_cache.answer(scope, query, container.embedder.embed_text, compute)
+        return await compute(await container.embedder.embed_text(query))
+
+    @staticmethod
+    async def retrieve(container, query: str, qv: List[float], filter_expr: AclFilter, top_k: int) -> List[Dict[str, Any]]:
+        rerank = getattr(container, "rerank", None)
+        with_vectors = bool(rerank and rerank.needs_vectors)
+        # rerankers get a wider candidate set than the final top_k
+        candidates = container.pipeline.get("rerank_candidates") or top_k * (rerank.candidate_factor if rerank else 1)
+
+        # ✅ Step 3: Retrieve (vector, or keyword + vector fused by rank when the pipeline asks for hybrid)
+        if container.pipeline.get("retrieval") == "hybrid":
+            hits = await container.store.hybrid_search(query, qv, candidates, filter_expr,
+                                                       vector_k=container.pipeline.get("vector_k"),
+                                                       with_vectors=with_vectors)
+        else:
+            hits = await container.store.search(qv, candidates, filter_expr, with_vectors=with_vectors)
+        logger.info(f"Vector search returned {len(hits)} hits")
 
         # ✅ Step 4: Optional Reranking
-        if hasattr(container, "rerank") and container.rerank:
-            hits = await container.rerank.rerank(qv, hits)
+        if hits and rerank:
+            hits = await rerank.rerank(qv, hits, top_k=top_k, query=query)
             logger.info("Reranking applied")
+        return hits
 
-        # ✅ Step 5: Build LLM context
-        ctx = "\n\n".join([f"[{i+1}] {h['content']}" for i, h in enumerate(hits[:5])])
+    @staticmethod
+    def build_prompt(query: str, hits: List[Dict[str, Any]],
+                     budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, str, List[Dict[str, Any]]]:
+        # ✅ Step 5: Build LLM context (token-budgeted, overlap removed; sources[n-1] is citation [n])
+        ctx, sources = build_context(hits, budget)
         sys_prompt = (
             "You are an enterprise assistant. "
             "Use ONLY the provided context. If not present, say you don't know. "
             "Cite sources like [1],[2]."
         )
         user_prompt = f"Context:\n{ctx}\n\nQuestion: {query}\nAnswer concisely with citations."
+        return sys_prompt, user_prompt, sources
+
+    @staticmethod
+    async def _answer(container, query: str, qv: List[float], filter_expr: AclFilter, top_k: int) -> Dict[str, Any]:
+        hits = await PipelineRuntime.retrieve(container, query, qv, filter_expr, top_k)
+        if not hits:
+            return {"answer": NO_CONTENT, "sources": []}
+        sys_prompt, user_prompt, sources = PipelineRuntime.build_prompt(
+            query, hits, container.pipeline.get("context_tokens") or CONTEXT_TOKEN_BUDGET)
 
         # ✅ Step 6: Generate response
         logger.info("Calling LLM with context")
         answer_text = await container.llm.generate(sys_prompt, user_prompt)
 
-        return {"answer": answer_text, "sources": hits[:5]}
+        return {"answer": answer_text, "sources": sources}
 
+    @staticmethod
+    async def stream_answer(container, query: str, meta: Dict[str, Any], top_k: int) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Same pipeline as `answer`, yielding ("sources", hits) as soon as
+        retrieval is done, then ("token", delta) per LLM delta. Closing the
+        generator closes the upstream completion stream.
+        """
+        filter_expr = AclFilter.from_meta(meta)
+        qv = await container.embedder.embed_text(query)
+        hits = await PipelineRuntime.retrieve(container, query, qv, filter_expr, top_k)
+        if not hits:
+            yield "sources", []
+            yield "token", NO_CONTENT
+            return
+        sys_prompt, user_prompt, sources = PipelineRuntime.build_prompt(
+            query, hits, container.pipeline.get("context_tokens") or CONTEXT_TOKEN_BUDGET)
+        yield "sources", sources
+        async with aclosing(container.llm.stream(sys_prompt, user_prompt)) as deltas:
+            async for delta in deltas:
+                yield "token", delta
@@ -8,20 +8,22 @@ class ServiceContainer:
     def __init__(self, pipeline: Dict[str, Any]):
         self.pipeline = pipeline or {}
 
-        def load(key: str, registry: Dict[str, Any]):
+        def load(key: str, kind: str):
+            registry = getattr(StrategyRegistry, kind)
             name = self.pipeline.get(key)
-            if name in registry:
-                return registry[name]()
-            return next(iter(registry.values()))()  # default
+            if name not in registry:
+                name = next(iter(registry))  # default
+            return StrategyRegistry.instance(kind, name)
 
-        self.chunker = load("chunker", StrategyRegistry.chunkers)
-        self.embedder = load("embedder", StrategyRegistry.embedders)
-        self.store = load("vector_store", StrategyRegistry.stores)
-        self.pii = load("pii", StrategyRegistry.pii)
-        self.gov = load("governance", StrategyRegistry.governance)
-        self.rerank = load("reranker", StrategyRegistry.rerankers)
-        self.llm = load("llm", StrategyRegistry.llms)
-        self.pseudo   = load("pseudonymizer", StrategyRegistry.pseudonymizers)
+        self.chunker = load("chunker", "chunkers")
+        self.embedder = load("embedder", "embedders")
+        self.store = load("vector_store", "stores")
+        self.pii = load("pii", "pii")
+        self.gov = load("governance", "governance")
+        self.rerank = load("reranker", "rerankers")
+        self.llm = load("llm", "llms")
+        self.pseudo   = load("pseudonymizer", "pseudonymizers")
+        self.documents = load("document_processor", "document_processors")
 
     def params(self) -> Dict[str, Any]:
         return {
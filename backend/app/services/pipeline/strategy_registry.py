@@ -1,4 +1,5 @@
-from typing import Dict, Type
+import threading, logging
+from typing import Any, Dict, Tuple, Type
 from app.services.interfaces.chunk_strategy import ChunkStrategy
 from app.services.interfaces.embedding_strategy import EmbeddingStrategy
 from app.services.interfaces.vector_store import VectorStore
@@ -7,6 +8,7 @@ from app.services.interfaces.pii_detector import PIIDetector
 from app.services.interfaces.data_governance import DataGovernance
 from app.services.interfaces.llm_service import LLMService
 from app.services.interfaces.pseudonymizer import Pseudonymizer
+from app.services.interfaces.document_processor import DocumentProcessor
 
 # Implementations
 from app.services.implementations.chunking.paragraph_chunker import ParagraphChunker
@@ -14,29 +16,44 @@ from app.services.implementations.chunking.recursive_chunker import RecursiveChu
 from app.services.implementations.chunking.semantic_chunker import SemanticChunker
 
 from app.services.implementations.embedding.azure_embedding import AzureEmbedding
+from app.services.implementations.embedding.cached_embedding import CachedEmbedding
+from app.services.implementations.embedding.batching_embedding import BatchingEmbedding
 from app.services.implementations.vectorstore.azure_search_store import AzureAISearchStore
-from app.services.implementations.rerank.cosine_rerank import CosineRerank
+from app.services.implementations.vectorstore.local_numpy_store import LocalNumpyStore
+from app.services.implementations.rerank.cosine_rerank import CosineRerank, RERANK_MMR_LAMBDA
+from app.services.implementations.none_rerank import NoReranker
+from app.services.implementations.llm_rerank import LLMReranker
 from app.services.implementations.pii.regex_detector import RegexPIIDetector
 
 from app.services.implementations.pii.pseudonymizer import SimplePseudonymizer 
 from app.services.implementations.governance.basic_governance import BasicGovernance
 from app.services.implementations.llm.azure_llm import AzureLLM
+from app.services.implementations.document_processor import UnstructuredDocumentProcessor
+from app.services.implementations.fast_document_processor import DispatchingDocumentProcessor
+
+logger = logging.getLogger(__name__)
 
 class StrategyRegistry:
     chunkers: Dict[str, Type[ChunkStrategy]] = {
         "paragraph": ParagraphChunker,
         "recursive": RecursiveChunker,
-        "semantic":  lambda: SemanticChunker(AzureEmbedding())
+        "semantic":  lambda: SemanticChunker(StrategyRegistry.instance("embedders", "azure-openai"))
     }
     embedders: Dict[str, Type[EmbeddingStrategy]] = {
-        "azure-openai": AzureEmbedding
+        # small calls from concurrent requests are coalesced into one upstream call
+        "azure-openai": lambda: BatchingEmbedding(AzureEmbedding()),
+        "azure-openai-cached": lambda: CachedEmbedding(StrategyRegistry.instance("embedders", "azure-openai")),
     }
     stores: Dict[str, Type[VectorStore]] = {
-        "azure-search": AzureAISearchStore
+        "azure-search": AzureAISearchStore,
+        "local-numpy": LocalNumpyStore,
+        "local-ivf": lambda: LocalNumpyStore(index="ivf"),
     }
     rerankers: Dict[str, Type[RerankStrategy]] = {
         "cosine": CosineRerank,
-        "none": CosineRerank  # default to cosine light rerank
+        "mmr": lambda: CosineRerank(mmr_lambda=RERANK_MMR_LAMBDA),
+        "llm": lambda: LLMReranker(StrategyRegistry.instance("llms", "azure-openai")),
+        "none": NoReranker
     }
     pii: Dict[str, Type[PIIDetector]] = {
         "regex": RegexPIIDetector
@@ -50,3 +67,38 @@ class StrategyRegistry:
     llms: Dict[str, Type[LLMService]] = {
         "azure-openai": AzureLLM
     }
+    document_processors: Dict[str, Type[DocumentProcessor]] = {
+        # text/Markdown/HTML/JSON parsed in-process; binary formats go to Unstructured
+        "auto": lambda: DispatchingDocumentProcessor(StrategyRegistry.instance("document_processors", "unstructured")),
+        "unstructured": UnstructuredDocumentProcessor
+    }
+
+    # Strategies are stateless between calls (all per-request data is passed
+    # as arguments), so one instance per (kind, name) is shared process-wide
+    # and keeps its warm state (pools, compiled regexes, caches).
+    _instances: Dict[Tuple[str, str], Any] = {}
+    _lock = threading.RLock()  # re-entrant: factories may resolve other strategies
+
+    @classmethod
+    def instance(cls, kind: str, name: str) -> Any:
+        key = (kind, name)
+        inst = cls._instances.get(key)
+        if inst is None:
+            with cls._lock:
+                inst = cls._instances.get(key)
+                if inst is None:
+                    inst = cls._instances[key] = getattr(cls, kind)[name]()
+        return inst
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Shutdown hook: lets strategies holding state (e.g. an autosaving store) flush it."""
+        with cls._lock:
+            instances = list(cls._instances.values())
+        for inst in instances:
+            close = getattr(inst, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    logger.exception(f"Closing {type(inst).__name__} failed")
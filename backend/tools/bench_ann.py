@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Recall@k / latency of the local IVF-flat index against exact (flat) search,
+at the shipped defaults (IVF_NLIST=auto, IVF_NPROBE) and an nprobe sweep.
+
+Usage:
+    python tools/bench_ann.py [--n 200000] [--dim 1536] [--queries 100] [--k 10]
+                              [--nlist 0] [--nprobe 8,16,32,64,128] [--spread 1.0]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.implementations.vectorstore.ivf_index import IVFIndex, IVF_NPROBE  # noqa: E402
+
+_BLOCK = 20000
+
+
+def embedding_like(n: int, dim: int, rng: np.random.Generator, rank: int = 64, spread: float = 1.0) -> np.ndarray:
+    """
+    Topic clusters in a low-rank subspace plus small isotropic noise, like
+    real text embeddings; `spread` is the within-topic scatter (harder for
+    IVF as it grows, since neighbours spill into other lists).
+    """
+    basis = rng.standard_normal((rank, dim)).astype(np.float32)
+    centroids = rng.standard_normal((max(8, n // 100), rank)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for i in range(0, n, _BLOCK):  # built in blocks: no float64 / full-size temporaries
+        m = min(_BLOCK, n - i)
+        z = centroids[rng.integers(0, len(centroids), m)] + spread * rng.standard_normal((m, rank)).astype(np.float32)
+        x = z @ basis + 0.05 * np.sqrt(rank) * rng.standard_normal((m, dim)).astype(np.float32)
+        out[i:i + m] = x / np.linalg.norm(x, axis=1, keepdims=True)
+    return out
+
+
+def top(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nlist", type=int, default=0, help="0 = the index default (4 * sqrt(rows))")
+    ap.add_argument("--nprobe", default="8,16,32,64,128")
+    ap.add_argument("--spread", type=float, default=1.0)
+    ap.add_argument("--train", type=int, default=50000, help="k-means sample, as LOCAL_STORE_IVF_TRAIN_ROWS")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # queries come from the same topics (and subspace) as the corpus, held out of it
+    vecs = embedding_like(args.n + args.queries, args.dim, rng, spread=args.spread)
+    vecs, queries = vecs[:args.n], vecs[args.n:]
+
+    t = time.perf_counter()
+    sample = vecs[np.sort(rng.choice(args.n, min(args.n, args.train), replace=False))]
+    index = IVFIndex(nlist=args.nlist).fit(sample, rows=args.n)
+    train = time.perf_counter() - t
+    t = time.perf_counter()
+    for i in range(0, args.n, 64):  # upload-sized batches, as the store adds them
+        index.add(i, vecs[i:i + 64])
+    add = time.perf_counter() - t
+    print(f"n={args.n} dim={args.dim} spread={args.spread} nlist={index.nlist}: train {train:.1f}s, "
+          f"add {args.n / add:,.0f} rows/s")
+
+    t = time.perf_counter()
+    truth = [set(top(vecs @ q, args.k).tolist()) for q in queries]
+    flat_ms = (time.perf_counter() - t) * 1000 / len(queries)
+    print(f"{'flat':>16}  recall@{args.k}=1.000  {flat_ms:8.2f} ms/query  rows scanned {args.n:>9,}")
+
+    sweep = sorted({IVF_NPROBE, *(int(p) for p in args.nprobe.split(","))})
+    for nprobe in sweep:
+        hits = scanned = 0
+        t = time.perf_counter()
+        for q, exact in zip(queries, truth):
+            rows = index.candidates(q, None, args.k, nprobe=nprobe)
+            scanned += len(rows)
+            best = rows[top(vecs[rows] @ q, min(args.k, len(rows)))]
+            hits += len(exact & set(best.tolist()))
+        ms = (time.perf_counter() - t) * 1000 / len(queries)
+        label = f"nprobe={nprobe}" + (" *" if nprobe == IVF_NPROBE else "")
+        print(f"{label:>16}  recall@{args.k}={hits / (args.k * len(queries)):.3f}  {ms:8.2f} ms/query  "
+              f"rows scanned {scanned // len(queries):>9,}")
+    print("* shipped default")
+
+
+if __name__ == "__main__":
+    main()
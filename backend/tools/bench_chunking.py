@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Chunking throughput on large documents: the token-counting chunk core
+(recursive / paragraph chunkers) against the previous string-concatenating
+implementations, which re-split the whole buffer for every sentence.
+
+Usage:
+    python tools/bench_chunking.py [--mb 1,4] [--chunk-size 800] [--chunk-overlap 10]
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.tokenizer import count_tokens, get_encoding  # noqa: E402
+from app.services.implementations.chunking.paragraph_chunker import ParagraphChunker  # noqa: E402
+from app.services.implementations.chunking.recursive_chunker import RecursiveChunker  # noqa: E402
+
+
+def _toklen(s: str) -> int: return max(1, len(s.split()))
+
+
+def legacy_recursive(text, chunk_size, chunk_overlap):
+    sections = re.split(r"\n\s*#{1,6}\s+|^\s*[A-Z][^\n]{0,60}\n[-=]{3,}\s*$", text, flags=re.M)
+    chunks, buf = [], ""
+    for sec in sections:
+        paras = [p.strip() for p in re.split(r"\n\s*\n", sec) if p.strip()]
+        for p in paras:
+            for s in re.split(r"(?<=[.!?])\s+", p):
+                cand = (buf + " " + s).strip() if buf else s
+                if _toklen(cand) <= chunk_size:
+                    buf = cand
+                else:
+                    if buf: chunks.append(buf)
+                    tail = " ".join(buf.split()[-max(0,int(_toklen(buf)*chunk_overlap/100)):]) if buf else ""
+                    buf = (tail + " " + s).strip()
+        if buf: chunks.append(buf); buf = ""
+    return chunks
+
+
+def legacy_paragraph(text, chunk_size, chunk_overlap):
+    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    out, buf = [], ""
+    for p in paras:
+        cand = (buf + "\n\n" + p).strip() if buf else p
+        if _toklen(cand) <= chunk_size:
+            buf = cand
+        else:
+            if buf: out.append(buf)
+            tail = " ".join(buf.split()[-max(0,int(_toklen(buf)*chunk_overlap/100)):]) if buf else ""
+            buf = (tail + "\n\n" + p).strip()
+    if buf: out.append(buf)
+    return out
+
+
+WORDS = ("aircraft maintenance inspection hydraulic pump replaced per AMM task "
+         "engine borescope findings within limits crew reported vibration during climb "
+         "torque values recorded serial number A320-200 PN_4711/B").split()
+
+
+def document(mb: float, rng: random.Random) -> str:
+    parts, size = [], 0
+    while size < mb * 1024 * 1024:
+        if rng.random() < 0.02:
+            part = f"## Section {len(parts)}"
+        else:
+            sentences = [" ".join(rng.choices(WORDS, k=rng.randint(6, 30))).capitalize() + "."
+                         for _ in range(rng.randint(2, 8))]
+            part = " ".join(sentences)
+        parts.append(part)
+        size += len(part) + 2
+    return "\n\n".join(parts)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", default="1,4")
+    ap.add_argument("--chunk-size", type=int, default=800)
+    ap.add_argument("--chunk-overlap", type=int, default=10, help="percent, as in the pipeline config")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"tokenizer: {'tiktoken' if get_encoding() is not None else 'length estimate (tiktoken unavailable)'}")
+    print(f"{'doc':>6} {'chunker':<10} {'impl':<7} {'seconds':>8} {'MB/s':>7} {'chunks':>7} {'max tokens':>10}")
+    for mb in (float(x) for x in args.mb.split(",")):
+        text = document(mb, random.Random(args.seed))
+        for name, legacy, chunker in (("recursive", legacy_recursive, RecursiveChunker()),
+                                      ("paragraph", legacy_paragraph, ParagraphChunker())):
+            old, t_old = timed(legacy, text, args.chunk_size, args.chunk_overlap)
+            new, t_new = timed(lambda: asyncio.run(chunker.chunk_text(text, args.chunk_size, args.chunk_overlap)))
+            for impl, chunks, t in (("legacy", old, t_old), ("core", new, t_new)):
+                # legacy sizes are in whitespace words; this is what the embedding model sees
+                print(f"{mb:>5}M {name:<10} {impl:<7} {t:>8.2f} {mb / t:>7.2f} {len(chunks):>7} "
+                      f"{max(count_tokens(c) for c in chunks):>10}")
+
+
+if __name__ == "__main__":
+    main()
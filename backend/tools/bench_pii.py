@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+PII scan throughput: the single-pass RegexPIIDetector against the previous
+one-scan-per-pattern EMAIL/PHONE detector, on prose with PII and on
+adversarial numeric text (space/dash/dot separated digit runs, tables,
+long digit strings) where the old PHONE pattern backtracks.
+
+Usage:
+    python tools/bench_pii.py [--kb 64,256,1024] [--legacy-digits-kb 64] [--seed 0]
+
+The legacy PHONE pattern is quadratic on a plain digit run (minutes at 256K),
+so it only runs on that corpus up to --legacy-digits-kb.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.implementations.pii.regex_detector import RegexPIIDetector  # noqa: E402
+
+LEGACY_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+LEGACY_PHONE = re.compile(r"(?:\+\d{1,3}[-.\s]?)?(?:\d{2,4}[-.\s]?){2,4}\d{2,4}")
+
+
+def legacy_scan(text):
+    found = [("email", m.start(), m.end()) for m in LEGACY_EMAIL.finditer(text)]
+    found += [("phone", m.start(), m.end()) for m in LEGACY_PHONE.finditer(text)]
+    return found
+
+
+WORDS = ("passenger booking reference seat upgrade requested contact crew "
+         "baggage delayed claim filed refund issued flight diverted").split()
+
+
+def prose(size: int, rng: random.Random) -> str:
+    parts, n = [], 0
+    while n < size:
+        r = rng.random()
+        if r < 0.03:
+            part = f"{rng.choice(WORDS)}.{rng.randint(1, 999)}@example.com"
+        elif r < 0.06:
+            part = f"+44 20 {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}"
+        elif r < 0.07:
+            part = "4111 1111 1111 1111"
+        else:
+            part = rng.choice(WORDS)
+        parts.append(part)
+        n += len(part) + 1
+    return " ".join(parts)
+
+
+def numeric_table(size: int, rng: random.Random) -> str:
+    rows, n = [], 0
+    while n < size:
+        row = " ".join(str(rng.randint(0, 99)) for _ in range(12))
+        rows.append(row)
+        n += len(row) + 1
+    return "\n".join(rows)
+
+
+def separated_run(size: int, rng: random.Random) -> str:
+    return "".join(str(rng.randint(10, 99)) + rng.choice(" -.") for _ in range(size // 3))
+
+
+def digit_run(size: int, rng: random.Random) -> str:
+    return "".join(rng.choice("0123456789") for _ in range(size))
+
+
+CORPORA = (("prose", prose), ("table", numeric_table), ("separated", separated_run), ("digits", digit_run))
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kb", default="64,256,1024")
+    ap.add_argument("--legacy-digits-kb", type=int, default=64)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    detector = RegexPIIDetector()
+    print(f"{'doc':>7} {'corpus':<10} {'impl':<8} {'seconds':>8} {'MB/s':>8} {'findings':>9}")
+    for kb in (int(x) for x in args.kb.split(",")):
+        for name, make in CORPORA:
+            text = make(kb * 1024, random.Random(args.seed))
+            runs = [("single", *timed(detector.scan, text))]
+            if name != "digits" or kb <= args.legacy_digits_kb:
+                runs.insert(0, ("legacy", *timed(legacy_scan, text)))
+            mb = len(text) / (1024 * 1024)
+            for impl, found, t in runs:
+                print(f"{kb:>5}K {name:<10} {impl:<8} {t:>8.3f} {mb / max(t, 1e-9):>8.1f} {len(found):>9}")
+
+
+if __name__ == "__main__":
+    main()
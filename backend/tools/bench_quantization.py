@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Memory per million chunks, scan latency and recall loss of quantised local
+search (int8 / product quantisation, with and without float32 rescoring),
+and the resident memory of a LocalNumpyStore holding the same rows.
+
+Usage:
+    python tools/bench_quantization.py [--n 50000] [--dim 1536] [--queries 100] [--k 10]
+                                       [--rescore 8] [--pq-m 96] [--store none,int8]
+
+The store section (Linux) adds the rows to an mmap-backed store and reports
+its anonymous resident memory: the float32 rows live in the mapped file, so
+only the codes and metadata count.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.implementations.vectorstore.quantization import ScalarQuantizer, ProductQuantizer  # noqa: E402
+from app.services.implementations.vectorstore import local_numpy_store  # noqa: E402
+
+MILLION = 1_000_000
+PY_FLOAT = 24 + 8  # float object + list slot, as in List[float] / JSON-decoded columns
+
+
+def embedding_like(n: int, dim: int, rng: np.random.Generator, rank: int = 64) -> np.ndarray:
+    """
+    Topic clusters in a low-rank subspace plus small isotropic noise, like real
+    text embeddings. Queries must be drawn from the same call (held out), or
+    they land in another subspace and every neighbour is noise.
+    """
+    basis = rng.standard_normal((rank, dim)).astype(np.float32)
+    centroids = rng.standard_normal((max(8, n // 100), rank)).astype(np.float32)
+    z = centroids[rng.integers(0, len(centroids), n)] + 0.7 * rng.standard_normal((n, rank)).astype(np.float32)
+    x = z @ basis + 0.05 * np.sqrt(rank) * rng.standard_normal((n, dim)).astype(np.float32)
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def top(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def rss_anon_mb() -> float:
+    """Anonymous resident memory (excludes the page cache of mapped files); Linux only."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def store_memory(vecs: np.ndarray, quantization: str) -> None:
+    """Anonymous memory a mmap-backed store adds for these rows, after training and a search."""
+    local_numpy_store.LOCAL_STORE_QUANT_TRAIN_ROWS = min(len(vecs), 10000)
+    meta = [{"id": f"c{i}", "tenant": "t"} for i in range(len(vecs))]
+    with tempfile.TemporaryDirectory() as path:
+        before = rss_anon_mb()
+        store = local_numpy_store.LocalNumpyStore(path=path, mmap=True, autosave=False, quantization=quantization)
+        for i in range(0, len(vecs), 1000):
+            store._add([""] * len(vecs[i:i + 1000]), vecs[i:i + 1000], meta[i:i + 1000])
+        store._kick()
+        if store._maintainer is not None:
+            store._maintainer.join()
+        asyncio.run(store.search(vecs[0].tolist(), 10, None))
+        grown = rss_anon_mb() - before
+        print(f"{'store ' + quantization:>14} {grown * MILLION / len(vecs) / 1024:15.2f}   anonymous RSS "
+              f"{grown:.0f} MB for {len(vecs):,} rows (float32 rows: {vecs.nbytes / 2 ** 20:.0f} MB, in the mapped file)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--rescore", type=int, default=8)
+    ap.add_argument("--pq-m", type=int, default=96)
+    ap.add_argument("--store", default="none,int8", help="store quantizations to measure ('' to skip)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vecs = embedding_like(args.n + args.queries, args.dim, rng)
+    vecs, queries = vecs[:args.n], vecs[args.n:]
+    truth = [set(top(vecs @ q, args.k).tolist()) for q in queries]
+
+    print(f"n={args.n} dim={args.dim} k={args.k} rescore=top {args.k * args.rescore}")
+    print(f"{'':>14} {'GB / 1M chunks':>15} {'recall':>8} {'+rescore':>9} {'scan ms':>9} {'total ms':>9}")
+    print(f"{'List[float]':>14} {PY_FLOAT * args.dim * MILLION / 1e9:15.1f} {'-':>8} {'-':>9} {'-':>9} {'-':>9}")
+
+    t = time.perf_counter()
+    for q in queries:
+        vecs @ q
+    scan = (time.perf_counter() - t) * 1000 / len(queries)
+    t = time.perf_counter()
+    for q in queries:
+        top(vecs @ q, args.k)
+    ms = (time.perf_counter() - t) * 1000 / len(queries)
+    print(f"{'float32':>14} {4 * args.dim * MILLION / 1e9:15.1f} {1.0:8.3f} {'-':>9} {scan:9.2f} {ms:9.2f}")
+
+    for name, quant in (("int8", ScalarQuantizer()), (f"pq m={args.pq_m}", ProductQuantizer(m=args.pq_m))):
+        t = time.perf_counter()
+        quant.fit(vecs[rng.choice(args.n, min(args.n, 20000), replace=False)])
+        codes = quant.encode(vecs)
+        train = time.perf_counter() - t
+        t = time.perf_counter()
+        for q in queries:
+            quant.scores(codes, q)
+        scan = (time.perf_counter() - t) * 1000 / len(queries)
+        raw = rescored = 0
+        t = time.perf_counter()
+        for q, exact in zip(queries, truth):
+            approx = quant.scores(codes, q)
+            raw += len(exact & set(top(approx, args.k).tolist()))
+            shortlist = np.sort(top(approx, args.k * args.rescore))
+            best = shortlist[top(vecs[shortlist] @ q, args.k)]
+            rescored += len(exact & set(best.tolist()))
+        ms = (time.perf_counter() - t) * 1000 / len(queries)
+        total = args.k * len(queries)
+        gb = codes.nbytes / args.n * MILLION / 1e9
+        print(f"{name:>14} {gb:15.2f} {raw / total:8.3f} {rescored / total:9.3f} {scan:9.2f} {ms:9.2f}"
+              f"   (train+encode {train:.1f}s)")
+
+    for quantization in filter(None, args.store.split(",")):
+        if not os.path.exists("/proc/self/status"):
+            break
+        store_memory(vecs, quantization)
+
+
+if __name__ == "__main__":
+    main()